@@ -0,0 +1,88 @@
+"""
+Compare the CPU and memory cost per channel of keeping DSINFO as parsed JSON (a dict
+of strings per channel, parsed on every collection) with hitron_exporter.channels.
+ChannelTable (parsed once into arrays).
+
+Run with: python benchmarks/channels.py
+"""
+
+import json
+import timeit
+import tracemalloc
+from typing import Any, Callable
+
+from prometheus_client.core import GaugeMetricFamily
+
+from hitron_exporter.channels import ChannelTable
+from hitron_exporter.hitron import Client
+import sample_data
+
+
+CHANNELS = 192  # several DOCSIS 3.1 modems' worth
+COLUMNS = {"signal_strength": "signalStrength", "snr": "snr"}
+
+
+def families() -> tuple[GaugeMetricFamily, GaugeMetricFamily]:
+    labels = ["port", "channel", "frequency"]
+    return (
+        GaugeMetricFamily("sigstr", "", labels=labels),
+        GaugeMetricFamily("snr", "", labels=labels),
+    )
+
+
+def collect_dicts(dsinfo: list[dict[str, str]]) -> None:
+    sigstr, snr = families()
+    for dschannel in dsinfo:
+        key = [dschannel["portId"], dschannel["channelId"], dschannel["frequency"]]
+        sigstr.add_metric(key, float(dschannel["signalStrength"]))
+        snr.add_metric(key, float(dschannel["snr"]))
+
+
+def collect_table(table: ChannelTable) -> None:
+    sigstr, snr = families()
+    for key, value in table.rows("signal_strength"):
+        sigstr.add_metric(key, value)
+    for key, value in table.rows("snr"):
+        snr.add_metric(key, value)
+
+
+def retained(build: Callable[[], Any]) -> int:
+    tracemalloc.start()
+    before, _ = tracemalloc.get_traced_memory()
+    kept = build()
+    after, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    del kept
+    return after - before
+
+
+def per_channel(stmt: Callable[[], Any]) -> float:
+    number, _ = timeit.Timer(stmt).autorange()
+    return min(timeit.repeat(stmt, number=number, repeat=5)) / number / CHANNELS
+
+
+def main() -> None:
+    raw = json.dumps(sample_data.datasets(downstream=CHANNELS)[Client.Dataset.DSINFO])
+    dsinfo = json.loads(raw)
+    table = ChannelTable(dsinfo, COLUMNS)
+
+    print(f"{CHANNELS} downstream channels")
+    print(
+        f"{'memory, dicts':>32}: {retained(lambda: json.loads(raw)) / CHANNELS:8.0f}"
+        " bytes per channel"
+    )
+    print(
+        f"{'memory, ChannelTable':>32}:"
+        f" {retained(lambda: ChannelTable(json.loads(raw), COLUMNS)) / CHANNELS:8.0f}"
+        " bytes per channel"
+    )
+    for name, stmt in [
+        ("collect, dicts", lambda: collect_dicts(dsinfo)),
+        ("build ChannelTable", lambda: ChannelTable(dsinfo, COLUMNS)),
+        ("collect, ChannelTable", lambda: collect_table(table)),
+    ]:
+        print(f"{name:>32}: {per_channel(stmt) * 1e9:8.0f} ns per channel")
+
+
+if __name__ == "__main__":
+    main()
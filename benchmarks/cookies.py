@@ -0,0 +1,58 @@
+"""
+Compare the per-request cost of cookie handling in hitron.Client, using
+hitron.CookieStore, with the urllib.request/http.cookiejar shim that it replaced.
+
+Run with: python benchmarks/cookies.py
+"""
+
+import http.cookiejar
+import timeit
+from urllib.parse import urlsplit
+import urllib.request
+
+import urllib3
+
+from hitron_exporter.hitron import CookieStore
+
+
+URL = "https://192.0.2.1:443/data/getSysInfo.asp"
+
+RESPONSE = urllib3.HTTPResponse(
+    body=b"",
+    headers={"Set-Cookie": "session=0123456789abcdef; path=/; HttpOnly"},
+    status=200,
+    preload_content=False,
+)
+
+
+def cookiejar_shim(jar: http.cookiejar.CookieJar) -> None:
+    dummy_request = urllib.request.Request(URL, headers={})
+    jar.add_cookie_header(dummy_request)
+    _ = dict(dummy_request.header_items())
+    jar.extract_cookies(RESPONSE, dummy_request)  # type: ignore [arg-type]
+    _ = next(c for c in jar if c.name == "session")
+
+
+def cookie_store(store: CookieStore) -> None:
+    host = urlsplit(URL).hostname or ""
+    headers = {}
+    if cookie := store.header(host):
+        headers["Cookie"] = cookie
+    store.extract(host, RESPONSE.headers.getlist("Set-Cookie"))
+    _ = store.get(host, "session")
+
+
+def main() -> None:
+    jar = http.cookiejar.CookieJar()
+    store = CookieStore()
+    for name, stmt in [
+        ("CookieJar shim", lambda: cookiejar_shim(jar)),
+        ("CookieStore", lambda: cookie_store(store)),
+    ]:
+        number, _ = timeit.Timer(stmt).autorange()
+        best = min(timeit.repeat(stmt, number=number, repeat=5)) / number
+        print(f"{name:>15}: {best * 1e6:8.2f} µs per request")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,54 @@
+"""
+Compare the peak memory and time taken to decode a large CONNECTINFO response by
+preloading the body and calling json.loads on it (as get_data used to) against
+hitron.read_json, which decodes the body as it is streamed.
+
+Run with: python benchmarks/decoding.py [hosts]
+"""
+
+import io
+import json
+import sys
+import timeit
+import tracemalloc
+from typing import Any, Callable
+
+import urllib3
+
+from hitron_exporter.hitron import MAX_BODY_SIZE, Client, read_json
+import sample_data
+
+
+def preloaded(body: io.BytesIO) -> Any:
+    response = urllib3.HTTPResponse(body, preload_content=True)
+    return json.loads(response.data)
+
+
+def streamed(body: io.BytesIO) -> Any:
+    response = urllib3.HTTPResponse(body, preload_content=False)
+    return read_json(response, MAX_BODY_SIZE * 64, "bench")
+
+
+def measure(fn: Callable[[io.BytesIO], Any], data: bytes) -> tuple[float, int]:
+    # Timed separately, since tracing allocations slows everything down
+    elapsed = min(timeit.repeat(lambda: fn(io.BytesIO(data)), number=1, repeat=5))
+    body = io.BytesIO(data)
+    tracemalloc.start()
+    fn(body)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return elapsed, peak
+
+
+def main() -> None:
+    hosts = int(sys.argv[1]) if len(sys.argv) > 1 else 2000
+    connectinfo = sample_data.datasets(hosts=hosts)[Client.Dataset.CONNECTINFO]
+    data = json.dumps(connectinfo).encode("utf-8")
+    print(f"CONNECTINFO with {hosts} hosts: {len(data)} bytes")
+    for name, fn in [("preloaded", preloaded), ("streamed", streamed)]:
+        elapsed, peak = measure(fn, data)
+        print(f"{name:>10}: {elapsed * 1e3:8.1f} ms, peak {peak / 1024:8.0f} KiB")
+
+
+if __name__ == "__main__":
+    main()
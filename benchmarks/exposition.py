@@ -0,0 +1,53 @@
+"""
+Compare turning a probe's Collector into a Flask response with
+hitron_exporter.exposition against the previous approach of registering the Collector
+with a new CollectorRegistry and returning the WSGI app made by make_wsgi_app, which
+Flask then has to call.
+
+Run with: python benchmarks/exposition.py
+"""
+
+import timeit
+from typing import Callable
+
+import flask
+import prometheus_client
+
+from hitron_exporter import Collector, app, exposition
+import sample_data
+
+
+def registry_and_wsgi_app(collector: Collector) -> flask.Response:
+    reg = prometheus_client.CollectorRegistry()
+    reg.register(collector)
+    return app.make_response(prometheus_client.make_wsgi_app(reg))
+
+
+def direct(collector: Collector) -> flask.Response:
+    rendered = exposition.render(
+        collector,
+        flask.request.headers.get("Accept"),
+        flask.request.headers.get("Accept-Encoding"),
+    )
+    return app.make_response(flask.Response(rendered.body, headers=rendered.headers))
+
+
+def main() -> None:
+    collector = Collector.from_data(sample_data.datasets())
+    for accept_encoding in ["identity", "gzip"]:
+        with app.test_request_context(
+            "/probe", headers={"Accept-Encoding": accept_encoding}
+        ):
+            for name, fn in [
+                ("registry + WSGI app", registry_and_wsgi_app),
+                ("direct", direct),
+            ]:
+                stmt: Callable[[], bytes] = lambda: fn(collector).get_data()
+                number, _ = timeit.Timer(stmt).autorange()
+                best = min(timeit.repeat(stmt, number=number, repeat=5)) / number
+                label = f"{name} ({accept_encoding})"
+                print(f"{label:>30}: {best * 1e6:8.1f} µs, {len(stmt())} bytes")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,326 @@
+"""
+A fake Hitron CGNV4 web server, for measuring the exporter's throughput without a
+roomful of modems.
+
+Run with: python benchmarks/fakemodem.py --modems 200 --latency 0.05
+
+Each simulated modem listens on its own port (counting up from --port) and behaves
+like the real thing, as far as the exporter can tell: it uses TLS with a self-signed
+certificate, sets a preSession cookie, allows only one session to be logged in at a
+time (answering "Repeat Login" unless asked to log the other one off), redirects data
+requests to the login page once a session has expired or been logged out, and serves
+every dataset with the given number of channels.
+
+Probe a simulated modem with the exporter's hidden _port parameter, e.g.:
+/probe?target=127.0.0.1&_port=4431&fingerprint=...&usr=cusadmin&pwd=password
+"""
+
+import argparse
+import asyncio
+from collections import Counter
+from dataclasses import dataclass, field
+import email.parser
+import email.policy
+from http import HTTPStatus
+from http.cookies import SimpleCookie
+import json
+import random
+import secrets
+import ssl
+import sys
+import time
+from typing import Optional
+from urllib.parse import parse_qsl
+
+import trustme
+
+from hitron_exporter.hitron import fingerprint
+import sample_data
+
+
+@dataclass
+class Config:
+    usr: str
+    pwd: str
+    # Seconds of inactivity after which a session expires
+    session_timeout: float
+    # Seconds added to every response, plus up to jitter more
+    latency: float
+    jitter: float
+    # Connections beyond this many are closed without a response
+    max_connections: int
+    # Response bodies of each dataset's path
+    data: dict[str, bytes]
+
+
+@dataclass
+class Request:
+    method: str
+    path: str
+    headers: dict[str, str]
+    body: bytes
+
+    def cookies(self) -> dict[str, str]:
+        cookie = SimpleCookie(self.headers.get("cookie", ""))
+        return {name: morsel.value for name, morsel in cookie.items()}
+
+    def form(self) -> dict[str, str]:
+        content_type = self.headers.get("content-type", "")
+        if content_type.startswith("multipart/form-data"):
+            message = email.parser.BytesParser(policy=email.policy.HTTP).parsebytes(
+                f"Content-Type: {content_type}\r\n\r\n".encode("latin-1") + self.body
+            )
+            return {
+                part.get_param(
+                    "name", header="content-disposition"
+                ): part.get_content().strip()
+                for part in message.iter_parts()
+            }
+        return dict(parse_qsl(self.body.decode("utf-8")))
+
+
+@dataclass
+class Response:
+    status: HTTPStatus
+    body: bytes = b""
+    content_type: str = "text/html"
+    headers: list[tuple[str, str]] = field(default_factory=list)
+
+    def encode(self) -> bytes:
+        lines = [
+            f"HTTP/1.1 {self.status.value} {self.status.phrase}",
+            f"Content-Type: {self.content_type}",
+            f"Content-Length: {len(self.body)}",
+            *(f"{name}: {value}" for name, value in self.headers),
+            "",
+            "",
+        ]
+        return "\r\n".join(lines).encode("latin-1") + self.body
+
+
+def _redirect(location: str, *headers: tuple[str, str]) -> Response:
+    return Response(HTTPStatus.FOUND, headers=[("Location", location), *headers])
+
+
+class Modem:
+    """
+    The state of one simulated modem.
+    """
+
+    def __init__(self, config: Config, stats: Counter[str]) -> None:
+        self.__config = config
+        self.__stats = stats
+        self.__presessions: set[str] = set()
+        # The token of the logged in session, and when it expires
+        self.__session: Optional[tuple[str, float]] = None
+        self.__connections = 0
+
+    async def serve(
+        self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter
+    ) -> None:
+        if self.__connections >= self.__config.max_connections:
+            self.__stats["refused"] += 1
+            writer.close()
+            return
+        self.__connections += 1
+        try:
+            while request := await _read_request(reader):
+                delay = self.__config.latency + random.uniform(  # nosec B311
+                    0, self.__config.jitter
+                )
+                if delay:
+                    await asyncio.sleep(delay)
+                response = self.handle(request)
+                self.__stats[str(response.status.value)] += 1
+                writer.write(response.encode())
+                await writer.drain()
+                if request.headers.get("connection", "").lower() == "close":
+                    break
+        except (ConnectionError, ssl.SSLError, asyncio.IncompleteReadError):
+            self.__stats["errors"] += 1
+        finally:
+            self.__connections -= 1
+            writer.close()
+
+    def handle(self, request: Request) -> Response:
+        path = request.path.split("?", 1)[0]
+        if request.method == "GET" and path in ("/", "/login.html"):
+            return self.__index()
+        if request.method == "POST" and path == "/goform/login":
+            return self.__login(request)
+        if request.method == "POST" and path == "/goform/logout":
+            return self.__logout(request)
+        if request.method == "GET" and (data := self.__config.data.get(path)):
+            if not self.__logged_in(request):
+                return _redirect("/login.html")
+            return Response(HTTPStatus.OK, data, "application/json")
+        return Response(HTTPStatus.NOT_FOUND, b"Not Found")
+
+    def __index(self) -> Response:
+        presession = secrets.token_hex(8)
+        # Forget presessions that were never used to log in, as the modem would
+        if len(self.__presessions) >= 64:
+            self.__presessions.clear()
+        self.__presessions.add(presession)
+        return Response(
+            HTTPStatus.OK,
+            b"<html><body>Login</body></html>",
+            headers=[("Set-Cookie", f"preSession={presession}; path=/")],
+        )
+
+    def __login(self, request: Request) -> Response:
+        form = request.form()
+        if form.get("preSession") not in self.__presessions:
+            return Response(HTTPStatus.OK, b"session timeout expired")
+        self.__presessions.discard(form["preSession"])
+        if (form.get("usr"), form.get("pwd")) != (
+            self.__config.usr,
+            self.__config.pwd,
+        ):
+            return Response(HTTPStatus.OK, b"Wrong Credentials.")
+        if self.__session_active() and form.get("forcelogoff") != "1":
+            return Response(HTTPStatus.OK, b"Repeat Login")
+        token = secrets.token_hex(16)
+        self.__session = (token, time.monotonic() + self.__config.session_timeout)
+        return Response(
+            HTTPStatus.OK,
+            b"success",
+            headers=[("Set-Cookie", f"session={token}; path=/")],
+        )
+
+    def __logout(self, request: Request) -> Response:
+        if self.__logged_in(request):
+            self.__session = None
+        return _redirect("/login.html", ("Set-Cookie", "session=; path=/; Max-Age=0"))
+
+    def __session_active(self) -> bool:
+        return self.__session is not None and self.__session[1] > time.monotonic()
+
+    def __logged_in(self, request: Request) -> bool:
+        if not self.__session_active():
+            return False
+        assert self.__session is not None
+        token = self.__session[0]
+        if request.cookies().get("session") != token:
+            return False
+        # Activity keeps the session alive
+        self.__session = (token, time.monotonic() + self.__config.session_timeout)
+        return True
+
+
+async def _read_request(reader: asyncio.StreamReader) -> Optional[Request]:
+    request_line = await reader.readline()
+    if not request_line.strip():
+        return None
+    method, path, _ = request_line.decode("latin-1").split(" ", 2)
+    headers = {}
+    while (line := await reader.readline()) not in (b"\r\n", b"\n", b""):
+        name, _, value = line.decode("latin-1").partition(":")
+        headers[name.strip().lower()] = value.strip()
+    body = await reader.readexactly(int(headers.get("content-length", "0")))
+    return Request(method, path, headers, body)
+
+
+def _datasets(downstream: int, upstream: int, hosts: int) -> dict[str, bytes]:
+    return {
+        f"/{dataset.path()}": json.dumps(data).encode("utf-8")
+        for dataset, data in sample_data.datasets(downstream, upstream, hosts).items()
+    }
+
+
+def _ssl_context() -> tuple[ssl.SSLContext, str]:
+    """
+    Returns a server context with a self-signed certificate resembling the modem's, and
+    the fingerprint of the certificate.
+    """
+    cert = trustme.CA().issue_cert(common_name="02:00:00:00:00:00")
+    context = ssl.SSLContext(ssl.PROTOCOL_TLS_SERVER)
+    cert.configure_cert(context)
+    der = ssl.PEM_cert_to_DER_cert(cert.cert_chain_pems[0].bytes().decode("ascii"))
+    return context, fingerprint(der)
+
+
+async def serve(args: argparse.Namespace) -> None:
+    config = Config(
+        usr=args.usr,
+        pwd=args.pwd,
+        session_timeout=args.session_timeout,
+        latency=args.latency,
+        jitter=args.jitter,
+        max_connections=args.max_connections,
+        data=_datasets(args.downstream, args.upstream, args.hosts),
+    )
+    ssl_context, fpr = _ssl_context()
+    stats: Counter[str] = Counter()
+    servers = [
+        await asyncio.start_server(
+            Modem(config, stats).serve,
+            args.address,
+            args.port + n,
+            ssl=ssl_context,
+            backlog=args.max_connections * 2,
+        )
+        for n in range(args.modems)
+    ]
+    print(
+        (
+            f"{args.modems} modem(s) listening on {args.address} ports"
+            f" {args.port}-{args.port + args.modems - 1}"
+        ),
+        f"Certificate fingerprint: {fpr}",
+        sep="\n",
+        flush=True,
+    )
+
+    try:
+        while True:
+            await asyncio.sleep(args.report_interval)
+            if stats:
+                print(
+                    " ".join(f"{k}={v}" for k, v in sorted(stats.items())), flush=True
+                )
+                stats.clear()
+    finally:
+        for server in servers:
+            server.close()
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--modems", type=int, default=1)
+    parser.add_argument("--address", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=4431, help="of the first modem")
+    parser.add_argument("--usr", default="cusadmin")
+    parser.add_argument("--pwd", default="password")
+    parser.add_argument("--downstream", type=int, default=24, help="channels")
+    parser.add_argument("--upstream", type=int, default=4, help="channels")
+    parser.add_argument("--hosts", type=int, default=4, help="in CONNECTINFO")
+    parser.add_argument(
+        "--latency", type=float, default=0.0, help="seconds added to each response"
+    )
+    parser.add_argument(
+        "--jitter", type=float, default=0.0, help="up to this many more seconds"
+    )
+    parser.add_argument(
+        "--max-connections", type=int, default=4, help="concurrent, per modem"
+    )
+    parser.add_argument(
+        "--session-timeout", type=float, default=300.0, help="seconds of inactivity"
+    )
+    parser.add_argument(
+        "--report-interval",
+        type=float,
+        default=10.0,
+        help="seconds between reports of the responses sent",
+    )
+    args = parser.parse_args()
+
+    try:
+        asyncio.run(serve(args))
+    except KeyboardInterrupt:
+        pass
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,79 @@
+"""
+Compare the parsers in hitron_exporter.parsers with the implementations they replaced
+(patterns compiled on each call, time.strptime for the clock, and bpiStatus split on
+every collection).
+
+Run with: python benchmarks/parsers.py
+"""
+
+from calendar import timegm
+import datetime
+import re
+import time
+import timeit
+from typing import Any, Callable
+
+from hitron_exporter import parsers
+
+
+def previous_uptime(uptime: str) -> float:
+    m = re.match(r"(\d+) Days,(\d+) Hours,(\d+) Minutes,(\d+) Seconds", uptime)
+    assert m
+    return datetime.timedelta(
+        days=int(m.group(1)),
+        hours=int(m.group(2)),
+        minutes=int(m.group(3)),
+        seconds=int(m.group(4)),
+    ).total_seconds()
+
+
+def previous_clock(clock: str) -> float:
+    return timegm(time.strptime(clock, "%a %b %d, %Y, %H:%M:%S"))
+
+
+def previous_pkt(pkt: str) -> float:
+    m = re.match(r"(\d+(?:\.\d+)?)([A-Z]?) Bytes", pkt)
+    assert m
+    factor = {"": 1, "K": 1e3, "M": 1e6, "G": 1e9}[m.group(2)]
+    return float(m.group(1)) * factor
+
+
+def previous_bpi(bpi_status: str) -> dict[str, str]:
+    bpi = {}
+    for element in bpi_status.split(","):
+        k, _, v = element.strip().partition(":")
+        bpi[k.lower()] = v.lower()
+    return bpi
+
+
+CASES: list[tuple[str, str, Callable[[str], Any], Callable[[str], Any]]] = [
+    (
+        "uptime",
+        "10 Days,17 Hours,33 Minutes,47 Seconds",
+        previous_uptime,
+        parsers.parse_duration,
+    ),
+    ("clock", "Fri Jun 17, 2022, 17:09:10", previous_clock, parsers.parse_clock),
+    ("pkt", "40.14M Bytes", previous_pkt, parsers.parse_pkt),
+    ("bpi", "AUTH:authorized, TEK:operational", previous_bpi, parsers.parse_bpi),
+]
+
+
+def measure(stmt: Callable[[], Any]) -> float:
+    number, _ = timeit.Timer(stmt).autorange()
+    return min(timeit.repeat(stmt, number=number, repeat=5)) / number
+
+
+def main() -> None:
+    for name, value, previous, current in CASES:
+        assert previous(value) == current(value)
+        before = measure(lambda: previous(value))
+        after = measure(lambda: current(value))
+        print(
+            f"{name:>8}: {before * 1e6:6.2f} µs -> {after * 1e6:6.2f} µs"
+            f" ({before / after:4.1f}× faster)"
+        )
+
+
+if __name__ == "__main__":
+    main()
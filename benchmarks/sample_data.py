@@ -0,0 +1,101 @@
+"""
+Datasets resembling those returned by a real modem, for use by the benchmarks.
+"""
+
+from typing import Any
+
+from hitron_exporter.hitron import Client
+
+
+def datasets(
+    downstream: int = 24, upstream: int = 4, hosts: int = 4
+) -> dict[Client.Dataset, Any]:
+    return {
+        Client.Dataset.USER_TYPE: {"UserType": "1"},
+        Client.Dataset.SYSTEM_MODEL: {"modelName": "CGNV4-FX4", "skipWizard": "1"},
+        Client.Dataset.SYSINFO: [
+            {
+                "LRecPkt": "12.12M Bytes",
+                "LSendPkt": "40.14M Bytes",
+                "WRecPkt": "40.25M Bytes",
+                "WSendPkt": "11.77M Bytes",
+                "aftrAddr": "",
+                "aftrName": "",
+                "delegatedPrefix": "",
+                "hwVersion": "2D",
+                "lanIPv6Addr": "",
+                "lanIp": "192.0.2.0/24",
+                "rfMac": "84:0B:7C:01:02:03",
+                "serialNumber": "ABC123",
+                "swVersion": "4.5.10.201-CD-UPC",
+                "systemTime": "Fri Jun 17, 2022, 17:09:10",
+                "systemUptime": "10 Days,17 Hours,33 Minutes,47 Seconds",
+                "timezone": "1",
+                "wanIp": "203.0.113.1/24",
+            }
+        ],
+        Client.Dataset.CMINIT: [
+            {
+                "bpiStatus": "AUTH:authorized, TEK:operational",
+                "dhcp": "Success",
+                "downloadCfg": "Success",
+                "eaeStatus": "Secret",
+                "findDownstream": "Success",
+                "hwInit": "Success",
+                "networkAccess": "Permitted",
+                "ranging": "Success",
+                "registration": "Success",
+                "timeOfday": "Secret",
+                "trafficStatus": "Enable",
+            }
+        ],
+        Client.Dataset.DSINFO: [
+            {
+                "channelId": str(n + 1),
+                "frequency": str(362250000 + n * 8000000),
+                "modulation": "2",
+                "portId": str(n + 1),
+                "signalStrength": f"{16 + n % 10 / 10:.3f}",
+                "snr": f"{40 + n % 7 / 10:.3f}",
+            }
+            for n in range(downstream)
+        ],
+        Client.Dataset.CMDOCSISWAN: [
+            {
+                "CmGateway": "10.252.220.1",
+                "CmIpAddress": "10.252.220.125",
+                "CmIpLeaseDuration": "04 Days,09 Hours,47 Minutes,10 Seconds",
+                "CmNetMask": "255.255.252.0",
+                "Configname": "Secret",
+                "NetworkAccess": "Permitted",
+            }
+        ],
+        Client.Dataset.USINFO: [
+            {
+                "bandwidth": "6400000",
+                "channelId": str(n + 1),
+                "frequency": str(25800000 + n * 6800000),
+                "portId": str(n + 1),
+                "scdmaMode": "ATDMA",
+                "signalStrength": f"{35 + n % 4 / 4:.3f}",
+            }
+            for n in range(upstream)
+        ],
+        Client.Dataset.CONNECTINFO: [
+            {
+                "comnum": n + 1,
+                "connectType": "DHCP-IP",
+                "hostName": f"host{n}",
+                "id": n + 1,
+                "interface": "Ethernet" if n % 3 else "2.4G",
+                "ipAddr": f"192.0.2.{n % 254 + 1}",
+                "ipType": "IPv6" if n % 4 == 3 else "IPv4",
+                "macAddr": (
+                    f"76:77:47:{n >> 16 & 0xff:02X}:{n >> 8 & 0xff:02X}:{n & 0xff:02X}"
+                ),
+                "online": "inactive" if n % 7 == 6 else "active",
+            }
+            for n in range(hosts)
+        ],
+        Client.Dataset.TUNEFREQ: [{"tunefreq": "426.250"}],
+    }
@@ -0,0 +1,99 @@
+"""
+Measure the cold start of the exporter: the time taken to import it and answer its
+first request, and the memory used, each in a fresh interpreter (as a newly started
+container or gunicorn worker would be).
+
+Run with: python benchmarks/startup.py [--runs 10] [--imports 15]
+
+With --imports, also lists the modules whose imports (including those they import
+in turn) took longest, according to python -X importtime.
+"""
+
+import argparse
+import json
+import statistics
+import subprocess  # nosec B404
+import sys
+import time
+
+
+# Run in each fresh interpreter; prints its measurements as JSON
+CHILD = """
+import json, resource, sys, time
+start = time.perf_counter()
+import hitron_exporter
+imported = time.perf_counter()
+hitron_exporter.app.test_client().get("/metrics")
+served = time.perf_counter()
+with open("/proc/self/statm") as f:
+    rss_pages = int(f.read().split()[1])
+print(json.dumps({
+    "import": imported - start,
+    "first_request": served - imported,
+    "rss": rss_pages * resource.getpagesize(),
+    "max_rss": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024,
+    "modules": len(sys.modules),
+}))
+"""
+
+
+def run_child() -> dict[str, float]:
+    start = time.perf_counter()
+    proc = subprocess.run(  # nosec B603
+        [sys.executable, "-c", CHILD],
+        stdout=subprocess.PIPE,
+        stderr=subprocess.DEVNULL,
+        check=True,
+        text=True,
+    )
+    result: dict[str, float] = json.loads(proc.stdout)
+    result["process"] = time.perf_counter() - start
+    return result
+
+
+def slowest_imports(count: int) -> list[tuple[int, str]]:
+    proc = subprocess.run(  # nosec B603
+        [sys.executable, "-X", "importtime", "-c", "import hitron_exporter"],
+        stdout=subprocess.DEVNULL,
+        stderr=subprocess.PIPE,
+        check=True,
+        text=True,
+    )
+    imports = []
+    for line in proc.stderr.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        _, cumulative, name = line.split("|")
+        imports.append((int(cumulative), name.rstrip()))
+    return sorted(imports, reverse=True)[:count]
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--runs", type=int, default=10)
+    parser.add_argument("--imports", type=int, default=0, metavar="N")
+    args = parser.parse_args()
+
+    results = [run_child() for _ in range(args.runs)]
+    for key, label in [
+        ("process", "process (incl. interpreter)"),
+        ("import", "import hitron_exporter"),
+        ("first_request", "first request"),
+    ]:
+        values = [r[key] for r in results]
+        print(
+            f"{label:>28}: median {statistics.median(values) * 1e3:7.1f} ms,"
+            f" min {min(values) * 1e3:7.1f} ms"
+        )
+    print(f"{'RSS after first request':>28}: {results[-1]['rss'] / 2**20:7.1f} MiB")
+    print(f"{'peak RSS':>28}: {results[-1]['max_rss'] / 2**20:7.1f} MiB")
+    print(f"{'modules loaded':>28}: {results[-1]['modules']:7.0f}")
+
+    if args.imports:
+        print("\nSlowest imports (cumulative µs):")
+        for cumulative, name in slowest_imports(args.imports):
+            print(f"{cumulative:10} {name}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,243 @@
+"""
+Benchmarks of the collection and parsing hot paths, which need no modem: HTTP requests
+are made to a local HTTPS server.
+
+Run with: python benchmarks/suite.py
+
+Results are compared with those stored in baseline.json, and the run fails if any
+benchmark is more than --threshold times slower (--micro-threshold for benchmarks that
+take less than 10 µs, and those in NOISY, whose timings vary more). To make results
+from different machines comparable, times are stored relative to a fixed pure Python
+workload, which is timed before and after each benchmark so that changes in the speed
+of the machine during the run (other load, frequency scaling) affect both alike. A benchmark that
+appears to have regressed is measured again, and only fails if it is still slower.
+After a change that is expected to alter performance, update the baseline with --save,
+which stores the median of several measurements of each benchmark.
+"""
+
+import argparse
+from contextlib import ExitStack
+import http.server
+import json
+import logging
+from pathlib import Path
+import ssl
+import statistics
+import sys
+import threading
+import timeit
+from typing import Any, Callable, Iterator
+
+import trustme
+import urllib3
+
+from hitron_exporter import Collector, exposition, parsers
+from hitron_exporter.hitron import Client
+import sample_data
+
+
+BASELINE = Path(__file__).with_name("baseline.json")
+
+Benchmark = Callable[[], Any]
+
+
+def calibration() -> None:
+    total = 0
+    for i in range(10000):
+        total += len(str(i * 3.5))
+    sorted({str(i): i for i in range(2000)}.items())
+
+
+class KeepAliveHandler(http.server.BaseHTTPRequestHandler):
+    """
+    Answers every GET with body, keeping the connection alive as the modem does, so
+    that http_request measures requests rather than TLS handshakes.
+    """
+
+    protocol_version = "HTTP/1.1"
+    disable_nagle_algorithm = True
+    body = b""
+
+    def do_GET(self) -> None:  # pylint: disable=invalid-name
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(self.body)))
+        self.end_headers()
+        self.wfile.write(self.body)
+
+    def log_message(self, *args: Any) -> None:
+        pass
+
+
+def serve(stack: ExitStack, body: bytes) -> int:
+    """
+    Start a local HTTPS server that answers with body, and return its port.
+    """
+    ca = trustme.CA()
+    ssl_context = ssl.SSLContext(ssl.PROTOCOL_TLS_SERVER)
+    ca.issue_cert(common_name="02:00:00:00:00:00").configure_cert(ssl_context)
+    handler = type("Handler", (KeepAliveHandler,), {"body": body})
+    server = http.server.ThreadingHTTPServer(("localhost", 0), handler)
+    server.socket = ssl_context.wrap_socket(server.socket, server_side=True)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    stack.callback(server.server_close)
+    stack.callback(server.shutdown)
+    return server.server_address[1]
+
+
+def benchmarks(stack: ExitStack) -> Iterator[tuple[str, Benchmark]]:
+    yield "parse_uptime", lambda: Collector.parse_uptime(
+        "10 Days,17 Hours,33 Minutes,47 Seconds"
+    )
+    yield "parse_clock", lambda: Collector.parse_clock("Fri Jun 17, 2022, 17:09:10")
+    yield "parse_pkt", lambda: Collector.parse_pkt("40.14M Bytes")
+    yield "parse_bpi", lambda: parsers.parse_bpi("AUTH:authorized, TEK:operational")
+
+    realistic = sample_data.datasets()
+    large = sample_data.datasets(downstream=1024, upstream=64)
+    collector = Collector.from_data(realistic)
+    yield "collect_docsis", lambda: list(collector.collect_docsis())
+    yield "collect_realistic", lambda: list(Collector.from_data(realistic).collect())
+    yield "collect_large", lambda: list(Collector.from_data(large).collect())
+
+    lan = sample_data.datasets(hosts=10000)
+    yield "collect_hosts", lambda: list(Collector.from_data(lan, ["hosts"]).collect())
+    yield "collect_hosts_top", lambda: list(
+        Collector.from_data(lan, ["hosts"], max_hosts=100).collect()
+    )
+
+    yield "render_text", lambda: b"".join(exposition.render(collector).body)
+    yield "render_openmetrics", lambda: b"".join(
+        exposition.render(collector, accept="application/openmetrics-text").body
+    )
+    yield "render_gzip", lambda: b"".join(
+        exposition.render(collector, accept_encoding="gzip").body
+    )
+
+    port = serve(stack, json.dumps(realistic[Client.Dataset.SYSINFO]).encode())
+    client = Client("localhost", fingerprint=None, port=port)
+    url = f"https://localhost:{port}/data/getSysInfo.asp"
+    yield "http_request", lambda: client.http_request("GET", url)
+
+
+# Benchmarks quicker than this are held to --micro-threshold
+MICRO = 10e-6
+
+# Benchmarks also held to --micro-threshold: those that allocate so much that their
+# speed depends on the memory bandwidth left over by the rest of the machine (which
+# the calibration workload doesn't measure), and one that involves another thread
+NOISY = frozenset(
+    ["collect_large", "collect_hosts", "collect_hosts_top", "http_request"]
+)
+
+# How many more times a benchmark that appears to have regressed is measured
+RETRIES = 4
+
+
+def measure(fn: Benchmark) -> float:
+    """
+    The best of several runs, in seconds per call.
+    """
+    number, _ = timeit.Timer(fn).autorange()
+    return min(timeit.repeat(fn, number=number, repeat=5)) / number
+
+
+class Calibrated:
+    """
+    Measures benchmarks in units of the calibration workload, timed just before and
+    after each one.
+    """
+
+    def __init__(self) -> None:
+        self.__unit = measure(calibration)
+
+    def measure(self, fn: Benchmark) -> tuple[float, float]:
+        """
+        Seconds per call, and the same in units of the calibration workload.
+        """
+        before = self.__unit
+        seconds = measure(fn)
+        self.__unit = measure(calibration)
+        return seconds, seconds / ((before + self.__unit) / 2)
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument(
+        "--threshold",
+        type=float,
+        default=1.25,
+        help="fail if a benchmark is this many times slower than the baseline",
+    )
+    parser.add_argument(
+        "--micro-threshold",
+        type=float,
+        default=1.5,
+        help=(
+            f"the threshold for benchmarks that take less than {MICRO * 1e6:.0f} µs,"
+            " and those in NOISY"
+        ),
+    )
+    parser.add_argument(
+        "--save", action="store_true", help="store the results as the new baseline"
+    )
+    parser.add_argument("names", nargs="*", help="only run these benchmarks")
+    args = parser.parse_args()
+
+    # The insecure communication warnings would get in the way
+    logging.disable(logging.WARNING)
+    urllib3.disable_warnings(urllib3.exceptions.InsecureRequestWarning)
+
+    baseline = json.loads(BASELINE.read_text()) if BASELINE.exists() else {}
+    calibrated = Calibrated()
+    results: dict[str, float] = {}
+    regressions = []
+    with ExitStack() as stack:
+        for name, fn in benchmarks(stack):
+            if args.names and name not in args.names:
+                continue
+            seconds, results[name] = calibrated.measure(fn)
+            if args.save:
+                results[name] = statistics.median(
+                    [results[name]]
+                    + [calibrated.measure(fn)[1] for _ in range(RETRIES)]
+                )
+                print(f"{name:>20}: {seconds * 1e6:10.1f} µs")
+                continue
+            if seconds < MICRO or name in NOISY:
+                threshold = args.micro_threshold
+            else:
+                threshold = args.threshold
+            base = baseline.get(name)
+            for _ in range(RETRIES):
+                if base is None or results[name] / base <= threshold:
+                    break
+                seconds, relative = calibrated.measure(fn)
+                results[name] = min(results[name], relative)
+            line = f"{name:>20}: {seconds * 1e6:10.1f} µs"
+            if base is not None:
+                ratio = results[name] / base
+                line += f"  {ratio:6.2f}× baseline"
+                if ratio > threshold:
+                    regressions.append(name)
+                    line += "  REGRESSION"
+            print(line)
+
+    if args.save:
+        BASELINE.write_text(json.dumps({**baseline, **results}, indent=2) + "\n")
+        print(f"Saved baseline to {BASELINE}")
+        return 0
+    if regressions:
+        print(
+            (
+                f"{len(regressions)} benchmark(s) slower than their threshold:"
+                f" {', '.join(regressions)}"
+            ),
+            file=sys.stderr,
+        )
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,15 @@
+"""
+Gunicorn server hooks for the exporter. Gunicorn reads this file from its working
+directory; settings are given in GUNICORN_CMD_ARGS.
+"""
+
+import gc
+
+
+def pre_fork(server, worker):  # pylint: disable=unused-argument
+    # Under --preload, the exporter is imported once by the master process and the
+    # workers are forked from it, sharing its memory until they write to it. The
+    # objects created by importing live as long as the process does, so take them
+    # out of the garbage collector's sight; otherwise every collection in every
+    # worker would write to them, and copy the pages they are on.
+    gc.freeze()
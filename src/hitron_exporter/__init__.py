@@ -1,10 +1,25 @@
-from calendar import timegm
-import datetime
+import atexit
+from concurrent.futures import (
+    Executor,
+    FIRST_COMPLETED,
+    Future,
+    ThreadPoolExecutor,
+    wait,
+)
+import contextvars
+import functools
 import time
-from importlib import metadata
 from logging import getLogger
-import re
-from typing import Iterator, Optional, TypedDict
+import threading
+from typing import (
+    Any,
+    Callable,
+    Iterable,
+    Iterator,
+    Mapping,
+    NamedTuple,
+    Optional,
+)
 
 import flask
 from prometheus_flask_exporter import PrometheusMetrics  # type: ignore [import]
@@ -15,88 +30,836 @@ from prometheus_client.core import (
     GaugeMetricFamily,
     InfoMetricFamily,
 )
+from werkzeug.datastructures import MultiDict
 
 from . import log_config
 
 log_config.config_early()
 
+from . import channels  # noqa: E402
+from . import exposition  # noqa: E402
 from . import hitron  # noqa: E402
+from . import hosts  # noqa: E402
+from . import parsers  # noqa: E402
 from . import ipavault  # noqa: E402
+from . import poller  # noqa: E402
+from . import profiling  # noqa: E402
+from . import sessions  # noqa: E402
+from . import singleflight  # noqa: E402
+from . import timing  # noqa: E402
+
 
+LOGGER = getLogger(__name__)
 
-AppGlobals = TypedDict(
-    "AppGlobals", {"ipavault_credentials": Optional[ipavault.Credential]}
+app = flask.Flask(__name__)
+app.config.from_mapping(
+    # Keep modem sessions logged in between probes instead of logging in and out
+    # every time. Note that while a session is kept open, nobody else can log in to
+    # the modem's web interface without using force.
+    SESSION_REUSE=False,
+    SESSION_IDLE_TIMEOUT=300,
+    SESSION_MAX=64,
+    # Datasets are fetched from the modem in parallel by a pool of FETCH_WORKERS
+    # threads shared by all probes; no more than FETCH_CONCURRENCY requests are made
+    # to any one modem at a time.
+    FETCH_WORKERS=16,
+    FETCH_CONCURRENCY=3,
+    # Seconds for which each dataset (named as in hitron.Client.Dataset) is cached
+    # between probes; datasets not listed are fetched every time. Up to
+    # CACHE_MAX_ENTRIES datasets are cached, across all targets.
+    CACHE_TTL={},
+    CACHE_MAX_ENTRIES=1024,
+    # Bytes beyond which a dataset's response is abandoned, so that a misbehaving
+    # modem can't make the exporter run out of memory (by default,
+    # hitron.MAX_BODY_SIZE).
+    MAX_RESPONSE_SIZE=None,
+    # Targets to poll in the background, each a mapping of probe parameters plus an
+    # optional "interval" in seconds. Probes for these targets are answered with the
+    # results of the most recent poll. Data older than POLL_MAX_AGE intervals is not
+    # served.
+    POLL_TARGETS=[],
+    POLL_INTERVAL=30,
+    POLL_WORKERS=4,
+    POLL_JITTER=0.1,
+    POLL_MAX_AGE=3,
+    # Probes of several targets at once (/probe?target=a&target=b) are collected by a
+    # pool of BATCH_WORKERS threads.
+    BATCH_WORKERS=8,
+    # Seconds for which credentials retrieved from a FreeIPA vault are used before
+    # being retrieved again. After VAULT_REFRESH_AFTER (a fraction of
+    # VAULT_CACHE_TTL) they are refreshed in the background. Credentials for the
+    # namespaces in VAULT_NAMESPACES (and those of POLL_TARGETS) are retrieved when
+    # the exporter starts.
+    VAULT_CACHE_TTL=3600,
+    VAULT_REFRESH_AFTER=0.75,
+    VAULT_NAMESPACES=[],
+    # Retrieve credentials through a single long-lived ipa console process, rather
+    # than starting a new one for every retrieval. It is restarted if it takes longer
+    # than VAULT_WORKER_TIMEOUT seconds to answer.
+    VAULT_WORKER=True,
+    VAULT_WORKER_TIMEOUT=60,
+    # Trace each probe with OpenTelemetry (which must be installed and configured
+    # separately, e.g., with opentelemetry-instrument).
+    TRACING=False,
+    # Named sets of collectors (see COLLECTORS), which a probe can select with the
+    # module parameter, e.g., {"rf": ["usinfo", "dsinfo"]}.
+    MODULES={},
+    # The hosts collector (which isn't run unless asked for) counts the hosts on the
+    # LAN; it also returns series for each of up to MAX_HOSTS of the hosts.
+    MAX_HOSTS=0,
+    # Serve /debug/profile?seconds=N, which samples the stacks of every thread of the
+    # exporter for up to PROFILING_MAX_SECONDS. Only clients connecting from a
+    # loopback address, or presenting PROFILING_TOKEN as a bearer token, may use it.
+    PROFILING=False,
+    PROFILING_TOKEN=None,
+    PROFILING_MAX_SECONDS=60,
 )
-globals_: AppGlobals = {"ipavault_credentials": None}
+app.config.from_prefixed_env("HITRON_EXPORTER")
 
+if app.config["TRACING"]:
+    timing.enable_tracing()
 
-LOGGER = getLogger(__name__)
+dataset_cache = hitron.DatasetCache(
+    {
+        hitron.Client.Dataset[name.upper()]: ttl
+        for name, ttl in app.config["CACHE_TTL"].items()
+    },
+    app.config["CACHE_MAX_ENTRIES"],
+)
+
+sessions_ = sessions.SessionManager(
+    app.config["SESSION_IDLE_TIMEOUT"],
+    app.config["SESSION_MAX"],
+    cache=dataset_cache or None,
+    max_body_size=app.config["MAX_RESPONSE_SIZE"] or hitron.MAX_BODY_SIZE,
+)
+atexit.register(sessions_.close)
+
+vault_worker = ipavault.Worker(app.config["VAULT_WORKER_TIMEOUT"])
+atexit.register(vault_worker.close)
+
+vault_credentials = ipavault.CredentialCache(
+    app.config["VAULT_CACHE_TTL"],
+    app.config["VAULT_REFRESH_AFTER"],
+    vault_worker.retrieve if app.config["VAULT_WORKER"] else None,
+)
+
+_executors: dict[str, Executor] = {}
+_executors_lock = threading.Lock()
+
+
+def executor(name: str) -> Executor:
+    """
+    A thread pool shared by all requests, sized by the config setting
+    <NAME>_WORKERS. Executors are created on first use, rather than at import time,
+    so that their threads are not lost when gunicorn forks worker processes.
+    """
+    with _executors_lock:
+        if name not in _executors:
+            _executors[name] = ThreadPoolExecutor(
+                max_workers=app.config[f"{name.upper()}_WORKERS"],
+                thread_name_prefix=name,
+            )
+        return _executors[name]
 
-app = flask.Flask(__name__)
 
 metrics = PrometheusMetrics(app)
-metrics.info(
-    "hitron_exporter_info",
-    "Information about hitron-exporter itself",
-    version=metadata.version("hitron-exporter"),
+
+
+@functools.lru_cache(maxsize=None)
+def version() -> str:
+    """
+    The version of hitron-exporter. It's recorded in _version.py when the container
+    image is built; otherwise it's looked up in the package's metadata (which means
+    importing importlib.metadata, which is slow), once it is first needed.
+    """
+    try:
+        # pylint: disable-next=import-outside-toplevel
+        from ._version import VERSION  # type: ignore [import]
+    except ImportError:
+        from importlib import metadata  # pylint: disable=import-outside-toplevel
+
+        VERSION = metadata.version("hitron-exporter")  # pylint: disable=invalid-name
+    version_: str = VERSION
+    return version_
+
+
+class ExporterInfoCollector(prometheus_client.registry.Collector):
+    def describe(self) -> Iterator[GaugeMetricFamily]:
+        # So that the version isn't needed when the collector is registered
+        yield self.__family()
+
+    def collect(self) -> Iterator[GaugeMetricFamily]:
+        info = self.__family()
+        info.add_metric([version()], 1)
+        yield info
+
+    @staticmethod
+    def __family() -> GaugeMetricFamily:
+        return GaugeMetricFamily(
+            "hitron_exporter_info",
+            "Information about hitron-exporter itself",
+            labels=["version"],
+        )
+
+
+prometheus_client.REGISTRY.register(ExporterInfoCollector())
+
+PROBES_COALESCED = prometheus_client.Counter(
+    "hitron_exporter_probes_coalesced",
+    (
+        "Probes that were answered with the result of a concurrent probe of the same"
+        " target"
+    ),
 )
 
 
+class DatasetCacheCollector(prometheus_client.registry.Collector):
+    def __init__(self, cache: hitron.DatasetCache) -> None:
+        self.__cache = cache
+
+    def collect(self) -> Iterator[CounterMetricFamily]:
+        hits = CounterMetricFamily(
+            "hitron_exporter_dataset_cache_hits",
+            "Datasets returned from the cache",
+            labels=["dataset"],
+        )
+        misses = CounterMetricFamily(
+            "hitron_exporter_dataset_cache_misses",
+            (
+                "Datasets that had to be fetched from the modem because they were not"
+                " cached"
+            ),
+            labels=["dataset"],
+        )
+        for dataset, n in self.__cache.hits.items():
+            hits.add_metric([dataset.value], n)
+        for dataset, n in self.__cache.misses.items():
+            misses.add_metric([dataset.value], n)
+        yield hits
+        yield misses
+
+
+prometheus_client.REGISTRY.register(DatasetCacheCollector(dataset_cache))
+
+
+class TLSCollector(prometheus_client.registry.Collector):
+    def __init__(self, ssl_context: hitron.ResumingSSLContext) -> None:
+        self.__ssl_context = ssl_context
+
+    def collect(self) -> Iterator[CounterMetricFamily]:
+        handshakes = CounterMetricFamily(
+            "hitron_exporter_tls_handshakes",
+            (
+                "TLS handshakes made with modems, by whether a previous session was"
+                " resumed"
+            ),
+            labels=["resumed"],
+        )
+        handshakes.add_metric(["false"], self.__ssl_context.handshakes["full"])
+        handshakes.add_metric(["true"], self.__ssl_context.handshakes["resumed"])
+        yield handshakes
+
+
+prometheus_client.REGISTRY.register(TLSCollector(hitron.shared_ssl_context()))
+
+# Concurrent probes with the same ProbeArgs share a single conversation with the modem
+_probes: singleflight.Group["Collector"] = singleflight.Group()
+# Probes of the same modem that aren't coalesced (because they ask for different
+# collectors, or give different credentials) take turns to log in
+_modems = singleflight.KeyedLock()
+
+
+# The datasets (named as in hitron.Client.Dataset) used by each of Collector's
+# collect_<name> methods. A probe fetches only the datasets its collectors use.
+COLLECTORS = {
+    "usinfo": ("USINFO",),
+    "dsinfo": ("DSINFO",),
+    "uptime": ("SYSINFO",),
+    "clock": ("SYSINFO",),
+    "network": ("SYSINFO",),
+    "sysinfo": ("SYSINFO", "SYSTEM_MODEL"),
+    "docsis": ("CMINIT",),
+    "hosts": ("CONNECTINFO",),
+}
+
+# The collectors that are run unless a probe asks for others. The hosts collector
+# costs an extra request, and divulges the names and addresses of the hosts on the
+# LAN, so it is only run when asked for.
+DEFAULT_COLLECTORS = tuple(name for name in COLLECTORS if name != "hosts")
+
+# The names of the parameter that names the collectors to run; clients that encode
+# lists PHP-style send collect[]
+COLLECT_PARAMS = ("collect", "collect[]")
+
+
+class ProbeArgs(NamedTuple):
+    target: str
+    port: Optional[int]
+    fingerprint: Optional[str]
+    force: bool
+    usr: Optional[str]
+    pwd: Optional[str]
+    ipa_vault_namespace: Optional[str]
+    collectors: tuple[str, ...] = DEFAULT_COLLECTORS
+
+    @classmethod
+    def parse(cls, args: Mapping[str, str]) -> "ProbeArgs":
+        """
+        Raises ValueError with a message suitable for the client if args are invalid.
+        """
+        if not (target := args.get("target")):
+            raise ValueError("Missing parameter: 'target'")
+
+        if (usr := args.get("usr")) and (pwd := args.get("pwd")):
+            ipa_vault_namespace = None
+        elif ipa_vault_namespace := args.get("ipa_vault_namespace"):
+            usr = pwd = None
+        else:
+            raise ValueError(
+                "Missing parameters: 'usr', 'pwd' or 'ipa_vault_namespace'"
+            )
+
+        port = args.get("_port")
+        return cls(
+            target=target,
+            port=int(port) if port else None,
+            fingerprint=args.get("fingerprint"),
+            force=bool(int(args.get("force", "0"))),
+            usr=usr,
+            pwd=pwd,
+            ipa_vault_namespace=ipa_vault_namespace,
+            collectors=cls.parse_collectors(args.get("module"), args.get("collect")),
+        )
+
+    @staticmethod
+    def parse_collectors(
+        module: Optional[str], collect: Optional[str]
+    ) -> tuple[str, ...]:
+        """
+        The collectors in module (named in the MODULES config setting), plus those
+        listed in collect (separated by commas); DEFAULT_COLLECTORS if neither is
+        given.
+        """
+        if not module and not collect:
+            return DEFAULT_COLLECTORS
+        names: list[str] = []
+        if module:
+            if (module_names := app.config["MODULES"].get(module)) is None:
+                raise ValueError(f"Unknown module: {module!r}")
+            names.extend(module_names)
+        if collect:
+            names.extend(name.strip() for name in collect.split(","))
+        if unknown := [name for name in names if name not in COLLECTORS]:
+            raise ValueError(f"Unknown collectors: {', '.join(map(repr, unknown))}")
+        return tuple(name for name in COLLECTORS if name in names)
+
+    def client_kwargs(self) -> dict[str, Any]:
+        kwargs: dict[str, Any] = {}
+        if app.config["MAX_RESPONSE_SIZE"]:
+            kwargs["max_body_size"] = app.config["MAX_RESPONSE_SIZE"]
+        if self.port is not None:
+            kwargs["port"] = self.port
+        if dataset_cache:
+            kwargs["cache"] = dataset_cache
+        return kwargs
+
+    def modem(self) -> tuple[str, int]:
+        """
+        The host and port of the modem, of which only one session may be logged in at a
+        time.
+        """
+        return self.target, self.port if self.port is not None else 443
+
+    def credentials(self) -> ipavault.Credential:
+        """
+        Credentials given in the probe's parameters, or else retrieved from a vault.
+        Call forget_credentials if they are rejected by the modem.
+        """
+        if self.usr is not None and self.pwd is not None:
+            return {"usr": self.usr, "pwd": self.pwd}
+
+        assert self.ipa_vault_namespace is not None
+        with timing.measure("vault"):
+            return vault_credentials.get(self.ipa_vault_namespace)
+
+    def forget_credentials(self) -> None:
+        if self.ipa_vault_namespace is not None:
+            vault_credentials.forget(self.ipa_vault_namespace)
+
+
 @app.route("/probe")
 def probe() -> ResponseReturnValue:
+    with timing.span("/probe"):
+        return _probe_view()
+
+
+def _probe_view() -> ResponseReturnValue:
     args = flask.request.args
+    if len(targets := args.getlist("target")) > 1:
+        return _probe_batch(targets, _params(args))
 
-    if not (target := args.get("target")):
-        return "Missing parameter: 'target'", 400
-    kwargs = {}
-    if port := args.get("_port"):
-        kwargs["port"] = int(port)
-    client = hitron.Client(target, args.get("fingerprint"), **kwargs)
-
-    force = bool(int(args.get("force", "0")))
-
-    if args.get("usr") and args.get("pwd"):
-        client.login(args["usr"], args["pwd"], force)
-    elif args.get("ipa_vault_namespace"):
-        creds = globals_["ipavault_credentials"]
-        if creds is None:
-            creds = ipavault.retrieve(args["ipa_vault_namespace"].split(":"))
-
-        if creds is not None:
-            try:
-                client.login(**creds, force=force)
-            except PermissionError:
-                creds = None
-                raise
-            finally:
-                globals_["ipavault_credentials"] = creds
-    else:
-        return "Missing parameters: 'usr', 'pwd' or 'ipa_vault_namespace'", 400
+    if (target := args.get("target", "")) in poller_:
+        try:
+            result = polled_result(target)
+        except LookupError as e:
+            return str(e), 503
+        if args.getlist("name[]"):
+            return _exposition(PollResultCollector(result))
+        return _response(
+            exposition_cache.render(
+                target,
+                result,
+                lambda: PollResultCollector(result),
+                flask.request.headers.get("Accept"),
+                flask.request.headers.get("Accept-Encoding"),
+                flask.request.headers.get("If-None-Match"),
+            )
+        )
 
     try:
-        reg = prometheus_client.CollectorRegistry()
-        reg.register(Collector(client))
-        return prometheus_client.make_wsgi_app(reg)
-    finally:
-        client.logout()
+        pargs = ProbeArgs.parse(_params(args))
+    except ValueError as e:
+        return str(e), 400
+
+    return _exposition(_probe(pargs))
+
+
+def _params(args: MultiDict[str, str]) -> dict[str, str]:
+    """
+    The first value of each parameter, except that the values of collect (which may be
+    given more than once, and as collect[]) are joined with commas.
+    """
+    params = args.to_dict()
+    params.pop("collect[]", None)
+    if collect := [v for k, v in args.items(multi=True) if k in COLLECT_PARAMS]:
+        params["collect"] = ",".join(collect)
+    return params
+
+
+@app.route("/probe_all")
+def probe_all() -> ResponseReturnValue:
+    """
+    Answer with the latest data for every target that is being polled.
+    """
+    return _exposition(
+        BatchCollector({target: _attempt(polled, target) for target in poller_.keys()})
+    )
+
+
+@app.route("/fingerprints")
+def fingerprints() -> ResponseReturnValue:
+    return flask.jsonify(known_fingerprints())
+
+
+@app.route("/debug/profile")
+def debug_profile() -> ResponseReturnValue:
+    """
+    Profile the exporter for a number of seconds while it serves other requests.
+    Answers with collapsed stacks, for flame graphs.
+    """
+    if not app.config["PROFILING"]:
+        flask.abort(404)
+    if not profiling.allowed(
+        flask.request.remote_addr,
+        flask.request.headers.get("Authorization"),
+        app.config["PROFILING_TOKEN"],
+    ):
+        return "Forbidden", 403
+    if not flask.request.environ.get("wsgi.multithread"):
+        # The profile is taken in this request's thread; if it is the worker's only
+        # one, no probes would be served (or sampled) until it is done
+        return (
+            (
+                "Profiling requires a server that handles requests in several threads,"
+                " such as gunicorn --threads=2"
+            ),
+            503,
+        )
+    try:
+        seconds = profile_seconds(flask.request.args.get("seconds", "10"))
+        return profiling.profile(seconds), {"Content-Type": "text/plain"}
+    except ValueError as e:
+        return str(e), 400
+    except profiling.BusyError as e:
+        return str(e), 409
+
+
+def profile_seconds(value: str) -> float:
+    """
+    Raises ValueError with a message suitable for the client if value is invalid.
+    """
+    try:
+        seconds = float(value)
+    except ValueError:
+        raise ValueError(f"Invalid parameter: 'seconds': {value!r}") from None
+    if not 0 < seconds <= app.config["PROFILING_MAX_SECONDS"]:
+        raise ValueError(
+            "Parameter 'seconds' must be positive and no more than"
+            f" {app.config['PROFILING_MAX_SECONDS']}"
+        )
+    return seconds
+
+
+def known_fingerprints() -> list[dict[str, Any]]:
+    """
+    The fingerprints of the TLS server certificates presented by the targets that the
+    exporter has connected to, so that they can be given in the fingerprint parameter
+    of future probes.
+    """
+    return [
+        {"target": host, "port": port, "fingerprint": fingerprint}
+        for (host, port), fingerprint in sorted(
+            hitron.shared_ssl_context().fingerprints().items()
+        )
+    ]
+
+
+def _probe_batch(
+    targets: Iterable[str], args: Mapping[str, str]
+) -> ResponseReturnValue:
+    probes: dict[str, Callable[[], prometheus_client.registry.Collector]] = {}
+    for target in targets:
+        if target in poller_:
+            probes[target] = functools.partial(polled, target)
+            continue
+        try:
+            pargs = ProbeArgs.parse({**args, "target": target})
+        except ValueError as e:
+            return str(e), 400
+        probes[target] = functools.partial(_probe, pargs)
+
+    results = executor("batch").map(_attempt, probes.values())
+    return _exposition(BatchCollector(dict(zip(probes, results))))
+
+
+def _attempt(
+    fn: Callable[..., prometheus_client.registry.Collector], *args: Any
+) -> Optional[prometheus_client.registry.Collector]:
+    try:
+        return fn(*args)
+    except Exception:  # pylint: disable=broad-except
+        LOGGER.exception("Probe failed")
+        return None
+
+
+def _probe(pargs: ProbeArgs) -> "Collector":
+    collector, shared = _probes.do(pargs, lambda: _collect(pargs))
+    if shared:
+        PROBES_COALESCED.inc()
+    return collector
+
+
+def _collect(pargs: ProbeArgs) -> "Collector":
+    with timing.probe(pargs.target):
+        return _collect_timed(pargs)
+
+
+def _collect_timed(pargs: ProbeArgs) -> "Collector":
+    creds = pargs.credentials()
+    with _modems.hold(pargs.modem()):
+        return _collect_locked(pargs, creds)
+
+
+def _collect_locked(pargs: ProbeArgs, creds: ipavault.Credential) -> "Collector":
+    try:
+        if app.config["SESSION_REUSE"]:
+            key = sessions.SessionKey(
+                pargs.target,
+                pargs.modem()[1],
+                pargs.fingerprint,
+                creds["usr"],
+                creds["pwd"],
+            )
+            with sessions_.client(key, pargs.force) as client:
+                return _collector(client, pargs.collectors)
+
+        with timing.span("client"):
+            client = hitron.Client(
+                pargs.target, pargs.fingerprint, **pargs.client_kwargs()
+            )
+        client.login(**creds, force=pargs.force)
+        try:
+            return _collector(client, pargs.collectors)
+        finally:
+            client.logout()
+    except PermissionError:
+        pargs.forget_credentials()
+        raise
+
+
+def _collector(client: hitron.Client, collectors: Iterable[str]) -> "Collector":
+    return Collector(
+        client,
+        executor=executor("fetch"),
+        concurrency=app.config["FETCH_CONCURRENCY"],
+        collectors=collectors,
+        max_hosts=app.config["MAX_HOSTS"],
+    )
+
+
+def _exposition(collector: prometheus_client.registry.Collector) -> ResponseReturnValue:
+    rendered = exposition.render(
+        collector,
+        flask.request.headers.get("Accept"),
+        flask.request.headers.get("Accept-Encoding"),
+        flask.request.args.getlist("name[]"),
+    )
+    return _response(rendered)
+
+
+def _response(rendered: exposition.Exposition) -> ResponseReturnValue:
+    return flask.Response(
+        rendered.body, status=rendered.status, headers=rendered.headers
+    )
+
+
+poller_: poller.Poller[str, "Collector"] = poller.Poller(
+    lambda target: _collect(_poll_args[target]),
+    app.config["POLL_WORKERS"],
+    app.config["POLL_JITTER"],
+)
+_poll_args: dict[str, ProbeArgs] = {}
+# Probes of a polled target are answered with the same bytes until it is next polled
+exposition_cache = exposition.Cache()
+
+
+def parse_poll_target(index: int, spec: Any) -> tuple[ProbeArgs, float]:
+    """
+    The probe arguments and interval of an entry of the POLL_TARGETS config setting.
+    Raises ValueError naming the entry (but not its credentials) if it is invalid.
+    """
+    if not isinstance(spec, dict):
+        raise ValueError(f"POLL_TARGETS[{index}] is not an object")
+    try:
+        interval = float(spec.get("interval", app.config["POLL_INTERVAL"]))
+        pargs = ProbeArgs.parse(
+            {k: _poll_param(v) for k, v in spec.items() if k != "interval"}
+        )
+    except (TypeError, ValueError) as e:
+        raise ValueError(
+            f"POLL_TARGETS[{index}] (target {spec.get('target')!r}) is invalid: {e}"
+        ) from e
+    return pargs, interval
+
+
+def _poll_param(value: Any) -> str:
+    # As if given in a probe's query string; lists, as for collect, as if given
+    # more than once
+    if isinstance(value, bool):
+        return str(int(value))
+    if isinstance(value, list):
+        return ",".join(map(_poll_param, value))
+    return str(value)
+
+
+for _index, _spec in enumerate(app.config["POLL_TARGETS"]):
+    _pargs, _interval = parse_poll_target(_index, _spec)
+    _poll_args[_pargs.target] = _pargs
+    poller_.add(_pargs.target, _interval)
+
+
+_started = threading.Event()
+
+
+def start_background_tasks() -> None:
+    """
+    Start polling, and retrieve the credentials that will be needed from vaults. Done
+    on the first request rather than at import time, so that the threads involved
+    are created in the process that serves probes.
+    """
+    if _started.is_set():
+        return
+    _started.set()
+    poller_.start()
+    vault_credentials.warm(
+        dict.fromkeys(
+            [
+                *app.config["VAULT_NAMESPACES"],
+                *(
+                    pargs.ipa_vault_namespace
+                    for pargs in _poll_args.values()
+                    if pargs.ipa_vault_namespace is not None
+                ),
+            ]
+        )
+    )
+
+
+app.before_request(start_background_tasks)
+
+
+def polled(target: str) -> prometheus_client.registry.Collector:
+    """
+    A collector for the most recent data polled from target. Raises LookupError if
+    there is no recent enough data.
+    """
+    return PollResultCollector(polled_result(target))
+
+
+def polled_result(target: str) -> poller.PollResult:
+    """
+    As polled, but returns the PollResult itself.
+    """
+    result = poller_.result(target)
+    if result is None or result.value is None:
+        raise LookupError(f"Target {target!r} has not been polled successfully yet")
+    max_age = app.config["POLL_MAX_AGE"] * poller_.interval(target)
+    if time.time() - result.timestamp > max_age:
+        raise LookupError(f"Target {target!r} has not been polled successfully lately")
+    return result
+
+
+class BatchCollector(prometheus_client.registry.Collector):
+    """
+    Merges the metrics collected from several targets into one family per metric, with
+    a target label on every sample. A target whose collector is None failed.
+    """
+
+    def __init__(
+        self, collectors: Mapping[str, Optional[prometheus_client.registry.Collector]]
+    ) -> None:
+        self.__collectors = collectors
+
+    def collect(self) -> Iterator[prometheus_client.Metric]:
+        families: dict[str, prometheus_client.Metric] = {}
+        success = GaugeMetricFamily(
+            "hitron_probe_success",
+            "Whether the target was probed successfully",
+            labels=["target"],
+        )
+        for target, collector in self.__collectors.items():
+            success.add_metric([target], int(collector is not None))
+            if collector is None:
+                continue
+            for metric in collector.collect():
+                if (family := families.get(metric.name)) is None:
+                    family = families[metric.name] = prometheus_client.Metric(
+                        metric.name, metric.documentation, metric.type, metric.unit
+                    )
+                family.samples.extend(
+                    sample._replace(labels={**sample.labels, "target": target})
+                    for sample in metric.samples
+                )
+        yield from families.values()
+        yield success
+
+
+class PollResultCollector(prometheus_client.registry.Collector):
+    def __init__(self, result: poller.PollResult) -> None:
+        self.__result = result
+
+    def collect(self) -> Iterator[prometheus_client.Metric]:
+        yield from self.__result.value.collect()
+        yield GaugeMetricFamily(
+            "hitron_poll_success",
+            "Whether the most recent poll of the modem succeeded",
+            value=int(self.__result.success),
+        )
+        yield GaugeMetricFamily(
+            "hitron_poll_timestamp_seconds",
+            "When the data was polled from the modem",
+            value=self.__result.timestamp,
+        )
 
 
 class Collector(prometheus_client.registry.Collector):
-    def __init__(self, client: hitron.Client) -> None:
-        self.__usinfo = client.get_data(client.Dataset.USINFO)
-        self.__dsinfo = client.get_data(client.Dataset.DSINFO)
-        self.__sysinfo = client.get_data(client.Dataset.SYSINFO)
-        self.__system_model = client.get_data(client.Dataset.SYSTEM_MODEL)
-        self.__cminit = client.get_data(client.Dataset.CMINIT)
+    # Names of the members of hitron.Client.Dataset that are collected
+    DATASETS = ("USINFO", "DSINFO", "SYSINFO", "SYSTEM_MODEL", "CMINIT", "CONNECTINFO")
+
+    def __init__(
+        self,
+        client: hitron.Client,
+        executor: Optional[Executor] = None,
+        concurrency: int = 1,
+        collectors: Optional[Iterable[str]] = None,
+        max_hosts: int = 0,
+    ) -> None:
+        """
+        If an executor is given, up to concurrency datasets are fetched from the modem
+        at once. Only the datasets needed by collectors (names of COLLECTORS; by
+        default, DEFAULT_COLLECTORS) are fetched. The hosts collector returns series
+        for up to max_hosts of the hosts on the LAN.
+        """
+        collectors = tuple(DEFAULT_COLLECTORS if collectors is None else collectors)
+        data = fetch_datasets(
+            client,
+            [getattr(client.Dataset, name) for name in self.datasets(collectors)],
+            executor,
+            concurrency,
+        )
+        self.__load(data, client.Dataset, collectors, max_hosts)
+
+    @classmethod
+    def from_data(
+        cls,
+        data: Mapping[hitron.Client.Dataset, Any],
+        collectors: Optional[Iterable[str]] = None,
+        max_hosts: int = 0,
+    ) -> "Collector":
+        """
+        Create a Collector from datasets that have already been fetched. By default,
+        those of DEFAULT_COLLECTORS whose datasets are all present are run.
+        """
+        if collectors is None:
+            collectors = [
+                name
+                for name in DEFAULT_COLLECTORS
+                if all(
+                    hitron.Client.Dataset[dataset] in data
+                    for dataset in COLLECTORS[name]
+                )
+            ]
+        collector = cls.__new__(cls)
+        collector.__load(data, hitron.Client.Dataset, tuple(collectors), max_hosts)
+        return collector
+
+    @classmethod
+    def datasets(cls, collectors: Iterable[str]) -> list[str]:
+        """
+        Names of the datasets needed by collectors, in the order of DATASETS.
+        """
+        needed = {dataset for name in collectors for dataset in COLLECTORS[name]}
+        return [dataset for dataset in cls.DATASETS if dataset in needed]
+
+    def __load(
+        self,
+        data: Mapping[Any, Any],
+        datasets: Any,
+        collectors: tuple[str, ...],
+        max_hosts: int,
+    ) -> None:
+        self.__collectors = [
+            getattr(self, f"collect_{name}")
+            for name in COLLECTORS
+            if name in collectors
+        ]
+        self.__usinfo = channels.ChannelTable(
+            data.get(datasets.USINFO, []),
+            {"signal_strength": "signalStrength", "bandwidth": "bandwidth"},
+        )
+        self.__dsinfo = channels.ChannelTable(
+            data.get(datasets.DSINFO, []),
+            {"signal_strength": "signalStrength", "snr": "snr"},
+        )
+        # Datasets that weren't fetched are only missed by collectors that aren't run
+        self.__sysinfo: Any = data.get(datasets.SYSINFO)
+        self.__system_model: Any = data.get(datasets.SYSTEM_MODEL)
+        self.__cminit: Any = data.get(datasets.CMINIT)
+        self.__hosts = hosts.HostTable(
+            data.get(datasets.CONNECTINFO, []) if "hosts" in collectors else [],
+            max_hosts,
+        )
+        # The phases of the probe that is creating us, which may not have finished yet
+        self.__timings = timing.current()
 
     def collect(self) -> Iterator[prometheus_client.Metric]:
-        yield from self.collect_usinfo()
-        yield from self.collect_dsinfo()
-        yield from self.collect_uptime()
-        yield from self.collect_clock()
-        yield from self.collect_network()
-        yield from self.collect_sysinfo()
-        yield from self.collect_docsis()
+        for method in self.__collectors:
+            with timing.span(method.__name__):
+                families: list[prometheus_client.Metric] = list(method())
+            yield from families
+        if self.__timings is not None:
+            yield from self.__timings.collect()
 
     def collect_usinfo(self) -> Iterator[GaugeMetricFamily]:
         usinfo_sigstr = GaugeMetricFamily(
@@ -110,10 +873,10 @@ class Collector(prometheus_client.registry.Collector):
             labels=["port", "channel", "frequency"],
         )
 
-        for uschannel in self.__usinfo:
-            key = [uschannel["portId"], uschannel["channelId"], uschannel["frequency"]]
-            usinfo_sigstr.add_metric(key, float(uschannel["signalStrength"]))
-            usinfo_bw.add_metric(key, int(uschannel["bandwidth"]))
+        for key, value in self.__usinfo.rows("signal_strength"):
+            usinfo_sigstr.add_metric(key, value)
+        for key, value in self.__usinfo.rows("bandwidth"):
+            usinfo_bw.add_metric(key, value)
 
         yield usinfo_sigstr
         yield usinfo_bw
@@ -128,27 +891,21 @@ class Collector(prometheus_client.registry.Collector):
             "hitron_channel_downstream_snr", "", labels=["port", "channel", "frequency"]
         )
 
-        for dschannel in self.__dsinfo:
-            key = [dschannel["portId"], dschannel["channelId"], dschannel["frequency"]]
-            dsinfo_sigstr.add_metric(key, float(dschannel["signalStrength"]))
-            dsinfo_snr.add_metric(key, float(dschannel["snr"]))
+        for key, value in self.__dsinfo.rows("signal_strength"):
+            dsinfo_sigstr.add_metric(key, value)
+        for key, value in self.__dsinfo.rows("snr"):
+            dsinfo_snr.add_metric(key, value)
 
         yield dsinfo_sigstr
         yield dsinfo_snr
 
     @staticmethod
     def parse_uptime(uptime: str) -> Optional[float]:
-        if m := re.match(r"(\d+) Days,(\d+) Hours,(\d+) Minutes,(\d+) Seconds", uptime):
-            td = datetime.timedelta(
-                days=int(m.group(1)),
-                hours=int(m.group(2)),
-                minutes=int(m.group(3)),
-                seconds=int(m.group(4)),
-            )
-            return td.total_seconds()
-
-        LOGGER.error("Unable to parse systemUptime: %s", uptime)
-        return None
+        try:
+            return parsers.parse_duration(uptime)
+        except ValueError:
+            LOGGER.error("Unable to parse systemUptime: %s", uptime)
+            return None
 
     def collect_uptime(self) -> Iterator[CounterMetricFamily]:
         if uptime := self.parse_uptime(self.__sysinfo[0]["systemUptime"]):
@@ -170,12 +927,7 @@ class Collector(prometheus_client.registry.Collector):
         # provided by the C library. "Welcome to hell", indeed...
         # <https://stackoverflow.com/a/5499906/643220>
         try:
-            return timegm(
-                time.strptime(
-                    input_,
-                    "%a %b %d, %Y, %H:%M:%S",
-                )
-            )
+            return parsers.parse_clock(input_)
         except ValueError as e:
             LOGGER.error("Unable to parse systemTime: %s", e)
             return None
@@ -207,23 +959,12 @@ class Collector(prometheus_client.registry.Collector):
 
     @staticmethod
     def parse_pkt(pkt: str) -> Optional[float]:
-        m = re.match(r"(\d+(?:\.\d+)?)([A-Z]?) Bytes", pkt)
-        if not m:
-            LOGGER.error("Couldn't parse %r as pkt", pkt)
-            return None
-
-        factor = {
-            "": 1,
-            "K": 1e3,
-            "M": 1e6,
-            "G": 1e9,
-        }.get(m.group(2))
-        if not factor:
-            LOGGER.error("Unknown pkt factor %r", m.group(2))
+        try:
+            return parsers.parse_pkt(pkt)
+        except ValueError as e:
+            LOGGER.error("%s", e)
             return None
 
-        return float(m.group(1)) * factor
-
     def collect_sysinfo(self) -> Iterator[InfoMetricFamily]:
         yield InfoMetricFamily(
             "hitron_system",
@@ -237,10 +978,75 @@ class Collector(prometheus_client.registry.Collector):
         )
 
     def collect_docsis(self) -> Iterator[InfoMetricFamily]:
-        bpi = {}
-        for element in self.__cminit[0]["bpiStatus"].split(","):
-            k, _, v = element.strip().partition(":")
-            bpi[k.lower()] = v.lower()
         yield InfoMetricFamily(
-            "hitron_cm_bpi", "Cable Modem Baseline Privacy Interface", value=bpi
+            "hitron_cm_bpi",
+            "Cable Modem Baseline Privacy Interface",
+            value=parsers.parse_bpi(self.__cminit[0]["bpiStatus"]),
         )
+
+    def collect_hosts(self) -> Iterator[GaugeMetricFamily]:
+        connected = GaugeMetricFamily(
+            "hitron_connected_hosts",
+            "Hosts on the LAN",
+            labels=["interface", "ip_type", "connect_type", "online"],
+        )
+        for group, count in self.__hosts.rows():
+            connected.add_metric(group, count)
+        yield connected
+
+        if not self.__hosts.hosts:
+            return
+        host_info = GaugeMetricFamily(
+            "hitron_connected_host_info",
+            "A host on the LAN (online hosts first, up to HITRON_EXPORTER_MAX_HOSTS)",
+            labels=[
+                "mac_address",
+                "ip_address",
+                "host_name",
+                "interface",
+                "ip_type",
+                "connect_type",
+                "online",
+            ],
+        )
+        for host in self.__hosts.hosts:
+            host_info.add_metric(host, 1)
+        yield host_info
+        yield GaugeMetricFamily(
+            "hitron_connected_hosts_unlisted",
+            "Hosts on the LAN without a hitron_connected_host_info series",
+            value=len(self.__hosts) - len(self.__hosts.hosts),
+        )
+
+
+def fetch_datasets(
+    client: hitron.Client,
+    datasets: Iterable[hitron.Client.Dataset],
+    executor: Optional[Executor] = None,
+    concurrency: int = 1,
+) -> dict[hitron.Client.Dataset, Any]:
+    if executor is None or concurrency <= 1:
+        return {dataset: client.get_data(dataset) for dataset in datasets}
+
+    todo = list(datasets)
+    running: dict[Future[Any], hitron.Client.Dataset] = {}
+    results: dict[hitron.Client.Dataset, Any] = {}
+    try:
+        while todo or running:
+            while todo and len(running) < concurrency:
+                dataset = todo.pop(0)
+                # Run in a copy of our context, so that timings reach our probe's
+                future = executor.submit(
+                    contextvars.copy_context().run, client.get_data, dataset
+                )
+                running[future] = dataset
+            done, _ = wait(running, return_when=FIRST_COMPLETED)
+            for future in done:
+                results[running.pop(future)] = future.result()
+    finally:
+        for future in running:
+            future.cancel()
+        # Fetches that had already started can't be cancelled; wait for them, so that
+        # our caller doesn't log out while they are still using the session
+        wait(running)
+    return results
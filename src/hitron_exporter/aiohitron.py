@@ -0,0 +1,384 @@
+"""
+An asyncio counterpart to hitron.Client, which speaks just enough HTTP/1.1 to talk to
+the modem's web server without tying up a thread for the duration of a probe.
+"""
+
+import asyncio
+from email.parser import Parser
+import http.client
+from logging import getLogger
+from typing import Any, AsyncIterator, Optional
+from urllib.parse import urljoin
+
+import urllib3
+from urllib3.util.ssl_ import assert_fingerprint
+
+from . import hitron, jsonstream, timing
+
+
+LOGGER = getLogger(__name__)
+
+# Response bodies are read, and decoded as they arrive, in chunks of this many bytes
+_CHUNK_SIZE = 64 * 1024
+
+
+class Response:
+    """
+    Enough of an HTTP response for our callers. A JSON body that was decoded as it
+    was read is in decoded, rather than data.
+    """
+
+    def __init__(
+        self,
+        status: int,
+        headers: http.client.HTTPMessage,
+        data: bytes,
+        decoded: Any = None,
+    ):
+        self.status = status
+        self.headers = headers
+        self.data = data
+        self.decoded = decoded
+
+    def info(self) -> http.client.HTTPMessage:
+        return self.headers
+
+
+class _Connection:
+    def __init__(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        self.__reader = reader
+        self.__writer = writer
+
+    def close(self) -> None:
+        self.__writer.close()
+
+    def remember_session(self) -> None:
+        # With TLS 1.3, the session ticket arrives after the handshake, so this is
+        # done after each exchange rather than just after connecting
+        if (sslobj := self.__writer.get_extra_info("ssl_object")) is not None:
+            hitron.shared_ssl_context().remember(sslobj)
+
+    async def exchange(
+        self, request: bytes, method: str, max_body_size: int, decode: bool = False
+    ) -> tuple[Response, bool]:
+        """
+        Send a request, and read its response. Also returns whether the connection
+        can be used for another request. Raises hitron.ResponseTooLargeError (after
+        which the connection must not be reused) if the response body is larger than
+        max_body_size. If decode is true, a successful JSON response is decoded as it
+        is read.
+        """
+        self.__writer.write(request)
+        await self.__writer.drain()
+
+        status_line = await self.__reader.readline()
+        if not status_line:
+            raise ConnectionResetError("Connection closed before response was received")
+        version, _, rest = status_line.decode("latin-1").partition(" ")
+        status = int(rest.split(" ", 1)[0])
+
+        header_lines = []
+        while (line := await self.__reader.readline()) not in (b"\r\n", b"\n", b""):
+            header_lines.append(line)
+        headers = Parser(_class=http.client.HTTPMessage).parsestr(
+            b"".join(header_lines).decode("latin-1")
+        )
+
+        keep_alive = (
+            version == "HTTP/1.1"
+            and "close" not in headers.get("Connection", "").lower()
+        )
+        body: AsyncIterator[bytes]
+        if method == "HEAD" or status in (204, 304) or 100 <= status < 200:
+            body = self.__read_exactly(0)
+        elif "chunked" in headers.get("Transfer-Encoding", "").lower():
+            body = self.__read_chunked(max_body_size)
+        elif (length := headers.get("Content-Length")) is not None:
+            _check_size(int(length), max_body_size)
+            body = self.__read_exactly(int(length))
+        else:
+            body = self.__read_to_eof(max_body_size)
+            keep_alive = False
+
+        if (
+            decode
+            and status == 200
+            and headers.get("Content-Type") == "application/json"
+        ):
+            decoder = jsonstream.Decoder()
+            async for chunk in body:
+                decoder.feed(chunk)
+            return Response(status, headers, b"", decoder.close()), keep_alive
+
+        data = b"".join([chunk async for chunk in body])
+        return Response(status, headers, data), keep_alive
+
+    async def __read_exactly(self, length: int) -> AsyncIterator[bytes]:
+        while length:
+            chunk = await self.__reader.readexactly(min(length, _CHUNK_SIZE))
+            length -= len(chunk)
+            yield chunk
+
+    async def __read_to_eof(self, max_body_size: int) -> AsyncIterator[bytes]:
+        # read returns whatever has arrived so far, so keep reading until EOF
+        total = 0
+        while chunk := await self.__reader.read(_CHUNK_SIZE):
+            total += len(chunk)
+            _check_size(total, max_body_size)
+            yield chunk
+
+    async def __read_chunked(self, max_body_size: int) -> AsyncIterator[bytes]:
+        total = 0
+        while size := int((await self.__reader.readline()).split(b";", 1)[0], 16):
+            total += size
+            _check_size(total, max_body_size)
+            async for chunk in self.__read_exactly(size):
+                yield chunk
+            await self.__reader.readexactly(2)
+        # Discard trailers
+        while (await self.__reader.readline()) not in (b"\r\n", b"\n", b""):
+            pass
+
+
+def _check_size(size: int, max_body_size: int) -> None:
+    if size > max_body_size:
+        raise hitron.ResponseTooLargeError(
+            f"Response is larger than {max_body_size} bytes"
+        )
+
+
+class ConnectionPool:
+    """
+    Idle connections to modems, kept alive for any Client given the pool, so that they
+    outlive a single Client (and so a single probe). Connections are only shared
+    between Clients with the same host, port and fingerprint. A pool must only be used
+    in one event loop.
+    """
+
+    def __init__(self) -> None:
+        self.__idle: dict[tuple[str, int, Optional[str]], list[_Connection]] = {}
+
+    def get(self, key: tuple[str, int, Optional[str]]) -> Optional[_Connection]:
+        if idle := self.__idle.get(key):
+            return idle.pop()
+        return None
+
+    def put(
+        self, key: tuple[str, int, Optional[str]], conn: _Connection, max_idle: int
+    ) -> None:
+        idle = self.__idle.setdefault(key, [])
+        if len(idle) < max_idle:
+            idle.append(conn)
+        else:
+            conn.close()
+
+    def close(self) -> None:
+        for idle in self.__idle.values():
+            while idle:
+                idle.pop().close()
+        self.__idle.clear()
+
+
+class Client:
+    Dataset = hitron.Client.Dataset
+
+    def __init__(
+        self,
+        host: str,
+        fingerprint: Optional[str],
+        port: int = 443,
+        max_connections: int = 5,
+        timeout: float = 5.0,
+        cache: Optional[hitron.DatasetCache] = None,
+        max_body_size: int = hitron.MAX_BODY_SIZE,
+        pool: Optional[ConnectionPool] = None,
+    ) -> None:
+        """
+        The fingerprint of the modem's certificate is checked each time a connection
+        is made. Connections are kept alive between requests, in pool if given (where
+        they are left when the Client is closed) or else in a pool of the Client's
+        own; call aclose when done with the Client. Responses larger than
+        max_body_size bytes are abandoned with hitron.ResponseTooLargeError.
+        """
+        self.__host = host
+        self.__port = port
+        self.__base_url = f"https://{host}:{port}/"
+        self.__fingerprint = fingerprint
+        self.__timeout = timeout
+        self.__cookies = hitron.CookieStore()
+        self.__pool = pool if pool is not None else ConnectionPool()
+        self.__own_pool = pool is None
+        self.__pool_key = (host, port, fingerprint)
+        self.__max_connections = max_connections
+        self.__slots = asyncio.Semaphore(max_connections)
+        self.__warned_insecure = False
+        self.__cache = cache
+        self.__max_body_size = max_body_size
+
+    async def aclose(self) -> None:
+        if self.__own_pool:
+            self.__pool.close()
+
+    async def http_request(
+        self,
+        method: str,
+        url: str,
+        fields: Optional[dict[str, str]] = None,
+        decode: bool = False,
+    ) -> Response:
+        """
+        Make a request to the modem; url is resolved relative to the modem's base URL
+        and must not point elsewhere. If decode is true, a successful JSON response
+        is decoded as it is received, into the response's decoded attribute.
+        """
+        url = urljoin(self.__base_url, url)
+        if not url.startswith(self.__base_url):
+            raise ValueError(f"Refusing to make request to {url!r}")
+
+        headers = {
+            "Host": f"{self.__host}:{self.__port}",
+            "Accept-Encoding": "identity",
+        }
+        if cookie := self.__cookies.header(self.__host):
+            headers["Cookie"] = cookie
+        body = b""
+        if fields is not None:
+            body, headers["Content-Type"] = urllib3.encode_multipart_formdata(fields)
+        if body or method == "POST":
+            headers["Content-Length"] = str(len(body))
+
+        path = "/" + url[len(self.__base_url) :]
+        head = f"{method} {path} HTTP/1.1\r\n" + "".join(
+            f"{k}: {v}\r\n" for k, v in headers.items()
+        )
+        request = (head + "\r\n").encode("latin-1") + body
+
+        async with self.__slots:
+            try:
+                response = await asyncio.wait_for(
+                    self.__send(request, method, decode), self.__timeout
+                )
+            except hitron.ResponseTooLargeError:
+                raise hitron.ResponseTooLargeError(
+                    f"Response from <{url}> is larger than {self.__max_body_size} bytes"
+                ) from None
+        self.__cookies.extract(self.__host, response.headers.get_all("Set-Cookie", []))
+        return response
+
+    async def __send(self, request: bytes, method: str, decode: bool) -> Response:
+        while True:
+            if (conn := self.__pool.get(self.__pool_key)) is not None:
+                reused = True
+            else:
+                conn, reused = await self.__connect(), False
+            try:
+                response, keep_alive = await conn.exchange(
+                    request, method, self.__max_body_size, decode
+                )
+            except (ConnectionError, asyncio.IncompleteReadError):
+                conn.close()
+                if reused:
+                    # The modem closed an idle connection; try again with a new one.
+                    continue
+                raise
+            except BaseException:
+                conn.close()
+                raise
+
+            conn.remember_session()
+            if keep_alive:
+                self.__pool.put(self.__pool_key, conn, self.__max_connections)
+            else:
+                conn.close()
+            return response
+
+    async def __connect(self) -> _Connection:
+        # Includes the time taken to establish the TCP connection
+        with timing.measure("tls_handshake"):
+            reader, writer = await asyncio.open_connection(
+                self.__host, self.__port, ssl=hitron.shared_ssl_context()
+            )
+        sslobj = writer.get_extra_info("ssl_object")
+        hitron.shared_ssl_context().record_handshake(sslobj, self.__host, self.__port)
+        crt = sslobj.getpeercert(binary_form=True)
+        if self.__fingerprint:
+            try:
+                assert_fingerprint(
+                    crt, self.__fingerprint
+                )  # type: ignore [no-untyped-call]
+            except BaseException:
+                writer.close()
+                raise
+        elif not self.__warned_insecure:
+            self.__warned_insecure = True
+            LOGGER.warning(
+                (
+                    "Communication with <%s> is insecure because the expected TLS"
+                    " server certificate fingerprint was not specified. The host"
+                    " presented a certificate with the following fingerprint: %r"
+                ),
+                self.__base_url,
+                hitron.fingerprint(crt),
+            )
+        return _Connection(reader, writer)
+
+    async def login(self, usr: str, pwd: str, force: bool = False) -> None:
+        with timing.measure("login"):
+            await self.__login(usr, pwd, force)
+
+    async def __login(self, usr: str, pwd: str, force: bool) -> None:
+        # / sets a preSession cookie that must be included in the POST to the login form
+        # to avoid a 'session timeout expired' error
+        await self.http_request("GET", "/")
+
+        if (presession := self.__cookies.get(self.__host, "preSession")) is None:
+            raise RuntimeError("preSession cookie not in jar")
+
+        r = await self.http_request(
+            "POST",
+            "goform/login",
+            fields={
+                "usr": usr,
+                "pwd": pwd,
+                "forcelogoff": "0" if not force else "1",
+                "preSession": presession,
+            },
+        )
+        if r.status != 200:
+            raise AssertionError(f"Unexpected login response status: {r.status!r}")
+
+        if r.data != b"success":
+            raise RuntimeError(r.data.decode("ascii"))
+
+    async def get_data(self, dataset: hitron.Client.Dataset) -> Any:
+        if self.__cache is None or not self.__cache.cacheable(dataset):
+            return await self.__fetch_data(dataset)
+        try:
+            return self.__cache.get(self.__base_url, dataset)
+        except KeyError:
+            data = await self.__fetch_data(dataset)
+            self.__cache.put(self.__base_url, dataset, data)
+            return data
+
+    async def __fetch_data(self, dataset: hitron.Client.Dataset) -> Any:
+        with timing.measure("get_data", dataset.value):
+            r = await self.http_request("GET", dataset.path(), decode=True)
+        if r.status == 302:
+            raise hitron.NotLoggedInError("Not logged in")
+        if r.status != 200:
+            raise AssertionError(f"Unexpected data response status: {r.status!r}")
+        if r.headers["Content-Type"] != "application/json":
+            raise AssertionError(
+                f"Unexpected data response content-type: {r.headers['Content-Type']!r}"
+            )
+        return r.decoded
+
+    async def logout(self) -> None:
+        with timing.measure("logout"):
+            r = await self.http_request(
+                "POST",
+                "goform/logout",
+                fields={"data": "byebye"},
+            )
+        if r.status != 302:
+            raise AssertionError(f"Unexpected logout response status: {r.status!r}")
@@ -0,0 +1,318 @@
+"""
+An ASGI application that serves /probe and /metrics using aiohitron.Client, so that a
+single process can keep many probes in flight at once. Run it with any ASGI server,
+for example: uvicorn hitron_exporter.asgi:app
+"""
+
+import asyncio
+import functools
+import json
+from logging import getLogger
+from typing import Any, Awaitable, Callable, MutableMapping, Optional
+from urllib.parse import parse_qs, parse_qsl
+
+import prometheus_client
+
+from . import COLLECT_PARAMS, PROBES_COALESCED, BatchCollector, Collector, ProbeArgs
+from . import aiohitron
+from . import known_fingerprints, profile_seconds, profiling
+from . import PollResultCollector, exposition, exposition_cache, polled
+from . import polled_result, poller_, singleflight, start_background_tasks
+from . import ipavault, timing
+from . import app as wsgi_app
+
+
+Scope = MutableMapping[str, Any]
+Message = MutableMapping[str, Any]
+Receive = Callable[[], Awaitable[Message]]
+Send = Callable[[Message], Awaitable[None]]
+
+LOGGER = getLogger(__name__)
+
+_metrics_app = prometheus_client.make_asgi_app()
+
+_probes: singleflight.AsyncGroup[Collector] = singleflight.AsyncGroup()
+# As in the WSGI app, probes of the same modem that aren't coalesced take turns
+_modems = singleflight.AsyncKeyedLock()
+
+# Connections to modems, kept alive from one probe to the next, and the event loop
+# they belong to
+_pool: Optional[tuple[asyncio.AbstractEventLoop, aiohitron.ConnectionPool]] = None
+
+
+def _connection_pool() -> aiohitron.ConnectionPool:
+    global _pool  # pylint: disable=global-statement
+    loop = asyncio.get_running_loop()
+    if _pool is None or _pool[0] is not loop:
+        _pool = (loop, aiohitron.ConnectionPool())
+    return _pool[1]
+
+
+async def app(scope: Scope, receive: Receive, send: Send) -> None:
+    if scope["type"] == "lifespan":
+        await _lifespan(receive, send)
+    elif scope["type"] != "http":
+        raise NotImplementedError(f"Unsupported scope type {scope['type']!r}")
+    elif scope["path"] == "/metrics":
+        await _metrics_app(scope, receive, send)
+    elif scope["path"] == "/probe":
+        with timing.span("/probe"):
+            await probe(scope, receive, send)
+    elif scope["path"] == "/probe_all":
+        await probe_all(scope, receive, send)
+    elif scope["path"] == "/fingerprints":
+        await _respond(send, 200, json.dumps(known_fingerprints()), "application/json")
+    elif scope["path"] == "/debug/profile" and wsgi_app.config["PROFILING"]:
+        await debug_profile(scope, receive, send)
+    else:
+        await _respond(send, 404, "Not Found")
+
+
+async def probe(scope: Scope, receive: Receive, send: Send) -> None:
+    args: dict[str, str] = {}
+    targets: list[str] = []
+    for k, v in parse_qsl(scope["query_string"].decode("latin-1")):
+        if k in COLLECT_PARAMS:
+            # Values of collect may be given more than once; see ProbeArgs.parse
+            if "collect" in args:
+                args["collect"] += f",{v}"
+            else:
+                args["collect"] = v
+            continue
+        # Like flask.request.args.get, the first value of a parameter wins
+        args.setdefault(k, v)
+        if k == "target":
+            targets.append(v)
+
+    if len(targets) > 1:
+        await _probe_batch(targets, args, scope, receive, send)
+        return
+
+    if (target := args.get("target", "")) in poller_:
+        try:
+            result = polled_result(target)
+        except LookupError as e:
+            await _respond(send, 503, str(e))
+            return
+        if "name[]" in args:
+            await _exposition(PollResultCollector(result), scope, receive, send)
+            return
+        headers = _headers(scope)
+        await _send_exposition(
+            send,
+            exposition_cache.render(
+                target,
+                result,
+                lambda: PollResultCollector(result),
+                headers.get("accept"),
+                headers.get("accept-encoding"),
+                headers.get("if-none-match"),
+            ),
+        )
+        return
+
+    try:
+        pargs = ProbeArgs.parse(args)
+    except ValueError as e:
+        await _respond(send, 400, str(e))
+        return
+
+    await _exposition(await _probe(pargs), scope, receive, send)
+
+
+async def probe_all(scope: Scope, receive: Receive, send: Send) -> None:
+    collectors: dict[str, Optional[prometheus_client.registry.Collector]] = {}
+    for target in poller_.keys():
+        try:
+            collectors[target] = polled(target)
+        except LookupError:
+            LOGGER.exception("Probe failed")
+            collectors[target] = None
+    await _exposition(BatchCollector(collectors), scope, receive, send)
+
+
+async def _probe_batch(
+    targets: list[str],
+    args: dict[str, str],
+    scope: Scope,
+    receive: Receive,
+    send: Send,
+) -> None:
+    probes: dict[str, Callable[[], Awaitable[prometheus_client.registry.Collector]]] = (
+        {}
+    )
+    for target in targets:
+        if target in poller_:
+            probes[target] = functools.partial(_polled, target)
+            continue
+        try:
+            pargs = ProbeArgs.parse({**args, "target": target})
+        except ValueError as e:
+            await _respond(send, 400, str(e))
+            return
+        probes[target] = functools.partial(_probe, pargs)
+
+    results = await asyncio.gather(
+        *(fn() for fn in probes.values()), return_exceptions=True
+    )
+    collectors: dict[str, Optional[prometheus_client.registry.Collector]] = {}
+    for target, result in zip(probes, results):
+        if isinstance(result, BaseException):
+            LOGGER.error("Probe failed", exc_info=result)
+            collectors[target] = None
+        else:
+            collectors[target] = result
+    await _exposition(BatchCollector(collectors), scope, receive, send)
+
+
+async def _polled(target: str) -> prometheus_client.registry.Collector:
+    return polled(target)
+
+
+async def _probe(pargs: ProbeArgs) -> Collector:
+    collector, shared = await _probes.do(pargs, lambda: _collect(pargs))
+    if shared:
+        PROBES_COALESCED.inc()
+    return collector
+
+
+async def _exposition(
+    collector: prometheus_client.registry.Collector,
+    scope: Scope,
+    receive: Receive,
+    send: Send,
+) -> None:
+    headers = _headers(scope)
+    rendered = exposition.render(
+        collector,
+        headers.get("accept"),
+        headers.get("accept-encoding"),
+        parse_qs(scope["query_string"].decode("latin-1")).get("name[]"),
+    )
+    await _send_exposition(send, rendered)
+
+
+def _headers(scope: Scope) -> dict[str, str]:
+    return {
+        k.decode("latin-1").lower(): v.decode("latin-1") for k, v in scope["headers"]
+    }
+
+
+async def _send_exposition(send: Send, rendered: exposition.Exposition) -> None:
+    await send(
+        {
+            "type": "http.response.start",
+            "status": rendered.status,
+            "headers": [
+                (k.lower().encode("latin-1"), v.encode("latin-1"))
+                for k, v in rendered.headers
+            ],
+        }
+    )
+    for chunk in rendered.body:
+        await send({"type": "http.response.body", "body": chunk, "more_body": True})
+    await send({"type": "http.response.body", "body": b""})
+
+
+async def _collect(pargs: ProbeArgs) -> Collector:
+    with timing.probe(pargs.target):
+        return await _collect_timed(pargs)
+
+
+async def _collect_timed(pargs: ProbeArgs) -> Collector:
+    # Retrieving credentials from a vault may involve running a subprocess
+    creds = await asyncio.to_thread(pargs.credentials)
+
+    async with _modems.hold(pargs.modem()):
+        return await _collect_locked(pargs, creds)
+
+
+async def _collect_locked(pargs: ProbeArgs, creds: ipavault.Credential) -> Collector:
+    with timing.span("client"):
+        client = aiohitron.Client(
+            pargs.target,
+            pargs.fingerprint,
+            max_connections=wsgi_app.config["FETCH_CONCURRENCY"],
+            pool=_connection_pool(),
+            **pargs.client_kwargs(),
+        )
+    try:
+        try:
+            await client.login(**creds, force=pargs.force)
+        except PermissionError:
+            pargs.forget_credentials()
+            raise
+        try:
+            datasets = [
+                getattr(client.Dataset, name)
+                for name in Collector.datasets(pargs.collectors)
+            ]
+            fetches = [asyncio.create_task(client.get_data(d)) for d in datasets]
+            try:
+                results = await asyncio.gather(*fetches)
+            except BaseException:
+                # gather leaves the other fetches running; stop them before logging
+                # out, so that they don't race with the logout or leak connections
+                for fetch in fetches:
+                    fetch.cancel()
+                await asyncio.wait(fetches)
+                raise
+        finally:
+            await client.logout()
+    finally:
+        await client.aclose()
+
+    return Collector.from_data(
+        dict(zip(datasets, results)),
+        pargs.collectors,
+        max_hosts=wsgi_app.config["MAX_HOSTS"],
+    )
+
+
+async def debug_profile(scope: Scope, receive: Receive, send: Send) -> None:
+    client = scope.get("client")
+    if not profiling.allowed(
+        client[0] if client else None,
+        _headers(scope).get("authorization"),
+        wsgi_app.config["PROFILING_TOKEN"],
+    ):
+        await _respond(send, 403, "Forbidden")
+        return
+    args = dict(parse_qsl(scope["query_string"].decode("latin-1")))
+    try:
+        seconds = profile_seconds(args.get("seconds", "10"))
+        # The event loop keeps serving while the profile is taken
+        text = await asyncio.to_thread(profiling.profile, seconds)
+    except ValueError as e:
+        await _respond(send, 400, str(e))
+    except profiling.BusyError as e:
+        await _respond(send, 409, str(e))
+    else:
+        await _respond(send, 200, text)
+
+
+async def _respond(
+    send: Send, status: int, text: str, content_type: str = "text/plain"
+) -> None:
+    await send(
+        {
+            "type": "http.response.start",
+            "status": status,
+            "headers": [
+                (b"content-type", f"{content_type}; charset=utf-8".encode("ascii"))
+            ],
+        }
+    )
+    await send({"type": "http.response.body", "body": text.encode("utf-8")})
+
+
+async def _lifespan(receive: Receive, send: Send) -> None:
+    while True:
+        message = await receive()
+        if message["type"] == "lifespan.startup":
+            start_background_tasks()
+            await send({"type": "lifespan.startup.complete"})
+        elif message["type"] == "lifespan.shutdown":
+            _connection_pool().close()
+            await send({"type": "lifespan.shutdown.complete"})
+            return
@@ -0,0 +1,47 @@
+"""
+Channel lists (DSINFO, USINFO) parsed once into columns, so that a Collector that is
+collected repeatedly (e.g., the result of a poll) doesn't parse every channel's values
+again each time, and holds a few arrays instead of a dict of strings per channel.
+"""
+
+from array import array
+import sys
+from typing import Iterable, Iterator, Mapping
+
+
+# The keys of each channel that label its metrics: port, channel and frequency
+LABEL_KEYS = ("portId", "channelId", "frequency")
+
+
+class ChannelTable:
+    """
+    The values of each column are parsed as floats into an array, indexed in the same
+    order as labels. Label values are interned, since the same strings are seen on
+    every probe of a modem.
+    """
+
+    def __init__(
+        self, channels: Iterable[Mapping[str, str]], columns: Mapping[str, str]
+    ) -> None:
+        """
+        columns maps the name of each column to the key of the channel it is parsed
+        from.
+        """
+        self.labels: list[tuple[str, str, str]] = []
+        self.columns = {name: array("d") for name in columns}
+        for channel in channels:
+            self.labels.append(
+                (
+                    sys.intern(channel[LABEL_KEYS[0]]),
+                    sys.intern(channel[LABEL_KEYS[1]]),
+                    sys.intern(channel[LABEL_KEYS[2]]),
+                )
+            )
+            for name, key in columns.items():
+                self.columns[name].append(float(channel[key]))
+
+    def __len__(self) -> int:
+        return len(self.labels)
+
+    def rows(self, column: str) -> Iterator[tuple[tuple[str, str, str], float]]:
+        return zip(self.labels, self.columns[column])
@@ -1,21 +1,44 @@
 import binascii
+from collections import OrderedDict
+from email.utils import parsedate_to_datetime
 from enum import Enum
 import hashlib
-import http.cookiejar
-import json
 from logging import getLogger
 import ssl
 import socket
-from typing import Any, Optional
-from urllib.parse import urljoin
-import urllib.request
+import threading
+import time
+from typing import Any, Iterable, Mapping, Optional, Union
+from urllib.parse import urljoin, urlsplit
 
 import urllib3
 
+from . import jsonstream, timing
+
 
 LOGGER = getLogger(__name__)
 
 
+class NotLoggedInError(RuntimeError):
+    """
+    The modem redirected a data request to the login page; the session has expired
+    or was never established.
+    """
+
+
+class ResponseTooLargeError(RuntimeError):
+    """
+    The modem's response was larger than the Client's max_body_size.
+    """
+
+
+# The default limit on the size of each dataset's response body
+MAX_BODY_SIZE = 4 * 1024 * 1024
+
+# Response bodies are decoded as they arrive, in chunks of this many bytes
+_CHUNK_SIZE = 64 * 1024
+
+
 class Client:
     class Dataset(Enum):
         USER_TYPE = "user_type"
@@ -101,40 +124,35 @@ class Client:
         def path(self) -> str:
             return f"data/{self.value}.asp"
 
-    def __init__(self, host: str, fingerprint: Optional[str], port: int = 443) -> None:
-        self.__base_url = f"https://{host}:{port}/"
-        ssl_context = self.__create_ssl_context()
-
-        if not fingerprint:
-            LOGGER.warning(
-                (
-                    "Communication with <%s> is insecure because the expected TLS"
-                    " server certificate fingerprint was not specified. The host"
-                    " presented a certificate with the following fingerprint: %r"
-                ),
-                self.__base_url,
-                _get_server_certificate_fingerprint((host, port), 5, ssl_context),
-            )
+    def __init__(
+        self,
+        host: str,
+        fingerprint: Optional[str],
+        port: int = 443,
+        max_connections: int = 5,
+        cache: Optional["DatasetCache"] = None,
+        max_body_size: int = MAX_BODY_SIZE,
+    ) -> None:
+        """
+        A Client may be used from several threads at once (for instance, to fetch
+        several datasets in parallel); max_connections limits the number of concurrent
+        connections that will be made to the modem.
 
-        self.__http = urllib3.PoolManager(
-            timeout=5.0,
-            assert_fingerprint=fingerprint,
-            ssl_context=ssl_context,
-        )
-        self.__cookies = http.cookiejar.CookieJar()
+        If a cache is given, get_data will return datasets from it until they expire.
 
-    @staticmethod
-    def __create_ssl_context() -> ssl.SSLContext:
+        get_data raises ResponseTooLargeError, without reading any further, once a
+        response body exceeds max_body_size bytes.
         """
-        An SSLContext for communication with the cable modem which uses a 1024-bit RSA
-        key, rejected by modern OpenSSL configurations.
-        """
-        ctx = ssl.create_default_context()
-        ctx.minimum_version = ssl.TLSVersion.TLSv1_2
-        ctx.check_hostname = False
-        ctx.verify_mode = ssl.CERT_NONE
-        ctx.set_ciphers("DEFAULT@SECLEVEL=1")
-        return ctx
+        self.__base_url = f"https://{host}:{port}/"
+        self.__addr = (host, port)
+        # Without a fingerprint, we warn (once) after the first request, by which
+        # time the certificate presented by the modem is known.
+        self.__warned_insecure = bool(fingerprint)
+
+        self.__http = _pool_manager(fingerprint, max_connections)
+        self.__cookies = CookieStore()
+        self.__cache = cache
+        self.__max_body_size = max_body_size
 
     def http_request(
         self,
@@ -142,14 +160,15 @@ class Client:
         url: Any,
         fields: Any = None,
         headers: Any = None,
+        preload_content: bool = True,
     ) -> Any:
         """
-        urllib3 wrapper that uses a CookieJar to provide rudimentary cookie handling.
+        urllib3 wrapper that uses a CookieStore to provide rudimentary cookie handling.
         """
-        dummy_request = urllib.request.Request(
-            url, headers=headers if headers is not None else {}
-        )
-        self.__cookies.add_cookie_header(dummy_request)
+        host = urlsplit(url).hostname or ""
+        headers = dict(headers) if headers is not None else {}
+        if cookie := self.__cookies.header(host):
+            headers["Cookie"] = cookie
 
         # After a redirect to another host, prevent leaking cookies intended only for
         # the original host. We do this by setting retries=False because we also want to
@@ -159,13 +178,30 @@ class Client:
             method,
             url,
             fields=fields,
-            headers=dict(dummy_request.header_items()),
+            headers=headers,
             retries=False,
+            preload_content=preload_content,
         )  # type: ignore [no-untyped-call]
-        self.__cookies.extract_cookies(response, dummy_request)
+        self.__cookies.extract(host, response.headers.getlist("Set-Cookie"))
+
+        if not self.__warned_insecure:
+            self.__warned_insecure = True
+            LOGGER.warning(
+                (
+                    "Communication with <%s> is insecure because the expected TLS"
+                    " server certificate fingerprint was not specified. The host"
+                    " presented a certificate with the following fingerprint: %r"
+                ),
+                self.__base_url,
+                shared_ssl_context().fingerprints().get(self.__addr),
+            )
         return response
 
     def login(self, usr: str, pwd: str, force: bool = False) -> None:
+        with timing.measure("login"):
+            self.__login(usr, pwd, force)
+
+    def __login(self, usr: str, pwd: str, force: bool) -> None:
         # / sets a preSession cookie that must be included in the POST to the login form
         # to avoid a 'session timeout expired' error
 
@@ -174,12 +210,8 @@ class Client:
             self.__base_url,
         )
 
-        try:
-            presession_cookie = next(
-                (c for c in self.__cookies if c.name == "preSession"),
-            )
-        except StopIteration:
-            raise RuntimeError("preSession cookie not in jar") from None
+        if (presession := self.__cookies.get(self.__addr[0], "preSession")) is None:
+            raise RuntimeError("preSession cookie not in jar")
 
         r = self.http_request(
             "POST",
@@ -188,7 +220,7 @@ class Client:
                 "usr": usr,
                 "pwd": pwd,
                 "forcelogoff": "0" if not force else "1",
-                presession_cookie.name: presession_cookie.value,
+                "preSession": presession,
             },
         )
         if r.status != 200:
@@ -202,45 +234,364 @@ class Client:
             raise RuntimeError(r.data.decode("ascii"))
 
     def get_data(self, dataset: Dataset) -> Any:
-        r = self.http_request(
-            "GET",
-            urljoin(self.__base_url, dataset.path()),
-        )
-        if r.status == 302:
-            raise RuntimeError("Not logged in")
-        if r.status != 200:
-            raise AssertionError(f"Unexpected data response status: {r.status!r}")
-        if r.headers["Content-Type"] != "application/json":
-            raise AssertionError(
-                f"Unexpected data response content-type: {r.headers['Content-Type']!r}"
-            )
-        return json.loads(r.data)
+        if self.__cache is None or not self.__cache.cacheable(dataset):
+            return self.__fetch_data(dataset)
+        try:
+            return self.__cache.get(self.__base_url, dataset)
+        except KeyError:
+            data = self.__fetch_data(dataset)
+            self.__cache.put(self.__base_url, dataset, data)
+            return data
+
+    def __fetch_data(self, dataset: Dataset) -> Any:
+        url = urljoin(self.__base_url, dataset.path())
+        with timing.measure("get_data", dataset.value):
+            r = self.http_request("GET", url, preload_content=False)
+            try:
+                if r.status == 302:
+                    raise NotLoggedInError("Not logged in")
+                if r.status != 200:
+                    raise AssertionError(
+                        f"Unexpected data response status: {r.status!r}"
+                    )
+                if r.headers["Content-Type"] != "application/json":
+                    raise AssertionError(
+                        "Unexpected data response content-type:"
+                        f" {r.headers['Content-Type']!r}"
+                    )
+                return read_json(r, self.__max_body_size, url)
+            except ResponseTooLargeError:
+                # Rather than read the rest of the body so that the connection can be
+                # reused, close it.
+                r.close()
+                r.release_conn()
+                raise
+            finally:
+                r.drain_conn()
 
     def logout(self) -> None:
-        r = self.http_request(
-            "POST",
-            urljoin(self.__base_url, "goform/logout"),
-            fields={"data": "byebye"},
-        )
+        with timing.measure("logout"):
+            r = self.http_request(
+                "POST",
+                urljoin(self.__base_url, "goform/logout"),
+                fields={"data": "byebye"},
+            )
         if r.status != 302:
             raise AssertionError(f"Unexpected logout response status: {r.status!r}")
 
 
-def _get_server_certificate_fingerprint(
-    addr: tuple[str, int], timeout: int, ssl_context: ssl.SSLContext
-) -> str:
-    """
-    Ideally we'd call ssl.get_server_certificate, but that function
-    does not provide a way for us to provide our own SSLContext, so
-    we have to re-implement it.
-    """
-    with socket.create_connection(addr, timeout=timeout) as sock:
-        with ssl_context.wrap_socket(sock) as sslsock:
-            crt = sslsock.getpeercert(binary_form=True)
-            if not crt:
-                raise AssertionError(
-                    "for a client SSL socket, the server will always provide a"
-                    " certificate, regardless of whether validation was required"
-                )
-            digest = hashlib.sha256(crt).digest()
-            return binascii.hexlify(digest, ":").decode("ascii")
+def read_json(response: Any, max_body_size: int, url: str) -> Any:
+    """
+    Decode a urllib3 response (requested with preload_content=False) as it is read.
+    Raises ResponseTooLargeError as soon as the body is known to exceed max_body_size.
+    """
+    too_large = ResponseTooLargeError(
+        f"Response from <{url}> is larger than {max_body_size} bytes"
+    )
+    if int(response.headers.get("Content-Length", 0)) > max_body_size:
+        raise too_large
+    decoder = jsonstream.Decoder()
+    size = 0
+    for chunk in response.stream(_CHUNK_SIZE):
+        size += len(chunk)
+        if size > max_body_size:
+            raise too_large
+        decoder.feed(chunk)
+    return decoder.close()
+
+
+class CookieStore:
+    """
+    Just enough cookie handling for talking to a modem, which sets one or two
+    session cookies. Cookies are kept per host, and only sent back to the host that
+    set them; the Domain and Path attributes are ignored. Safe to use from several
+    threads at once.
+    """
+
+    def __init__(self) -> None:
+        self.__cookies: dict[str, dict[str, str]] = {}
+        self.__lock = threading.Lock()
+
+    def header(self, host: str) -> Optional[str]:
+        """
+        The value of the Cookie header for a request to host, if any.
+        """
+        with self.__lock:
+            if cookies := self.__cookies.get(host.lower()):
+                return "; ".join(f"{k}={v}" for k, v in cookies.items())
+        return None
+
+    def get(self, host: str, name: str) -> Optional[str]:
+        with self.__lock:
+            return self.__cookies.get(host.lower(), {}).get(name)
+
+    def extract(self, host: str, set_cookie_headers: Iterable[str]) -> None:
+        """
+        Store (or expire) the cookies set by a response from host.
+        """
+        for set_cookie in set_cookie_headers:
+            pair, *attrs = set_cookie.split(";")
+            name, sep, value = pair.partition("=")
+            if not sep or not (name := name.strip()):
+                continue
+            expired = False
+            for attr in attrs:
+                key, _, attr_value = attr.partition("=")
+                key = key.strip().lower()
+                if key == "max-age":
+                    expired = _int_or(attr_value, 1) <= 0
+                elif key == "expires":
+                    expired = _expired(attr_value)
+            with self.__lock:
+                cookies = self.__cookies.setdefault(host.lower(), {})
+                if expired:
+                    cookies.pop(name, None)
+                else:
+                    cookies[name] = value.strip()
+
+
+def _int_or(value: str, default: int) -> int:
+    try:
+        return int(value)
+    except ValueError:
+        return default
+
+
+def _expired(http_date: str) -> bool:
+    try:
+        return parsedate_to_datetime(http_date.strip()).timestamp() <= time.time()
+    except (TypeError, ValueError):
+        return False
+
+
+class DatasetCache:
+    """
+    Remembers datasets fetched from modems for a time that depends on the dataset;
+    datasets without a TTL are never cached. Entries for all modems share a single
+    LRU list so that memory use is bounded by max_entries. Safe to use from several
+    threads at once.
+    """
+
+    def __init__(
+        self, ttls: Mapping[Client.Dataset, float], max_entries: int = 1024
+    ) -> None:
+        self.__ttls = {dataset: ttl for dataset, ttl in ttls.items() if ttl > 0}
+        self.__max_entries = max_entries
+        self.__entries: OrderedDict[tuple[str, Client.Dataset], tuple[float, Any]] = (
+            OrderedDict()
+        )
+        self.__lock = threading.Lock()
+        self.hits = dict.fromkeys(self.__ttls, 0)
+        self.misses = dict.fromkeys(self.__ttls, 0)
+
+    def __bool__(self) -> bool:
+        return bool(self.__ttls)
+
+    def cacheable(self, dataset: Client.Dataset) -> bool:
+        return dataset in self.__ttls
+
+    def get(self, origin: str, dataset: Client.Dataset) -> Any:
+        """
+        Raises KeyError if the dataset is not cached or has expired.
+        """
+        key = (origin, dataset)
+        if not self.cacheable(dataset):
+            raise KeyError(key)
+        with self.__lock:
+            expires, data = self.__entries.get(key, (0.0, None))
+            if expires <= time.monotonic():
+                self.__entries.pop(key, None)
+                self.misses[dataset] += 1
+                raise KeyError(key)
+            self.__entries.move_to_end(key)
+            self.hits[dataset] += 1
+            return data
+
+    def put(self, origin: str, dataset: Client.Dataset, data: Any) -> None:
+        if not self.cacheable(dataset):
+            return
+        key = (origin, dataset)
+        with self.__lock:
+            self.__entries[key] = (time.monotonic() + self.__ttls[dataset], data)
+            self.__entries.move_to_end(key)
+            while len(self.__entries) > self.__max_entries:
+                self.__entries.popitem(last=False)
+
+
+class _SSLSocket(ssl.SSLSocket):
+    def close(self) -> None:
+        # With TLS 1.3, the session ticket arrives after the handshake; by the time the
+        # connection is closed, we have it.
+        if isinstance(self.context, ResumingSSLContext):
+            self.context.remember(self)
+        super().close()
+
+
+class ResumingSSLContext(ssl.SSLContext):
+    """
+    An SSLContext that resumes the previous TLS session with the same server when
+    wrapping a socket, so that a new connection to a modem doesn't cost it a full
+    handshake with its slow RSA key. The server's certificate is still available for
+    checking after a session is resumed.
+
+    Sessions are resumed for sockets (as used by urllib3) and for SSLObjects (as used
+    by asyncio). asyncio creates an SSLObject before connecting, when only the
+    server's name is known, so SSLObjects' sessions are remembered by server name
+    rather than address; and it makes the handshake itself, so its caller must pass
+    the SSLObject to record_handshake afterwards.
+
+    Counts of handshakes made (full and resumed) are kept in handshakes, and the
+    fingerprint of the certificate most recently presented by each server is
+    available from fingerprints.
+    """
+
+    sslsocket_class = _SSLSocket
+
+    # SSLContext.__new__ consumes the protocol argument
+    def __init__(self, *args: Any, **kwargs: Any) -> None:
+        super().__init__()
+        self.__sessions: dict[Any, ssl.SSLSession] = {}
+        self.__fingerprints: dict[tuple[str, int], str] = {}
+        self.__lock = threading.Lock()
+        self.handshakes = {"full": 0, "resumed": 0}
+
+    # pylint: disable-next=arguments-differ
+    def wrap_socket(
+        self, sock: socket.socket, *args: Any, **kwargs: Any
+    ) -> ssl.SSLSocket:
+        try:
+            peer = sock.getpeername()
+        except OSError:
+            peer = None
+        if peer is not None and "session" not in kwargs:
+            with self.__lock:
+                kwargs["session"] = self.__sessions.get(peer)
+
+        with timing.measure("tls_handshake"):
+            sslsock = super().wrap_socket(sock, *args, **kwargs)
+
+        with self.__lock:
+            self.handshakes["resumed" if sslsock.session_reused else "full"] += 1
+        if peer is not None and (crt := sslsock.getpeercert(binary_form=True)):
+            # urllib3 doesn't give a server_hostname when connecting to an IP address
+            host = kwargs.get("server_hostname") or peer[0]
+            self.record_fingerprint(host, peer[1], crt)
+        self.remember(sslsock)
+        return sslsock
+
+    # pylint: disable-next=arguments-differ
+    def wrap_bio(
+        self,
+        incoming: ssl.MemoryBIO,
+        outgoing: ssl.MemoryBIO,
+        server_side: bool = False,
+        server_hostname: Union[str, bytes, None] = None,
+        session: Optional[ssl.SSLSession] = None,
+    ) -> ssl.SSLObject:
+        if session is None and server_hostname is not None and not server_side:
+            with self.__lock:
+                session = self.__sessions.get(server_hostname)
+        return super().wrap_bio(
+            incoming, outgoing, server_side, server_hostname, session
+        )
+
+    def record_handshake(self, sslobj: ssl.SSLObject, host: str, port: int) -> None:
+        """
+        Count the handshake made by sslobj (from wrap_bio) with the server at
+        (host, port), and record the server's certificate and session.
+        """
+        with self.__lock:
+            self.handshakes["resumed" if sslobj.session_reused else "full"] += 1
+        if crt := sslobj.getpeercert(binary_form=True):
+            self.record_fingerprint(host, port, crt)
+        self.remember(sslobj)
+
+    def record_fingerprint(self, host: str, port: int, crt: bytes) -> None:
+        with self.__lock:
+            self.__fingerprints[(host, port)] = fingerprint(crt)
+
+    def fingerprints(self) -> dict[tuple[str, int], str]:
+        """
+        The fingerprints of the certificates presented by each (host, port) to which
+        we have connected.
+        """
+        with self.__lock:
+            return dict(self.__fingerprints)
+
+    def remember(self, sslsock: Union[ssl.SSLSocket, ssl.SSLObject]) -> None:
+        """
+        Remember sslsock's session, to be resumed by the next connection to the same
+        server.
+        """
+        try:
+            if isinstance(sslsock, ssl.SSLSocket):
+                key = sslsock.getpeername()
+            else:
+                key = sslsock.server_hostname
+            session = sslsock.session
+        except (OSError, ValueError):
+            return
+        if key is not None and session is not None:
+            with self.__lock:
+                self.__sessions[key] = session
+
+
+_shared_ssl_context: Optional[ResumingSSLContext] = None
+_shared_ssl_context_lock = threading.Lock()
+
+
+def shared_ssl_context() -> ResumingSSLContext:
+    """
+    The SSLContext used for all communication with modems.
+    """
+    global _shared_ssl_context  # pylint: disable=global-statement
+    with _shared_ssl_context_lock:
+        if _shared_ssl_context is None:
+            _shared_ssl_context = create_ssl_context()
+        return _shared_ssl_context
+
+
+_pool_managers: dict[tuple[Optional[str], int], urllib3.PoolManager] = {}
+_pool_managers_lock = threading.Lock()
+
+
+def _pool_manager(
+    fingerprint: Optional[str], max_connections: int
+) -> urllib3.PoolManager:
+    """
+    Connection pools are shared by every Client with the same settings, so that
+    connections to a modem are kept alive from one probe to the next.
+    """
+    key = (fingerprint, max_connections)
+    with _pool_managers_lock:
+        if (manager := _pool_managers.get(key)) is None:
+            manager = _pool_managers[key] = urllib3.PoolManager(
+                num_pools=64,
+                maxsize=max_connections,
+                block=True,
+                timeout=5.0,
+                assert_fingerprint=fingerprint,
+                ssl_context=shared_ssl_context(),
+            )
+        return manager
+
+
+def create_ssl_context() -> ResumingSSLContext:
+    """
+    An SSLContext for communication with the cable modem which uses a 1024-bit RSA
+    key, rejected by modern OpenSSL configurations.
+    """
+    ctx = ResumingSSLContext(ssl.PROTOCOL_TLS_CLIENT)
+    ctx.minimum_version = ssl.TLSVersion.TLSv1_2
+    ctx.check_hostname = False
+    ctx.verify_mode = ssl.CERT_NONE
+    ctx.set_ciphers("DEFAULT@SECLEVEL=1")
+    return ctx
+
+
+def fingerprint(crt: bytes) -> str:
+    """
+    The SHA-256 fingerprint of a DER-encoded certificate, in the format accepted by the
+    fingerprint probe parameter.
+    """
+    return binascii.hexlify(hashlib.sha256(crt).digest(), ":").decode("ascii")
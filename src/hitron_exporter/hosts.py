@@ -0,0 +1,56 @@
+"""
+The hosts connected to the modem's LAN (CONNECTINFO), counted in a single pass over
+the records. A busy LAN may have thousands of them (each DHCP lease and IPv6 address
+is a record), so besides the counts, at most a fixed number of hosts are kept for
+per-host time series.
+"""
+
+from bisect import insort
+from operator import itemgetter
+from typing import Any, Iterable, Iterator, Mapping
+
+
+# The keys of each record that hosts are counted by: interface, IP type, connection
+# type and online state
+GROUP_KEYS = ("interface", "ipType", "connectType", "online")
+
+# The keys of each record that label a host's time series
+HOST_KEYS = ("macAddr", "ipAddr", "hostName", *GROUP_KEYS)
+
+_group = itemgetter(*GROUP_KEYS)
+_host = itemgetter(*HOST_KEYS)
+
+
+class HostTable:
+    """
+    The number of hosts in each group (of GROUP_KEYS values), and the HOST_KEYS values
+    of up to max_hosts hosts: those that are online, then those that aren't, each in
+    order of MAC address, so that the same hosts are listed from one probe to the
+    next.
+    """
+
+    def __init__(
+        self, records: Iterable[Mapping[str, Any]], max_hosts: int = 0
+    ) -> None:
+        self.counts: dict[tuple[str, ...], int] = {}
+        # Sorted (rank, host) of the hosts kept so far. Each rank ends with the
+        # record's position, so that hosts themselves are never compared.
+        kept: list[tuple[tuple[bool, str, int], tuple[str, ...]]] = []
+        counts = self.counts
+        for position, record in enumerate(records):
+            group = _group(record)
+            counts[group] = counts.get(group, 0) + 1
+            if max_hosts:
+                rank = (group[3] != "active", record["macAddr"], position)
+                # Most hosts rank lower than all those kept, once there are enough
+                if len(kept) < max_hosts or rank < kept[-1][0]:
+                    insort(kept, (rank, _host(record)))
+                    if len(kept) > max_hosts:
+                        kept.pop()
+        self.hosts = [host for _, host in kept]
+
+    def __len__(self) -> int:
+        return sum(self.counts.values())
+
+    def rows(self) -> Iterator[tuple[tuple[str, ...], int]]:
+        return iter(self.counts.items())
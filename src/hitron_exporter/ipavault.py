@@ -1,9 +1,26 @@
-from importlib import resources
+import contextlib
 import json
 from logging import getLogger
 import os
-import subprocess
-from typing import Sequence, TypedDict
+from pathlib import Path
+import threading
+import time
+from typing import (
+    TYPE_CHECKING,
+    Callable,
+    ContextManager,
+    Iterable,
+    Optional,
+    Sequence,
+    TypedDict,
+)
+
+from . import singleflight
+
+# Most exporters never use a vault, so subprocess and importlib.resources (which is
+# slow to import) are imported when first needed.
+if TYPE_CHECKING:
+    import subprocess
 
 
 Credential = TypedDict("Credential", {"usr": str, "pwd": str})
@@ -12,16 +29,16 @@ LOGGER = getLogger(__name__)
 
 
 def retrieve(container: Sequence[str]) -> Credential:
+    """
+    Retrieve credentials by running vault-retrieve.py in a new ipa console process.
+    """
     _check_keytab_readable()
 
-    kwargs: dict[str, str] = {}
-    if container[0] in ["user", "service"]:
-        kwargs[container[0]] = container[1]
-    else:
-        raise ValueError("container[0] must be 'user' or 'service'")
+    kwargs = _container_kwargs(container)
 
-    source = resources.files("hitron_exporter").joinpath("vault-retrieve.py")
-    with resources.as_file(source) as vault_retrieve_py:
+    import subprocess  # pylint: disable=import-outside-toplevel,redefined-outer-name
+
+    with _vault_retrieve_py() as vault_retrieve_py:
         input_ = json.dumps(kwargs)
         LOGGER.debug("Launching vault-retrieve.py with input: %r", input_)
         proc = subprocess.run(
@@ -33,10 +50,206 @@ def retrieve(container: Sequence[str]) -> Credential:
         )
         LOGGER.debug("... output: %r", proc.stdout)
 
-    cred: Credential = json.loads(proc.stdout)
+    return _parse_output(proc.stdout)
+
+
+def _vault_retrieve_py() -> ContextManager[Path]:
+    """
+    The path of vault-retrieve.py, which is extracted to the filesystem if necessary
+    for as long as the context is entered.
+    """
+    from importlib import resources  # pylint: disable=import-outside-toplevel
+
+    return resources.as_file(
+        resources.files("hitron_exporter").joinpath("vault-retrieve.py")
+    )
+
+
+class Worker:
+    """
+    A long-lived ipa console process running vault-retrieve.py, which answers many
+    retrievals over one authenticated session instead of paying for interpreter
+    startup, Kerberos authentication and API schema loading each time. The process is
+    started on first use, and restarted if it dies or takes longer than timeout
+    seconds to answer.
+    """
+
+    def __init__(self, timeout: float = 60.0) -> None:
+        self.__timeout = timeout
+        self.__lock = threading.Lock()
+        self.__proc: Optional["subprocess.Popen[str]"] = None
+        # Keeps vault-retrieve.py extracted to the filesystem, if necessary, for as
+        # long as the worker may need to be (re)started.
+        self.__resources = contextlib.ExitStack()
+        self.__script: Optional[str] = None
+
+    def retrieve(self, container: Sequence[str]) -> Credential:
+        input_ = json.dumps(_container_kwargs(container)) + "\n"
+        with self.__lock:
+            # If the process has died since the last retrieval, we'll only find out
+            # when we try to use it; so give a fresh process one more try.
+            for _ in range(2):
+                proc = self.__start()
+                LOGGER.debug("Sending input to vault worker: %r", input_)
+                timer = threading.Timer(self.__timeout, proc.kill)
+                timer.start()
+                try:
+                    assert proc.stdin is not None and proc.stdout is not None
+                    proc.stdin.write(input_)
+                    proc.stdin.flush()
+                    output = proc.stdout.readline()
+                except OSError:
+                    output = ""
+                finally:
+                    timer.cancel()
+                LOGGER.debug("... output: %r", output)
+                if output:
+                    return _parse_output(output)
+
+                LOGGER.warning(
+                    "Vault worker (pid %d) exited with status %r; restarting",
+                    proc.pid,
+                    self.__stop(),
+                )
+            raise RuntimeError("Vault worker exited without answering")
+
+    def close(self) -> None:
+        with self.__lock:
+            self.__stop()
+            self.__resources.close()
+            self.__script = None
+
+    def __start(self) -> "subprocess.Popen[str]":
+        if self.__proc is not None:
+            return self.__proc
+
+        _check_keytab_readable()
+        if self.__script is None:
+            self.__script = str(self.__resources.enter_context(_vault_retrieve_py()))
+
+        import subprocess  # pylint: disable=import-outside-toplevel,redefined-outer-name
+
+        self.__proc = subprocess.Popen(  # pylint: disable=consider-using-with
+            ["ipa", "console", self.__script],
+            text=True,
+            stdin=subprocess.PIPE,
+            stdout=subprocess.PIPE,
+        )
+        LOGGER.info("Started vault worker (pid %d)", self.__proc.pid)
+        return self.__proc
+
+    def __stop(self) -> Optional[int]:
+        if (proc := self.__proc) is None:
+            return None
+        self.__proc = None
+        for stream in (proc.stdin, proc.stdout):
+            if stream is not None:
+                with contextlib.suppress(OSError):
+                    stream.close()
+        import subprocess  # pylint: disable=import-outside-toplevel,redefined-outer-name
+
+        try:
+            return proc.wait(self.__timeout)
+        except subprocess.TimeoutExpired:
+            proc.kill()
+            return proc.wait()
+
+
+def _container_kwargs(container: Sequence[str]) -> dict[str, str]:
+    if container[0] in ["user", "service"]:
+        return {container[0]: container[1]}
+    raise ValueError("container[0] must be 'user' or 'service'")
+
+
+def _parse_output(output: str) -> Credential:
+    result = json.loads(output)
+    if "error" in result:
+        raise RuntimeError(f"Unable to retrieve credentials: {result['error']}")
+    cred: Credential = result
     return cred
 
 
+class CredentialCache:
+    """
+    Credentials retrieved from vaults, keyed by namespace (e.g.,
+    "service:host/cm-hitron.example.com"). Credentials are retrieved again after ttl
+    seconds; once refresh_after (a fraction of ttl) has passed, this happens in the
+    background so that callers don't have to wait for it.
+
+    Credentials are retrieved with retrieve_fn, or with retrieve if not given.
+    """
+
+    def __init__(
+        self,
+        ttl: float = 3600.0,
+        refresh_after: float = 0.75,
+        retrieve_fn: Optional[Callable[[Sequence[str]], Credential]] = None,
+    ) -> None:
+        self.__retrieve_fn = retrieve_fn
+        self.__ttl = ttl
+        self.__refresh_after = refresh_after
+        # namespace -> (time.monotonic() when retrieved, credential)
+        self.__entries: dict[str, tuple[float, Credential]] = {}
+        self.__refreshing: set[str] = set()
+        self.__lock = threading.Lock()
+        self.__retrievals: singleflight.Group[Credential] = singleflight.Group()
+
+    def get(self, namespace: str) -> Credential:
+        with self.__lock:
+            entry = self.__entries.get(namespace)
+        if entry is not None:
+            retrieved, cred = entry
+            age = time.monotonic() - retrieved
+            if age < self.__ttl:
+                if age >= self.__ttl * self.__refresh_after:
+                    self.__refresh_in_background([namespace])
+                return cred
+        return self.__retrieve(namespace)
+
+    def forget(self, namespace: str) -> None:
+        """
+        Call when the credentials for namespace have been rejected.
+        """
+        with self.__lock:
+            self.__entries.pop(namespace, None)
+
+    def warm(self, namespaces: Iterable[str]) -> None:
+        """
+        Retrieve credentials for namespaces in the background, so that they are ready
+        by the time they are needed.
+        """
+        self.__refresh_in_background(namespaces)
+
+    def __retrieve(self, namespace: str) -> Credential:
+        def retrieve_and_store() -> Credential:
+            cred = (self.__retrieve_fn or retrieve)(namespace.split(":"))
+            with self.__lock:
+                self.__entries[namespace] = (time.monotonic(), cred)
+            return cred
+
+        cred, _ = self.__retrievals.do(namespace, retrieve_and_store)
+        return cred
+
+    def __refresh_in_background(self, namespaces: Iterable[str]) -> None:
+        with self.__lock:
+            todo = [ns for ns in namespaces if ns not in self.__refreshing]
+            self.__refreshing.update(todo)
+        if todo:
+            threading.Thread(
+                target=self.__refresh, args=(todo,), name="vault-refresh", daemon=True
+            ).start()
+
+    def __refresh(self, namespaces: list[str]) -> None:
+        for namespace in namespaces:
+            try:
+                self.__retrieve(namespace)
+            except Exception:  # pylint: disable=broad-except
+                LOGGER.exception("Unable to retrieve credentials for %r", namespace)
+            finally:
+                with self.__lock:
+                    self.__refreshing.discard(namespace)
+
+
 def _check_keytab_readable() -> None:
     if "KRB5_CLIENT_KTNAME" not in os.environ:
         return
@@ -0,0 +1,135 @@
+"""
+Incremental decoding of JSON documents, so that a response can be decoded as it is
+read from the network rather than after all of it has been buffered.
+
+The modem's datasets are mostly arrays of records. The elements of a top-level array
+are decoded as soon as they are complete, so no more than a chunk's worth of text is
+held at a time; other documents are buffered and decoded at the end.
+"""
+
+import codecs
+import json
+import re
+from typing import Any, Optional
+
+
+_WHITESPACE = re.compile(r"[ \t\n\r]*")
+
+# Characters that may continue a number that raw_decode has stopped short of
+_NUMBER_CONTINUATION = frozenset("0123456789.eE+-")
+
+# What the decoder expects next in a top-level array
+_ITEM_OR_END = 1
+_ITEM = 2
+_SEPARATOR_OR_END = 3
+
+
+class Decoder:
+    def __init__(self) -> None:
+        self.__utf8 = codecs.getincrementaldecoder("utf-8")()
+        self.__json = json.JSONDecoder()
+        # Text received but not yet decoded
+        self.__text = ""
+        # Whether the document is an array (None until its first character is seen),
+        # and whether its closing bracket has been seen
+        self.__array: Optional[bool] = None
+        self.__done = False
+        self.__expect = _ITEM_OR_END
+        self.__items: list[Any] = []
+
+    def feed(self, data: bytes) -> None:
+        self.__text += self.__utf8.decode(data)
+        self.__decode(final=False)
+
+    def close(self) -> Any:
+        """
+        Return the decoded document. Raises json.JSONDecodeError if it is invalid or
+        incomplete.
+        """
+        self.__text += self.__utf8.decode(b"", final=True)
+        if not self.__array:
+            return json.loads(self.__text)
+        self.__decode(final=True)
+        if not self.__done:
+            raise json.JSONDecodeError("Unterminated array", self.__text, 0)
+        if self.__text.strip():
+            raise json.JSONDecodeError("Extra data", self.__text, 0)
+        return self.__items
+
+    def __decode(self, final: bool) -> None:
+        text = self.__text
+        pos = _skip_whitespace(text, 0)
+        if self.__array is None:
+            if pos == len(text):
+                return
+            self.__array = text[pos] == "["
+            if not self.__array:
+                return
+            pos += 1
+        if not self.__array or self.__done:
+            return
+
+        batched = False
+        while True:
+            pos = _skip_whitespace(text, pos)
+            if pos == len(text):
+                break
+            if self.__expect != _ITEM and text[pos] == "]":
+                pos += 1
+                self.__done = True
+                break
+            if self.__expect == _SEPARATOR_OR_END:
+                if text[pos] != ",":
+                    raise json.JSONDecodeError("Expecting ',' delimiter", text, pos)
+                pos += 1
+                self.__expect = _ITEM
+                continue
+            if not batched:
+                batched = True
+                if (end := _decode_batch(text, pos, self.__items)) is not None:
+                    pos = end
+                    self.__expect = _SEPARATOR_OR_END
+                    continue
+            try:
+                item, end = self.__json.raw_decode(text, pos)
+            except json.JSONDecodeError:
+                if final:
+                    raise
+                # Probably incomplete; wait for more
+                break
+            if not final and (end == len(text) or text[end] in _NUMBER_CONTINUATION):
+                # A number may continue in the next chunk
+                break
+            self.__items.append(item)
+            pos = end
+            self.__expect = _SEPARATOR_OR_END
+
+        # Drop the text that has been decoded
+        self.__text = text[pos:]
+
+
+def _decode_batch(text: str, pos: int, items: list[Any]) -> Optional[int]:
+    """
+    Decode the elements of an array of objects from text[pos:] up to the last "},",
+    appending them to items and returning the position after them; or return None if
+    that isn't where an element ends. Decoding many elements with one call to
+    json.loads is much quicker than decoding them one by one, and (like json.loads of
+    the whole document) shares the strings of identical keys between them.
+    """
+    # If this prefix decodes as a list of elements, the "}" must end an element of the
+    # outer array: were it within a string or a nested value, the prefix would be
+    # unterminated.
+    end = text.rfind("},", pos) + 1
+    if end == 0:
+        return None
+    try:
+        items.extend(json.loads(f"[{text[pos:end]}]"))
+    except json.JSONDecodeError:
+        return None
+    return end
+
+
+def _skip_whitespace(text: str, pos: int) -> int:
+    match = _WHITESPACE.match(text, pos)
+    assert match is not None
+    return match.end()
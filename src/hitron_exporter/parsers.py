@@ -0,0 +1,100 @@
+"""
+Parsers for the formats of the strings in the modem's datasets.
+
+These run on every probe, so patterns are compiled once, the clock (which
+time.strptime would parse slowly, and while holding a global lock) is parsed by hand,
+and values that are the same from one probe to the next are parsed once and
+remembered. Each parser raises ValueError if its input is not in the expected format.
+"""
+
+import datetime
+import functools
+import re
+
+
+# Uptime (SYSINFO's systemUptime) and the lease duration (CMDOCSISWAN's
+# CmIpLeaseDuration): "10 Days,17 Hours,33 Minutes,47 Seconds",
+# "04 Days,09 Hours,47 Minutes,10 Seconds"
+_DURATION = re.compile(r"(\d+) Days?, ?(\d+) Hours?, ?(\d+) Minutes?, ?(\d+) Seconds?")
+
+# "Fri Jun 17, 2022, 17:09:10"
+_CLOCK = re.compile(
+    r"([A-Z][a-z]{2}) ([A-Z][a-z]{2}) (\d{1,2}), (\d{4}),"
+    r" (\d{1,2}):(\d{1,2}):(\d{1,2})$"
+)
+_WEEKDAYS = frozenset("Mon Tue Wed Thu Fri Sat Sun".split())
+_MONTHS = {
+    name: number
+    for number, name in enumerate(
+        "Jan Feb Mar Apr May Jun Jul Aug Sep Oct Nov Dec".split(), start=1
+    )
+}
+
+# "40.14M Bytes"
+_PKT = re.compile(r"(\d+(?:\.\d+)?)([A-Z]?) Bytes")
+_PKT_FACTORS = {
+    "": 1.0,
+    "K": 1e3,
+    "M": 1e6,
+    "G": 1e9,
+}
+
+
+def parse_duration(duration: str) -> float:
+    """
+    Seconds in an uptime or lease duration.
+    """
+    if not (m := _DURATION.match(duration)):
+        raise ValueError(f"Unable to parse duration {duration!r}")
+    days, hours, minutes, seconds = m.groups()
+    return float(
+        ((int(days) * 24 + int(hours)) * 60 + int(minutes)) * 60 + int(seconds)
+    )
+
+
+def parse_clock(clock: str) -> float:
+    """
+    The timestamp of a time in the modem's clock format, as if the modem's clock were
+    in UTC (which it probably isn't).
+    """
+    if not (m := _CLOCK.match(clock)):
+        raise ValueError(f"Unable to parse clock {clock!r}")
+    weekday, month, day, year, hour, minute, second = m.groups()
+    if weekday not in _WEEKDAYS or (month_number := _MONTHS.get(month)) is None:
+        raise ValueError(f"Unable to parse clock {clock!r}")
+    # Raises ValueError for out of range fields
+    return datetime.datetime(
+        int(year),
+        month_number,
+        int(day),
+        int(hour),
+        int(minute),
+        int(second),
+        tzinfo=datetime.timezone.utc,
+    ).timestamp()
+
+
+def parse_pkt(pkt: str) -> float:
+    """
+    Bytes in an amount of traffic.
+    """
+    if not (m := _PKT.match(pkt)):
+        raise ValueError(f"Couldn't parse {pkt!r} as pkt")
+    number, prefix = m.groups()
+    if (factor := _PKT_FACTORS.get(prefix)) is None:
+        raise ValueError(f"Unknown pkt factor {prefix!r}")
+    return float(number) * factor
+
+
+@functools.lru_cache(maxsize=64)
+def parse_bpi(bpi_status: str) -> dict[str, str]:
+    """
+    The states of the Baseline Privacy Interface, from a status such as
+    "AUTH:authorized, TEK:operational", with keys and values in lower case. The status
+    rarely changes, so results are remembered; they must not be modified.
+    """
+    bpi = {}
+    for element in bpi_status.split(","):
+        k, _, v = element.strip().partition(":")
+        bpi[k.lower()] = v.lower()
+    return bpi
@@ -0,0 +1,137 @@
+"""
+Collect from a configured set of modems on our own schedule, so that probes can be
+answered from memory instead of waiting for the modem.
+"""
+
+from concurrent.futures import ThreadPoolExecutor
+import heapq
+from logging import getLogger
+import random
+import threading
+import time
+from typing import Any, Callable, Generic, Hashable, NamedTuple, Optional, TypeVar
+
+
+LOGGER = getLogger(__name__)
+
+K = TypeVar("K", bound=Hashable)
+T = TypeVar("T")
+
+
+class PollResult(NamedTuple):
+    # The result of the most recent successful poll, if any
+    value: Any
+    # time.time() at which value was collected
+    timestamp: float
+    # Whether the most recent poll succeeded
+    success: bool
+
+
+class Poller(Generic[K, T]):
+    """
+    Calls poll(key) for each key every interval seconds (give or take jitter, a
+    fraction of the interval) using a pool of workers threads, and remembers the
+    results. A key that is still being polled when it is next due is skipped.
+    """
+
+    def __init__(
+        self,
+        poll: Callable[[K], T],
+        workers: int = 4,
+        jitter: float = 0.1,
+    ) -> None:
+        self.__poll = poll
+        self.__workers = workers
+        self.__jitter = jitter
+        self.__intervals: dict[K, float] = {}
+        self.__results: dict[K, PollResult] = {}
+        self.__running: set[K] = set()
+        self.__lock = threading.Lock()
+        self.__stop = threading.Event()
+        self.__thread: Optional[threading.Thread] = None
+
+    def __contains__(self, key: K) -> bool:
+        return key in self.__intervals
+
+    def add(self, key: K, interval: float) -> None:
+        if self.__thread is not None:
+            raise RuntimeError("Can't add keys once the poller has started")
+        self.__intervals[key] = interval
+
+    def keys(self) -> list[K]:
+        return list(self.__intervals)
+
+    def interval(self, key: K) -> float:
+        return self.__intervals[key]
+
+    def result(self, key: K) -> Optional[PollResult]:
+        with self.__lock:
+            return self.__results.get(key)
+
+    def start(self) -> None:
+        """
+        Start polling, if not already started. Safe to call repeatedly; the poller is
+        started lazily so that its threads are created in the process that serves
+        probes rather than (say) a gunicorn master process.
+        """
+        with self.__lock:
+            if self.__thread is not None or not self.__intervals:
+                return
+            self.__thread = threading.Thread(
+                target=self.__run, name="poller", daemon=True
+            )
+            self.__thread.start()
+
+    def stop(self) -> None:
+        self.__stop.set()
+        if self.__thread is not None:
+            self.__thread.join()
+
+    def __run(self) -> None:
+        # Spread the first round of polls across each key's interval, so that they
+        # don't all happen at once.
+        schedule = [
+            (time.monotonic() + random.uniform(0, interval), n, key)  # nosec B311
+            for n, (key, interval) in enumerate(self.__intervals.items())
+        ]
+        heapq.heapify(schedule)
+
+        with ThreadPoolExecutor(
+            max_workers=self.__workers, thread_name_prefix="poll"
+        ) as executor:
+            while schedule:
+                due, n, key = schedule[0]
+                if self.__stop.wait(max(0.0, due - time.monotonic())):
+                    break
+
+                with self.__lock:
+                    busy = key in self.__running
+                    self.__running.add(key)
+                if busy:
+                    LOGGER.warning("Still polling %r; skipping this round", key)
+                else:
+                    executor.submit(self.__poll_one, key)
+
+                interval = self.__intervals[key]
+                jitter = random.uniform(-self.__jitter, self.__jitter)  # nosec B311
+                delay = interval * (1 + jitter)
+                heapq.heapreplace(schedule, (due + delay, n, key))
+
+    def __poll_one(self, key: K) -> None:
+        try:
+            value = self.__poll(key)
+        except Exception:  # pylint: disable=broad-except
+            LOGGER.exception("Failed to poll %r", key)
+            with self.__lock:
+                previous = self.__results.get(key)
+                self.__results[key] = PollResult(
+                    previous.value if previous else None,
+                    previous.timestamp if previous else 0.0,
+                    False,
+                )
+        else:
+            with self.__lock:
+                self.__results[key] = PollResult(value, time.time(), True)
+        finally:
+            with self.__lock:
+                self.__running.discard(key)
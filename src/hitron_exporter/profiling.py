@@ -0,0 +1,90 @@
+"""
+A sampling profiler for the whole exporter process. Every thread's stack is sampled at
+intervals for as long as a profile is requested, so probes being served by other
+threads are seen as they run; nothing is done while no profile is being taken.
+
+Profiles are returned as collapsed stacks (one line per distinct stack: the frames,
+outermost first, separated by semicolons, followed by the number of samples), which
+flamegraph.pl, speedscope and similar tools accept.
+"""
+
+from collections import Counter
+import hmac
+import ipaddress
+import sys
+import threading
+import time
+from types import FrameType
+from typing import Optional
+
+
+_lock = threading.Lock()
+
+
+class BusyError(RuntimeError):
+    """
+    Another profile is already being taken.
+    """
+
+
+def allowed(
+    remote_addr: Optional[str], authorization: Optional[str], token: Optional[str]
+) -> bool:
+    """
+    Whether a client may take a profile: it must connect from a loopback address, or
+    present the token (if one is configured) as a bearer token.
+    """
+    if token and authorization is not None:
+        scheme, _, credentials = authorization.partition(" ")
+        if scheme.lower() == "bearer" and hmac.compare_digest(
+            credentials.strip().encode("utf-8"), token.encode("utf-8")
+        ):
+            return True
+    try:
+        return remote_addr is not None and ipaddress.ip_address(remote_addr).is_loopback
+    except ValueError:
+        return False
+
+
+def profile(seconds: float, interval: float = 0.005) -> str:
+    """
+    Sample the stacks of every thread (other than the caller's) every interval seconds
+    for the given number of seconds, and return them as collapsed stacks. Raises
+    BusyError if a profile is already being taken.
+    """
+    if not _lock.acquire(blocking=False):
+        raise BusyError("A profile is already being taken")
+    try:
+        return collapse(sample(seconds, interval))
+    finally:
+        _lock.release()
+
+
+def sample(seconds: float, interval: float) -> Counter[tuple[str, ...]]:
+    me = threading.get_ident()
+    stacks: Counter[tuple[str, ...]] = Counter()
+    deadline = time.monotonic() + seconds
+    while time.monotonic() < deadline:
+        names = {thread.ident: thread.name for thread in threading.enumerate()}
+        # pylint: disable-next=protected-access
+        for ident, frame in sys._current_frames().items():
+            if ident != me:
+                stacks[(names.get(ident, str(ident)), *_frames(frame))] += 1
+        time.sleep(interval)
+    return stacks
+
+
+def _frames(frame: Optional[FrameType]) -> tuple[str, ...]:
+    frames = []
+    while frame is not None:
+        code = frame.f_code
+        frames.append(f"{code.co_name} ({code.co_filename}:{code.co_firstlineno})")
+        frame = frame.f_back
+    return tuple(reversed(frames))
+
+
+def collapse(stacks: Counter[tuple[str, ...]]) -> str:
+    return "".join(
+        f"{';'.join(s.replace(';', ':') for s in stack)} {count}\n"
+        for stack, count in stacks.most_common()
+    )
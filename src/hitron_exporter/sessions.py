@@ -0,0 +1,158 @@
+from contextlib import contextmanager
+from logging import getLogger
+import threading
+import time
+from typing import Any, Iterator, NamedTuple, Optional
+
+from . import hitron
+
+
+LOGGER = getLogger(__name__)
+
+
+class SessionKey(NamedTuple):
+    host: str
+    port: int
+    fingerprint: Optional[str]
+    usr: str
+    pwd: str
+
+
+class PersistentClient(hitron.Client):
+    """
+    A Client that remembers the credentials it logged in with, and logs in again when
+    the modem reports that the session has expired.
+    """
+
+    def __init__(
+        self,
+        host: str,
+        fingerprint: Optional[str],
+        port: int = 443,
+        cache: Optional[hitron.DatasetCache] = None,
+        max_body_size: int = hitron.MAX_BODY_SIZE,
+    ) -> None:
+        super().__init__(
+            host, fingerprint, port=port, cache=cache, max_body_size=max_body_size
+        )
+        self.__credentials: Optional[tuple[str, str, bool]] = None
+        # Several threads may notice that the session has expired at the same time;
+        # only one of them should log in again.
+        self.__login_lock = threading.Lock()
+        self.__login_generation = 0
+
+    def login(self, usr: str, pwd: str, force: bool = False) -> None:
+        super().login(usr, pwd, force)
+        self.__credentials = (usr, pwd, force)
+        self.__login_generation += 1
+
+    def get_data(self, dataset: hitron.Client.Dataset) -> Any:
+        generation = self.__login_generation
+        try:
+            return super().get_data(dataset)
+        except hitron.NotLoggedInError:
+            if self.__credentials is None:
+                raise
+            with self.__login_lock:
+                if generation == self.__login_generation:
+                    LOGGER.info(
+                        "Session expired while fetching %s; logging in again", dataset
+                    )
+                    self.login(*self.__credentials)
+            return super().get_data(dataset)
+
+
+class _Session:
+    def __init__(self) -> None:
+        self.lock = threading.Lock()
+        self.client: Optional[PersistentClient] = None
+        self.last_used = time.monotonic()
+
+    def close(self) -> None:
+        with self.lock:
+            client, self.client = self.client, None
+        if client is None:
+            return
+        try:
+            client.logout()
+        except Exception:  # pylint: disable=broad-except
+            LOGGER.warning("Unable to log out of idle session", exc_info=True)
+
+
+class SessionManager:
+    """
+    Keeps logged in Clients around between probes, so that each scrape doesn't have to
+    pay for a login and a logout. Sessions are logged out when they have been idle for
+    longer than idle_timeout, when more than max_sessions are open, when a probe using
+    them fails, or when close() is called.
+    """
+
+    def __init__(
+        self,
+        idle_timeout: float = 300.0,
+        max_sessions: int = 64,
+        cache: Optional[hitron.DatasetCache] = None,
+        max_body_size: int = hitron.MAX_BODY_SIZE,
+    ) -> None:
+        self.__cache = cache
+        self.__max_body_size = max_body_size
+        self.__idle_timeout = idle_timeout
+        self.__max_sessions = max(1, max_sessions)
+        self.__sessions: dict[SessionKey, _Session] = {}
+        self.__lock = threading.Lock()
+
+    @contextmanager
+    def client(self, key: SessionKey, force: bool = False) -> Iterator[hitron.Client]:
+        session = self.__checkout(key)
+        try:
+            with session.lock:
+                if session.client is None:
+                    client = PersistentClient(
+                        key.host,
+                        key.fingerprint,
+                        port=key.port,
+                        cache=self.__cache,
+                        max_body_size=self.__max_body_size,
+                    )
+                    client.login(key.usr, key.pwd, force)
+                    session.client = client
+                yield session.client
+                session.last_used = time.monotonic()
+        except Exception:
+            self.__discard(key, session)
+            raise
+
+    def close(self) -> None:
+        with self.__lock:
+            sessions = list(self.__sessions.values())
+            self.__sessions.clear()
+        for session in sessions:
+            session.close()
+
+    def __checkout(self, key: SessionKey) -> _Session:
+        now = time.monotonic()
+        with self.__lock:
+            evicted = [
+                k
+                for k, s in self.__sessions.items()
+                if k != key and now - s.last_used > self.__idle_timeout
+            ]
+            session = self.__sessions.pop(key, None)
+            if session is None:
+                session = _Session()
+            # Most recently used sessions live at the end of the dict
+            self.__sessions[key] = session
+            while len(self.__sessions) - len(evicted) > self.__max_sessions:
+                oldest = next(k for k in self.__sessions if k not in evicted)
+                evicted.append(oldest)
+            expired = [self.__sessions.pop(k) for k in evicted]
+
+        for s in expired:
+            s.close()
+        return session
+
+    def __discard(self, key: SessionKey, session: _Session) -> None:
+        with self.__lock:
+            if self.__sessions.get(key) is session:
+                del self.__sessions[key]
+        session.close()
@@ -0,0 +1,137 @@
+"""
+Coalesce concurrent calls that share a key, so that only one of them does the work and
+the rest wait for its result; and serialize those that can't share their work. The
+modem permits only one logged in session at a time, so two probes of the same modem
+that overlap would otherwise collide.
+"""
+
+from concurrent.futures import Future
+from contextlib import asynccontextmanager, contextmanager
+import threading
+from typing import (
+    TYPE_CHECKING,
+    AsyncIterator,
+    Awaitable,
+    Callable,
+    Generic,
+    Hashable,
+    Iterator,
+    TypeVar,
+)
+
+# asyncio is only needed by AsyncGroup, which the WSGI app doesn't use; importing it
+# would add to the startup time of every worker.
+if TYPE_CHECKING:
+    import asyncio
+
+
+T = TypeVar("T")
+
+
+class Group(Generic[T]):
+    def __init__(self) -> None:
+        self.__lock = threading.Lock()
+        self.__calls: dict[Hashable, Future[T]] = {}
+
+    def do(self, key: Hashable, fn: Callable[[], T]) -> tuple[T, bool]:
+        """
+        Call fn, unless a call with the same key is already in progress, in which case
+        wait for it to finish. Returns the result, and whether it was shared with
+        another caller. Exceptions raised by fn are raised to every caller.
+        """
+        with self.__lock:
+            future = self.__calls.get(key)
+            leader = future is None
+            if future is None:
+                future = self.__calls[key] = Future()
+
+        if not leader:
+            return future.result(), True
+
+        try:
+            future.set_result(fn())
+        except BaseException as e:
+            future.set_exception(e)
+        finally:
+            with self.__lock:
+                del self.__calls[key]
+        return future.result(), False
+
+
+class AsyncGroup(Generic[T]):
+    def __init__(self) -> None:
+        self.__tasks: dict[Hashable, asyncio.Future[T]] = {}
+
+    async def do(self, key: Hashable, fn: Callable[[], Awaitable[T]]) -> tuple[T, bool]:
+        """
+        As Group.do, but for coroutines. Cancelling one caller does not cancel the
+        call that the others are waiting for.
+        """
+        import asyncio  # pylint: disable=import-outside-toplevel,redefined-outer-name
+
+        task = self.__tasks.get(key)
+        shared = task is not None
+        if task is None:
+            task = self.__tasks[key] = asyncio.ensure_future(fn())
+
+            def forget(_: "asyncio.Future[T]") -> None:
+                if self.__tasks.get(key) is task:
+                    del self.__tasks[key]
+
+            task.add_done_callback(forget)
+
+        return await asyncio.shield(task), shared
+
+
+class KeyedLock:
+    def __init__(self) -> None:
+        self.__lock = threading.Lock()
+        # The lock for each key, and the number of callers holding or waiting for it
+        self.__locks: dict[Hashable, tuple[threading.Lock, int]] = {}
+
+    @contextmanager
+    def hold(self, key: Hashable) -> Iterator[None]:
+        """
+        Hold the lock for key, waiting for any other caller holding it to release it.
+        """
+        with self.__lock:
+            lock, users = self.__locks.get(key, (None, 0))
+            if lock is None:
+                lock = threading.Lock()
+            self.__locks[key] = (lock, users + 1)
+        try:
+            with lock:
+                yield
+        finally:
+            with self.__lock:
+                _, users = self.__locks[key]
+                if users == 1:
+                    del self.__locks[key]
+                else:
+                    self.__locks[key] = (lock, users - 1)
+
+
+class AsyncKeyedLock:
+    def __init__(self) -> None:
+        self.__locks: dict[Hashable, tuple[asyncio.Lock, int]] = {}
+
+    @asynccontextmanager
+    async def hold(self, key: Hashable) -> AsyncIterator[None]:
+        """
+        As KeyedLock.hold, but for coroutines.
+        """
+        import asyncio  # pylint: disable=import-outside-toplevel,redefined-outer-name
+
+        lock, users = self.__locks.get(key, (None, 0))
+        if lock is None:
+            lock = asyncio.Lock()
+        self.__locks[key] = (lock, users + 1)
+        try:
+            async with lock:
+                yield
+        finally:
+            _, users = self.__locks[key]
+            if users == 1:
+                del self.__locks[key]
+            else:
+                self.__locks[key] = (lock, users - 1)
@@ -0,0 +1,198 @@
+"""
+Timing of the phases of a probe (retrieving credentials, TLS handshakes, logging in,
+fetching each dataset, logging out, rendering the exposition).
+
+Every phase is observed by a histogram served on the exporter's own /metrics. Phases
+that happen during a probe are also added up in the Timings of that probe, which can
+be included in the probe's output.
+
+If enable_tracing is called, each phase is also traced as an OpenTelemetry span. Until
+then, no use is made of OpenTelemetry, which need not be installed.
+"""
+
+from contextlib import AbstractContextManager, contextmanager, nullcontext
+from contextvars import ContextVar
+from logging import getLogger
+import threading
+import time
+from typing import Any, Iterable, Iterator, Mapping, Optional
+
+import prometheus_client
+from prometheus_client.core import GaugeMetricFamily
+
+
+LOGGER = getLogger(__name__)
+
+
+# Not labelled by target, so that the number of time series stays bounded
+PHASE_DURATION = prometheus_client.Histogram(
+    "hitron_exporter_phase_duration_seconds",
+    "Time spent in each phase of probing modems",
+    ["phase", "dataset"],
+)
+
+
+class Timings:
+    """
+    The total time spent in each (phase, dataset) during a probe. Phases may overlap
+    (for instance, a TLS handshake happens during the request that fetches a dataset)
+    and datasets may be fetched concurrently, so the times don't add up to the duration
+    of the probe.
+    """
+
+    def __init__(self) -> None:
+        self.__seconds: dict[tuple[str, str], float] = {}
+        self.__lock = threading.Lock()
+
+    def add(self, phase: str, dataset: str, seconds: float) -> None:
+        with self.__lock:
+            key = (phase, dataset)
+            self.__seconds[key] = self.__seconds.get(key, 0.0) + seconds
+
+    def collect(self) -> Iterator[GaugeMetricFamily]:
+        with self.__lock:
+            items = sorted(self.__seconds.items())
+        families: dict[str, GaugeMetricFamily] = {}
+        for (phase, dataset), seconds in items:
+            if (family := families.get(phase)) is None:
+                family = families[phase] = GaugeMetricFamily(
+                    _gauge_name(phase),
+                    f"Seconds spent in the {phase} phase of the probe",
+                    labels=["dataset"] if dataset else None,
+                )
+            family.add_metric([dataset] if dataset else [], seconds)
+        yield from families.values()
+
+
+def _gauge_name(phase: str) -> str:
+    # Like blackbox_exporter's probe_duration_seconds
+    if phase == "probe":
+        return "hitron_probe_duration_seconds"
+    return f"hitron_probe_{phase}_seconds"
+
+
+_current: ContextVar[Optional[Timings]] = ContextVar("timings", default=None)
+
+
+def current() -> Optional[Timings]:
+    """
+    The Timings of the probe in progress, if any.
+    """
+    return _current.get()
+
+
+@contextmanager
+def probe(target: str = "") -> Iterator[Timings]:
+    """
+    Phases measured within the block (including in threads that run with a copy of
+    its context, and in tasks it creates) are added to the Timings it returns. The
+    block as a whole is measured as the "probe" phase.
+    """
+    timings = Timings()
+    token = _current.set(timings)
+    try:
+        with measure("probe", attributes={"hitron.target": target} if target else None):
+            yield timings
+    finally:
+        _current.reset(token)
+
+
+@contextmanager
+def measure(
+    phase: str, dataset: str = "", attributes: Optional[Mapping[str, str]] = None
+) -> Iterator[None]:
+    start = time.perf_counter()
+    try:
+        if _tracer is None:
+            yield
+        else:
+            span_attributes = dict(attributes or {})
+            if dataset:
+                span_attributes["hitron.dataset"] = dataset
+            with span(phase, span_attributes):
+                yield
+    finally:
+        _record(phase, dataset, time.perf_counter() - start)
+
+
+def measure_iter(
+    chunks: Iterable[bytes], phase: str, elapsed: float = 0.0
+) -> Iterator[bytes]:
+    """
+    Measure the time spent producing chunks, which is recorded once they have all been
+    produced (or the iterator is closed), plus elapsed seconds spent beforehand.
+
+    Since chunks may be produced after the caller's span has ended, the span for phase
+    is created at the end, as a child of the span that was current when this function
+    was called, with a duration of the time spent.
+    """
+    parent = None if _otel_context is None else _otel_context.get_current()
+    try:
+        iterator = iter(chunks)
+        while True:
+            start = time.perf_counter()
+            try:
+                chunk = next(iterator)
+            except StopIteration:
+                return
+            finally:
+                elapsed += time.perf_counter() - start
+            yield chunk
+    finally:
+        _record(phase, "", elapsed)
+        if _tracer is not None:
+            end = time.time_ns()
+            _tracer.start_span(
+                phase, context=parent, start_time=end - int(elapsed * 1e9)
+            ).end(end_time=end)
+
+
+def _record(phase: str, dataset: str, seconds: float) -> None:
+    PHASE_DURATION.labels(phase, dataset).observe(seconds)
+    if (timings := _current.get()) is not None:
+        timings.add(phase, dataset, seconds)
+
+
+# The OpenTelemetry tracer and context module, once enable_tracing has been called
+_tracer: Any = None
+_otel_context: Any = None
+
+
+def enable_tracing(tracer_provider: Any = None) -> bool:
+    """
+    Trace phases with OpenTelemetry, using the global tracer provider unless another is
+    given. Returns False (having logged a warning) if OpenTelemetry is not installed.
+    """
+    global _tracer, _otel_context  # pylint: disable=global-statement
+    try:
+        # pylint: disable-next=import-outside-toplevel
+        from opentelemetry import context, trace  # type: ignore [import]
+    except ImportError:
+        LOGGER.warning("Tracing is disabled because OpenTelemetry is not installed")
+        return False
+    _tracer = trace.get_tracer(__name__, tracer_provider=tracer_provider)
+    _otel_context = context
+    return True
+
+
+def disable_tracing() -> None:
+    global _tracer, _otel_context  # pylint: disable=global-statement
+    _tracer = _otel_context = None
+
+
+_NOT_TRACED: AbstractContextManager[None] = nullcontext()
+
+
+def span(
+    name: str, attributes: Optional[Mapping[str, str]] = None
+) -> AbstractContextManager[Any]:
+    """
+    A span that is current within the block, if tracing is enabled. Costs next to
+    nothing otherwise.
+    """
+    if _tracer is None:
+        return _NOT_TRACED
+    current_span: AbstractContextManager[Any] = _tracer.start_as_current_span(
+        name, attributes=attributes
+    )
+    return current_span
@@ -12,11 +12,17 @@ def retrieve(name: str, **kwargs_: Any) -> str:
     return data.decode("utf-8")
 
 
-kwargs = json.load(sys.stdin)
-
-output = {
-    "usr": retrieve("usr", **kwargs),
-    "pwd": retrieve("pwd", **kwargs),
-}
-
-json.dump(output, sys.stdout)
+# Each line of input is a request, answered by a line of output, so that one process
+# (and one authenticated session) can serve many retrievals.
+while line := sys.stdin.readline():
+    kwargs = json.loads(line)
+    try:
+        output = {
+            "usr": retrieve("usr", **kwargs),
+            "pwd": retrieve("pwd", **kwargs),
+        }
+    except Exception as e:  # pylint: disable=broad-except
+        output = {"error": f"{type(e).__name__}: {e}"}
+    json.dump(output, sys.stdout)
+    sys.stdout.write("\n")
+    sys.stdout.flush()
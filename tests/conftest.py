@@ -1,3 +1,33 @@
+import ssl
+
 from pytest_pilot import EasyMarker
+import pytest
+import trustme
 
 suite = EasyMarker("suite", mode="silos")
+
+
+@pytest.fixture(scope="session")
+def ca():
+    return trustme.CA()
+
+
+@pytest.fixture(scope="session")
+def localhost_cert(ca):
+    # The real web server's TLS server certificate has no Subject Alternative Name
+    # values, and a subject of:
+    # CN=02:00:00:00:00:00,
+    # OU=No. 40\, Wu-kung 5th Rd.\, Wu-ku\, Taipei Hsien\, Taiwan,
+    # O=Hitron Technologies,
+    # C=TW
+    return ca.issue_cert(common_name="02:00:00:00:00:00")
+
+
+@pytest.fixture(scope="session")
+def httpserver_ssl_context(localhost_cert):
+    """
+    This fixture causes pytest_httpserver to become an HTTPS server.
+    """
+    context = ssl.SSLContext(ssl.PROTOCOL_TLS_SERVER)
+    localhost_cert.configure_cert(context)
+    return context
@@ -0,0 +1,435 @@
+import asyncio
+import binascii
+import hashlib
+import json
+import ssl
+
+import pytest
+import urllib3.exceptions
+from werkzeug.wrappers import Request, Response
+
+from hitron_exporter import jsonstream
+from hitron_exporter.aiohitron import Client, ConnectionPool
+from hitron_exporter.hitron import ResponseTooLargeError, shared_ssl_context
+
+
+def test_fingerprint_checked(httpserver) -> None:
+    # given:
+    async def main():
+        client = Client(
+            "localhost",
+            fingerprint="00:11:22:33:44:55:66:77:88:99:aa:bb:cc:dd:ee:ff",
+            port=httpserver.port,
+        )
+        try:
+            await client.http_request("GET", "/")
+        finally:
+            await client.aclose()
+
+    # then:
+    with pytest.raises(
+        urllib3.exceptions.SSLError, match="Fingerprints did not match."
+    ):
+        # when
+        asyncio.run(main())
+
+    # then:
+    httpserver.check()
+
+
+def test_fingerprint_matches(httpserver, localhost_cert) -> None:
+    # given:
+    cert_der = ssl.PEM_cert_to_DER_cert(
+        localhost_cert.cert_chain_pems[0].bytes().decode("ascii")
+    )
+    fingerprint = binascii.hexlify(hashlib.sha256(cert_der).digest(), ":").decode(
+        "ascii"
+    )
+    httpserver.expect_request("/", method="GET").respond_with_data("hello")
+
+    async def main():
+        client = Client("localhost", fingerprint=fingerprint, port=httpserver.port)
+        try:
+            return await client.http_request("GET", "/")
+        finally:
+            await client.aclose()
+
+    # when:
+    r = asyncio.run(main())
+
+    # then:
+    httpserver.check()
+    assert r.status == 200
+    assert r.data == b"hello"
+
+
+def test_fingerprint_optional(httpserver, localhost_cert, caplog) -> None:
+    # given:
+    cert_der = ssl.PEM_cert_to_DER_cert(
+        localhost_cert.cert_chain_pems[0].bytes().decode("ascii")
+    )
+    digest = hashlib.sha256(cert_der).digest()
+    fingerprint = binascii.hexlify(digest, ":").decode("ascii")
+
+    httpserver.expect_request("/", method="GET").respond_with_data("")
+
+    async def main():
+        client = Client("localhost", fingerprint=None, port=httpserver.port)
+        try:
+            await client.http_request("GET", "/")
+        finally:
+            await client.aclose()
+
+    # when:
+    asyncio.run(main())
+
+    # then:
+    httpserver.check()
+    expected_messages = (
+        rec
+        for rec in caplog.records
+        if rec.name.startswith("hitron_exporter.") and fingerprint in rec.message
+    )
+    assert any(expected_messages)
+
+
+def test_login_get_data_logout(httpserver) -> None:
+    # given:
+    httpserver.expect_request("/", method="GET").respond_with_data(
+        "", status=302, headers={"Set-Cookie": "preSession=presession_id; path=/"}
+    )
+
+    def login_handler(request: Request) -> Response:
+        assert request.form.get("usr") == "uuu"
+        assert request.form.get("pwd") == "ppp"
+        assert request.form.get("forcelogoff") == "1"
+        assert request.form.get("preSession") == "presession_id"
+        return Response(
+            "success", headers={"Set-Cookie": "session=sessionid; path=/; HttpOnly"}
+        )
+
+    httpserver.expect_request("/goform/login", method="POST").respond_with_handler(
+        login_handler
+    )
+
+    def data_handler(request: Request) -> Response:
+        assert request.cookies.get("session") == "sessionid"
+        return Response('[{"tunefreq": "213.45"}]', content_type="application/json")
+
+    httpserver.expect_request(
+        "/data/getTuneFreq.asp", method="GET"
+    ).respond_with_handler(data_handler)
+
+    logout_called = {}
+
+    def logout_handler(request: Request) -> Response:
+        assert request.cookies.get("session") == "sessionid"
+        assert request.form.get("data") == "byebye"
+        logout_called["called"] = True
+        return Response(status=302)
+
+    httpserver.expect_request("/goform/logout", method="POST").respond_with_handler(
+        logout_handler
+    )
+
+    async def main():
+        client = Client("localhost", fingerprint="", port=httpserver.port)
+        try:
+            await client.login("uuu", "ppp", force=True)
+            data = await asyncio.gather(
+                *(client.get_data(Client.Dataset.TUNEFREQ) for _ in range(3))
+            )
+            await client.logout()
+            return data
+        finally:
+            await client.aclose()
+
+    # when:
+    data = asyncio.run(main())
+
+    # then:
+    httpserver.check()
+    assert data == [[{"tunefreq": "213.45"}]] * 3
+    assert logout_called.get("called")
+
+
+def test_login_rejected(httpserver) -> None:
+    # given:
+    httpserver.expect_request("/", method="GET").respond_with_data(
+        "", status=302, headers={"Set-Cookie": "preSession=presession_id; path=/"}
+    )
+    httpserver.expect_request("/goform/login", method="POST").respond_with_data(
+        "Repeat Login"
+    )
+
+    async def main():
+        client = Client("localhost", fingerprint="", port=httpserver.port)
+        try:
+            await client.login("uuu", "ppp")
+        finally:
+            await client.aclose()
+
+    # then:
+    with pytest.raises(RuntimeError, match="Repeat Login"):
+        # when:
+        asyncio.run(main())
+
+
+def test_not_logged_in(httpserver) -> None:
+    # given:
+    httpserver.expect_request("/data/getTuneFreq.asp", method="GET").respond_with_data(
+        "", status=302
+    )
+
+    async def main():
+        client = Client("localhost", fingerprint="", port=httpserver.port)
+        try:
+            await client.get_data(Client.Dataset.TUNEFREQ)
+        finally:
+            await client.aclose()
+
+    # then:
+    with pytest.raises(RuntimeError, match="Not logged in"):
+        # when:
+        asyncio.run(main())
+
+
+def test_get_data_too_large(httpserver) -> None:
+    # given:
+    httpserver.expect_request("/data/getTuneFreq.asp", method="GET").respond_with_json(
+        [{"tunefreq": "213.45"}] * 100
+    )
+
+    async def main():
+        client = Client(
+            "localhost", fingerprint="", port=httpserver.port, max_body_size=64
+        )
+        try:
+            await client.get_data(Client.Dataset.TUNEFREQ)
+        finally:
+            await client.aclose()
+
+    # then:
+    with pytest.raises(
+        ResponseTooLargeError, match=r"getTuneFreq\.asp> is larger than 64 bytes"
+    ):
+        # when:
+        asyncio.run(main())
+
+
+def test_get_data_decoded_incrementally(httpserver, monkeypatch) -> None:
+    # given: a body several times the size of the chunks it is read in
+    records = [{"tunefreq": str(i)} for i in range(20000)]
+    httpserver.expect_request("/data/getTuneFreq.asp", method="GET").respond_with_json(
+        records
+    )
+    fed = []
+    decoder_class = jsonstream.Decoder
+
+    class Decoder(decoder_class):
+        def feed(self, data):
+            fed.append(len(data))
+            super().feed(data)
+
+    monkeypatch.setattr("hitron_exporter.jsonstream.Decoder", Decoder)
+
+    async def main():
+        client = Client("localhost", fingerprint="", port=httpserver.port)
+        try:
+            return await client.get_data(Client.Dataset.TUNEFREQ)
+        finally:
+            await client.aclose()
+
+    # when:
+    data = asyncio.run(main())
+
+    # then:
+    assert data == records
+    assert len(fed) > 1
+    assert max(fed) <= 64 * 1024
+
+
+def test_get_data_invalid_json(httpserver) -> None:
+    # given:
+    httpserver.expect_request("/data/getTuneFreq.asp", method="GET").respond_with_data(
+        '[{"tunefreq": }]', content_type="application/json"
+    )
+
+    async def main():
+        client = Client("localhost", fingerprint="", port=httpserver.port)
+        try:
+            await client.get_data(Client.Dataset.TUNEFREQ)
+        finally:
+            await client.aclose()
+
+    # then:
+    with pytest.raises(json.JSONDecodeError):
+        # when:
+        asyncio.run(main())
+
+
+async def close_delimited_server(localhost_cert, *parts):
+    """
+    A server that answers with a body without Content-Length or chunked encoding, in
+    several writes, and then closes the connection.
+    """
+    context = ssl.SSLContext(ssl.PROTOCOL_TLS_SERVER)
+    localhost_cert.configure_cert(context)
+
+    async def serve(reader, writer):
+        while (await reader.readline()) not in (b"\r\n", b""):
+            pass
+        writer.write(
+            b"HTTP/1.1 200 OK\r\nContent-Type: application/json\r\n"
+            b"Connection: close\r\n\r\n"
+        )
+        for part in parts:
+            writer.write(part)
+            await writer.drain()
+            await asyncio.sleep(0.05)
+        writer.close()
+
+    return await asyncio.start_server(serve, "localhost", 0, ssl=context)
+
+
+@pytest.mark.filterwarnings("ignore::urllib3.connectionpool.InsecureRequestWarning")
+def test_get_data_close_delimited(localhost_cert) -> None:
+    # given:
+    async def main():
+        server = await close_delimited_server(
+            localhost_cert, b"[", b'{"a": 1}', b", {}]"
+        )
+        client = Client(
+            "localhost", fingerprint="", port=server.sockets[0].getsockname()[1]
+        )
+        try:
+            return await client.get_data(Client.Dataset.TUNEFREQ)
+        finally:
+            await client.aclose()
+            server.close()
+
+    # when:
+    data = asyncio.run(main())
+
+    # then:
+    assert data == [{"a": 1}, {}]
+
+
+@pytest.mark.filterwarnings("ignore::urllib3.connectionpool.InsecureRequestWarning")
+def test_get_data_close_delimited_too_large(localhost_cert) -> None:
+    # given:
+    async def main():
+        server = await close_delimited_server(localhost_cert, b"[" + b"1, " * 30, b"1]")
+        client = Client(
+            "localhost",
+            fingerprint="",
+            port=server.sockets[0].getsockname()[1],
+            max_body_size=64,
+        )
+        try:
+            return await client.get_data(Client.Dataset.TUNEFREQ)
+        finally:
+            await client.aclose()
+            server.close()
+
+    # then:
+    with pytest.raises(ResponseTooLargeError):
+        # when:
+        asyncio.run(main())
+
+
+async def keep_alive_server(localhost_cert, connections):
+    """
+    A server that answers every request on a connection with an empty JSON array,
+    keeping the connection alive, and counts the connections made to it.
+    """
+    context = ssl.SSLContext(ssl.PROTOCOL_TLS_SERVER)
+    localhost_cert.configure_cert(context)
+
+    async def serve(reader, writer):
+        connections.append(writer)
+        while await reader.readline():
+            while (await reader.readline()) not in (b"\r\n", b""):
+                pass
+            writer.write(
+                b"HTTP/1.1 200 OK\r\nContent-Type: application/json\r\n"
+                b"Content-Length: 2\r\n\r\n[]"
+            )
+            await writer.drain()
+        writer.close()
+
+    return await asyncio.start_server(serve, "localhost", 0, ssl=context)
+
+
+@pytest.mark.filterwarnings("ignore::urllib3.connectionpool.InsecureRequestWarning")
+def test_connection_pool_shared_between_clients(localhost_cert) -> None:
+    # given:
+    connections = []
+    ssl_context = shared_ssl_context()
+    before = sum(ssl_context.handshakes.values())
+
+    async def main():
+        server = await keep_alive_server(localhost_cert, connections)
+        pool = ConnectionPool()
+        try:
+            for _ in range(3):
+                client = Client(
+                    "localhost",
+                    fingerprint="",
+                    port=server.sockets[0].getsockname()[1],
+                    pool=pool,
+                )
+                await client.get_data(Client.Dataset.TUNEFREQ)
+                await client.aclose()
+        finally:
+            pool.close()
+            server.close()
+
+    # when:
+    asyncio.run(main())
+
+    # then:
+    assert len(connections) == 1
+    assert sum(ssl_context.handshakes.values()) - before == 1
+
+
+@pytest.mark.filterwarnings("ignore::urllib3.connectionpool.InsecureRequestWarning")
+def test_tls_session_resumed(localhost_cert) -> None:
+    # given:
+    connections = []
+    ssl_context = shared_ssl_context()
+    before = dict(ssl_context.handshakes)
+
+    async def main():
+        server = await keep_alive_server(localhost_cert, connections)
+        try:
+            for _ in range(2):
+                client = Client(
+                    "localhost",
+                    fingerprint="",
+                    port=server.sockets[0].getsockname()[1],
+                )
+                await client.get_data(Client.Dataset.TUNEFREQ)
+                await client.aclose()
+        finally:
+            server.close()
+
+    # when:
+    asyncio.run(main())
+
+    # then:
+    assert len(connections) == 2
+    assert ssl_context.handshakes["full"] - before["full"] <= 1
+    assert ssl_context.handshakes["resumed"] - before["resumed"] == 1
+
+
+def test_request_to_other_host_refused(httpserver) -> None:
+    # given:
+    async def main():
+        client = Client("localhost", fingerprint="", port=httpserver.port)
+        await client.http_request("GET", "https://example.com/")
+
+    # then:
+    with pytest.raises(ValueError):
+        # when:
+        asyncio.run(main())
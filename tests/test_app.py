@@ -1,3 +1,7 @@
+from concurrent.futures import ThreadPoolExecutor
+import threading
+import time
+
 import pytest
 from unittest import mock
 
@@ -32,6 +36,9 @@ def mock_app_integrations(monkeypatch, mock_client, mock_registry, mock_collecto
         return {"usr": "U", "pwd": "P"}
 
     monkeypatch.setattr("hitron_exporter.ipavault.retrieve", mock_vault_retrieve)
+    monkeypatch.setattr(
+        "hitron_exporter.vault_credentials", hitron_exporter.ipavault.CredentialCache()
+    )
 
     monkeypatch.setattr("prometheus_client.CollectorRegistry", mock_registry)
     monkeypatch.setattr("hitron_exporter.Collector", mock_collector)
@@ -142,3 +149,281 @@ def test_with_vault(flask_client, mock_client):
     mock_client.return_value.login.assert_called_with("U", "P", force=False)
     mock_client.return_value.logout.assert_called()
     assert res.status.startswith("200 ")
+
+
+@pytest.fixture
+def polling(monkeypatch, mock_collector):
+    collector = mock_collector.return_value
+    collector.collect.return_value = []
+    poller = hitron_exporter.poller.Poller(lambda target: collector)
+    poller.add("polled", 0.01)
+    monkeypatch.setattr("hitron_exporter.poller_", poller)
+    yield poller
+    poller.stop()
+
+
+def test_polled_target(flask_client, mock_client, polling):
+    # given:
+    polling.start()
+    deadline = time.monotonic() + 5
+    while polling.result("polled") is None and time.monotonic() < deadline:
+        time.sleep(0.01)
+
+    # when:
+    res = flask_client.get("/probe", query_string={"target": "polled"})
+
+    # then:
+    mock_client.assert_not_called()
+    assert res.status.startswith("200 ")
+
+
+def test_polled_target_not_yet_polled(flask_client, mock_client, polling, monkeypatch):
+    # given:
+    monkeypatch.setattr(polling, "start", lambda: None)
+
+    # when:
+    res = flask_client.get("/probe", query_string={"target": "polled"})
+
+    # then:
+    mock_client.assert_not_called()
+    assert res.status.startswith("503 ")
+
+
+def test_batch(flask_client, mock_client):
+    res = flask_client.get(
+        "/probe", query_string={"target": ["t1", "t2"], "usr": "u", "pwd": "p"}
+    )
+    mock_client.assert_any_call("t1", fingerprint=None)
+    mock_client.assert_any_call("t2", fingerprint=None)
+    assert res.status.startswith("200 ")
+
+
+def test_batch_missing_credentials(flask_client, mock_client):
+    res = flask_client.get("/probe", query_string={"target": ["t1", "t2"]})
+    mock_client.assert_not_called()
+    assert res.status.startswith("400 ") and "Missing" in res.text
+
+
+def test_probe_all(flask_client):
+    res = flask_client.get("/probe_all")
+    assert res.status.startswith("200 ")
+
+
+def test_fingerprints(flask_client, monkeypatch):
+    # given:
+    ssl_context = mock.Mock()
+    ssl_context.fingerprints.return_value = {("tt", 443): "aa:bb"}
+    monkeypatch.setattr(
+        "hitron_exporter.hitron.shared_ssl_context", lambda: ssl_context
+    )
+
+    # when:
+    res = flask_client.get("/fingerprints")
+
+    # then:
+    assert res.status.startswith("200 ")
+    assert res.json == [{"target": "tt", "port": 443, "fingerprint": "aa:bb"}]
+
+
+def test_polled_target_not_modified(flask_client, mock_client, monkeypatch):
+    # given:
+    collector = mock.Mock()
+    collector.collect.return_value = []
+    result = hitron_exporter.poller.PollResult(collector, time.time(), True)
+    poller = mock.MagicMock()
+    poller.__contains__.return_value = True
+    monkeypatch.setattr("hitron_exporter.poller_", poller)
+    monkeypatch.setattr("hitron_exporter.polled_result", lambda target: result)
+    res1 = flask_client.get("/probe", query_string={"target": "polled"})
+
+    # when:
+    res2 = flask_client.get(
+        "/probe",
+        query_string={"target": "polled"},
+        headers={"If-None-Match": res1.headers["ETag"]},
+    )
+
+    # then:
+    mock_client.assert_not_called()
+    assert res1.status.startswith("200 ")
+    assert res2.status.startswith("304 ")
+    collector.collect.assert_called_once()
+
+
+def test_profile_disabled(flask_client):
+    res = flask_client.get("/debug/profile", query_string={"seconds": "0.01"})
+    assert res.status.startswith("404 ")
+
+
+@pytest.fixture
+def profiling_enabled(monkeypatch):
+    monkeypatch.setitem(hitron_exporter.app.config, "PROFILING", True)
+    monkeypatch.setitem(hitron_exporter.app.config, "PROFILING_TOKEN", "sekrit")
+
+
+def test_profile_localhost(flask_client, profiling_enabled):
+    res = flask_client.get(
+        "/debug/profile",
+        query_string={"seconds": "0.01"},
+        environ_overrides={"wsgi.multithread": True},
+    )
+    assert res.status.startswith("200 ")
+    assert res.content_type.startswith("text/plain")
+
+
+def test_profile_single_threaded(flask_client, profiling_enabled):
+    res = flask_client.get(
+        "/debug/profile",
+        query_string={"seconds": "0.01"},
+        environ_overrides={"wsgi.multithread": False},
+    )
+    assert res.status.startswith("503 ") and "--threads" in res.text
+
+
+def test_profile_remote(flask_client, profiling_enabled):
+    res = flask_client.get(
+        "/debug/profile",
+        query_string={"seconds": "0.01"},
+        environ_base={"REMOTE_ADDR": "192.0.2.1"},
+    )
+    assert res.status.startswith("403 ")
+
+
+def test_profile_remote_with_token(flask_client, profiling_enabled):
+    res = flask_client.get(
+        "/debug/profile",
+        query_string={"seconds": "0.01"},
+        environ_base={"REMOTE_ADDR": "192.0.2.1"},
+        environ_overrides={"wsgi.multithread": True},
+        headers={"Authorization": "Bearer sekrit"},
+    )
+    assert res.status.startswith("200 ")
+
+
+def test_profile_too_long(flask_client, profiling_enabled):
+    res = flask_client.get(
+        "/debug/profile",
+        query_string={"seconds": "3600"},
+        environ_overrides={"wsgi.multithread": True},
+    )
+    assert res.status.startswith("400 ")
+
+
+def test_collect(flask_client, mock_client, mock_collector):
+    res = flask_client.get(
+        "/probe",
+        query_string=[
+            ("target", "tt"),
+            ("usr", "u"),
+            ("pwd", "p"),
+            ("collect", "usinfo"),
+            ("collect", "dsinfo"),
+        ],
+    )
+    assert res.status.startswith("200 ")
+    assert mock_collector.call_args.kwargs["collectors"] == ("usinfo", "dsinfo")
+
+
+def test_concurrent_probes_with_different_collectors(mock_client):
+    # given: a modem that permits only one session at a time
+    lock = threading.Lock()
+    state = {"sessions": 0}
+
+    def login(usr, pwd, force=False):
+        with lock:
+            if state["sessions"]:
+                raise RuntimeError("Repeat Login")
+            state["sessions"] += 1
+        time.sleep(0.05)
+
+    def logout():
+        with lock:
+            state["sessions"] -= 1
+
+    mock_client.return_value.login.side_effect = login
+    mock_client.return_value.logout.side_effect = logout
+
+    def probe(collect):
+        return (
+            hitron_exporter.app.test_client()
+            .get(
+                "/probe",
+                query_string={
+                    "target": "tt",
+                    "usr": "u",
+                    "pwd": "p",
+                    "collect": collect,
+                },
+            )
+            .status
+        )
+
+    # when:
+    with ThreadPoolExecutor(max_workers=2) as executor:
+        statuses = list(executor.map(probe, ["usinfo", "dsinfo"]))
+
+    # then:
+    assert [status[:3] for status in statuses] == ["200", "200"]
+    assert mock_client.return_value.login.call_count == 2
+
+
+def test_collect_brackets(flask_client, mock_client, mock_collector):
+    res = flask_client.get(
+        "/probe",
+        query_string=[
+            ("target", "tt"),
+            ("usr", "u"),
+            ("pwd", "p"),
+            ("collect[]", "usinfo"),
+            ("collect", "dsinfo"),
+            ("collect[]", "docsis"),
+        ],
+    )
+    assert res.status.startswith("200 ")
+    assert mock_collector.call_args.kwargs["collectors"] == (
+        "usinfo",
+        "dsinfo",
+        "docsis",
+    )
+
+
+def test_poll_target_collect_list():
+    # when:
+    pargs, interval = hitron_exporter.parse_poll_target(
+        0,
+        {
+            "target": "tt",
+            "usr": "u",
+            "pwd": "p",
+            "force": True,
+            "collect": ["usinfo", "dsinfo"],
+            "interval": 5,
+        },
+    )
+
+    # then:
+    assert pargs.collectors == ("usinfo", "dsinfo")
+    assert pargs.force
+    assert interval == 5.0
+
+
+def test_poll_target_invalid():
+    # then:
+    with pytest.raises(ValueError) as e:
+        # when:
+        hitron_exporter.parse_poll_target(
+            1, {"target": "tt", "usr": "u", "pwd": "sekrit", "collect": ["x"]}
+        )
+
+    # then:
+    assert "POLL_TARGETS[1] (target 'tt')" in str(e.value)
+    assert "Unknown collectors: 'x'" in str(e.value)
+    assert "sekrit" not in str(e.value)
+
+
+def test_collect_unknown(flask_client, mock_client):
+    res = flask_client.get(
+        "/probe", query_string={"target": "tt", "usr": "u", "pwd": "p", "collect": "x"}
+    )
+    mock_client.assert_not_called()
+    assert res.status.startswith("400 ") and "Unknown" in res.text
@@ -0,0 +1,298 @@
+import asyncio
+import json
+from unittest import mock
+
+import pytest
+
+import hitron_exporter
+from hitron_exporter import asgi
+
+
+class FakeClient:
+    Dataset = asgi.aiohitron.Client.Dataset
+
+    instances = []
+
+    def __init__(self, host, fingerprint, **kwargs):
+        self.host = host
+        self.fingerprint = fingerprint
+        self.kwargs = kwargs
+        self.calls = []
+        self.instances.append(self)
+
+    async def login(self, usr, pwd, force=False):
+        self.calls.append(("login", usr, pwd, force))
+
+    async def get_data(self, dataset):
+        self.calls.append(("get_data", dataset))
+        return {
+            self.Dataset.USINFO: [],
+            self.Dataset.DSINFO: [],
+            self.Dataset.SYSINFO: [
+                {
+                    "LRecPkt": "12.12M Bytes",
+                    "LSendPkt": "40.14M Bytes",
+                    "WRecPkt": "40.25M Bytes",
+                    "WSendPkt": "11.77M Bytes",
+                    "hwVersion": "2D",
+                    "serialNumber": "ABC123",
+                    "swVersion": "4.5.10.201-CD-UPC",
+                    "systemTime": "Fri Jun 17, 2022, 17:09:10",
+                    "systemUptime": "10 Days,17 Hours,33 Minutes,47 Seconds",
+                }
+            ],
+            self.Dataset.SYSTEM_MODEL: {"modelName": "CGNV4-FX4"},
+            self.Dataset.CMINIT: [{"bpiStatus": "AUTH:authorized, TEK:operational"}],
+        }[dataset]
+
+    async def logout(self):
+        self.calls.append(("logout",))
+
+    async def aclose(self):
+        self.calls.append(("aclose",))
+
+
+@pytest.fixture(autouse=True)
+def fake_client(monkeypatch):
+    FakeClient.instances = []
+    monkeypatch.setattr("hitron_exporter.aiohitron.Client", FakeClient)
+
+    def mock_vault_retrieve(container):
+        assert container == ["service", "sv"]
+        return {"usr": "U", "pwd": "P"}
+
+    monkeypatch.setattr("hitron_exporter.ipavault.retrieve", mock_vault_retrieve)
+    monkeypatch.setattr(
+        "hitron_exporter.vault_credentials", hitron_exporter.ipavault.CredentialCache()
+    )
+    return FakeClient
+
+
+def request(path, query_string=b""):
+    scope = {
+        "type": "http",
+        "method": "GET",
+        "path": path,
+        "query_string": query_string,
+        "headers": [],
+    }
+    sent = []
+
+    async def receive():
+        return {"type": "http.request", "body": b"", "more_body": False}
+
+    async def send(message):
+        sent.append(message)
+
+    asyncio.run(asgi.app(scope, receive, send))
+    status = sent[0]["status"]
+    body = b"".join(m.get("body", b"") for m in sent[1:])
+    return status, body
+
+
+def test_metrics():
+    status, _ = request("/metrics")
+    assert status == 200
+
+
+def test_not_found():
+    status, _ = request("/nope")
+    assert status == 404
+
+
+def test_no_params():
+    status, body = request("/probe")
+    assert status == 400 and b"Missing" in body
+
+
+def test_probe(fake_client):
+    # when:
+    status, body = request("/probe", b"target=tt&usr=uu&pwd=pp&_port=8443")
+
+    # then:
+    assert status == 200
+    assert b'hitron_cm_bpi_info{auth="authorized",tek="operational"} 1.0' in body
+    (client,) = fake_client.instances
+    assert client.host == "tt"
+    assert client.fingerprint is None
+    assert client.kwargs["port"] == 8443
+    assert client.calls[0] == ("login", "uu", "pp", False)
+    assert client.calls[-2:] == [("logout",), ("aclose",)]
+
+
+def test_probes_share_connection_pool(fake_client):
+    # given:
+    async def main():
+        for _ in range(2):
+            await asgi._probe(
+                asgi.ProbeArgs.parse({"target": "tt", "usr": "uu", "pwd": "pp"})
+            )
+
+    # when:
+    asyncio.run(main())
+
+    # then:
+    first, second = fake_client.instances
+    assert first.kwargs["pool"] is second.kwargs["pool"]
+
+
+def test_failed_fetch_cancels_others_before_logout(monkeypatch):
+    # given:
+    class FailingClient(FakeClient):
+        async def get_data(self, dataset):
+            self.calls.append(("get_data", dataset))
+            if dataset == self.Dataset.DSINFO:
+                raise ConnectionResetError("reset")
+            try:
+                await asyncio.sleep(10)
+            except asyncio.CancelledError:
+                self.calls.append(("cancelled", dataset))
+                raise
+
+    monkeypatch.setattr("hitron_exporter.aiohitron.Client", FailingClient)
+
+    # then:
+    with pytest.raises(ConnectionResetError):
+        # when:
+        request("/probe", b"target=tt&usr=uu&pwd=pp")
+
+    # then:
+    (client,) = FailingClient.instances
+    assert client.calls[-2:] == [("logout",), ("aclose",)]
+    cancelled = [call for call in client.calls if call[0] == "cancelled"]
+    assert ("cancelled", FakeClient.Dataset.SYSINFO) in cancelled
+    # Every other fetch was stopped before logging out
+    fetched = [call for call in client.calls if call[0] == "get_data"]
+    assert len(cancelled) == len(fetched) - 1
+
+
+def test_concurrent_probes_with_different_collectors(monkeypatch):
+    # given: a modem that permits only one session at a time
+    state = {"sessions": 0}
+
+    class OneSessionClient(FakeClient):
+        async def login(self, usr, pwd, force=False):
+            if state["sessions"]:
+                raise RuntimeError("Repeat Login")
+            state["sessions"] += 1
+            await asyncio.sleep(0.01)
+
+        async def logout(self):
+            state["sessions"] -= 1
+
+    monkeypatch.setattr("hitron_exporter.aiohitron.Client", OneSessionClient)
+
+    async def main():
+        return await asyncio.gather(
+            *(
+                asgi._probe(
+                    asgi.ProbeArgs.parse(
+                        {"target": "tt", "usr": "uu", "pwd": "pp", "collect": collect}
+                    )
+                )
+                for collect in ["usinfo", "docsis"]
+            )
+        )
+
+    # when:
+    usinfo, docsis = asyncio.run(main())
+
+    # then:
+    assert "hitron_channel_upstream_signal_strength_dbmv" in {
+        m.name for m in usinfo.collect()
+    }
+    assert "hitron_cm_bpi" in {m.name for m in docsis.collect()}
+    assert len(OneSessionClient.instances) == 2
+
+
+def test_probe_with_vault(fake_client):
+    # when:
+    status, _ = request("/probe", b"target=tt&ipa_vault_namespace=service:sv&force=1")
+
+    # then:
+    assert status == 200
+    (client,) = fake_client.instances
+    assert client.calls[0] == ("login", "U", "P", True)
+
+
+def test_probe_batch(fake_client):
+    # when:
+    status, body = request("/probe", b"target=t1&target=t2&usr=uu&pwd=pp")
+
+    # then:
+    assert status == 200
+    assert {c.host for c in fake_client.instances} == {"t1", "t2"}
+    assert body.count(b"# TYPE hitron_cm_bpi_info gauge") == 1
+    assert (
+        b'hitron_cm_bpi_info{auth="authorized",target="t1",tek="operational"}' in body
+    )
+    assert (
+        b'hitron_cm_bpi_info{auth="authorized",target="t2",tek="operational"}' in body
+    )
+    assert b'hitron_probe_success{target="t1"} 1.0' in body
+
+
+def test_probe_batch_missing_credentials(fake_client):
+    # when:
+    status, body = request("/probe", b"target=t1&target=t2")
+
+    # then:
+    assert status == 400 and b"Missing" in body
+    assert not fake_client.instances
+
+
+def test_fingerprints(monkeypatch):
+    # given:
+    ssl_context = mock.Mock()
+    ssl_context.fingerprints.return_value = {("tt", 443): "aa:bb"}
+    monkeypatch.setattr(
+        "hitron_exporter.hitron.shared_ssl_context", lambda: ssl_context
+    )
+
+    # when:
+    status, body = request("/fingerprints")
+
+    # then:
+    assert status == 200
+    assert json.loads(body) == [{"target": "tt", "port": 443, "fingerprint": "aa:bb"}]
+
+
+def test_profile_unknown_client(monkeypatch):
+    # given:
+    monkeypatch.setitem(hitron_exporter.app.config, "PROFILING", True)
+
+    # when:
+    status, _ = request("/debug/profile", b"seconds=0.01")
+
+    # then:
+    assert status == 403
+
+
+def test_probe_collect(fake_client):
+    # when:
+    status, body = request(
+        "/probe", b"target=tt&usr=uu&pwd=pp&collect=usinfo&collect=docsis"
+    )
+
+    # then:
+    assert status == 200
+    assert b"hitron_cm_bpi_info" in body
+    assert b"hitron_system_info" not in body
+    (client,) = fake_client.instances
+    fetched = {call[1] for call in client.calls if call[0] == "get_data"}
+    assert fetched == {FakeClient.Dataset.USINFO, FakeClient.Dataset.CMINIT}
+
+
+def test_probe_collect_brackets(fake_client):
+    # when:
+    status, body = request(
+        "/probe", b"target=tt&usr=uu&pwd=pp&collect%5B%5D=usinfo&collect%5B%5D=docsis"
+    )
+
+    # then:
+    assert status == 200
+    assert b"hitron_cm_bpi_info" in body
+    assert b"hitron_system_info" not in body
+    (client,) = fake_client.instances
+    fetched = {call[1] for call in client.calls if call[0] == "get_data"}
+    assert fetched == {FakeClient.Dataset.USINFO, FakeClient.Dataset.CMINIT}
@@ -0,0 +1,19 @@
+from hitron_exporter.channels import ChannelTable
+
+
+def test_channel_table():
+    # given:
+    channels = [
+        {"portId": "1", "channelId": "9", "frequency": "426250000", "snr": "40.946"},
+        {"portId": "2", "channelId": "1", "frequency": "362250000", "snr": "38.5"},
+    ]
+
+    # when:
+    table = ChannelTable(channels, {"snr": "snr"})
+
+    # then:
+    assert len(table) == 2
+    assert list(table.rows("snr")) == [
+        (("1", "9", "426250000"), 40.946),
+        (("2", "1", "362250000"), 38.5),
+    ]
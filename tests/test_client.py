@@ -3,37 +3,17 @@ import hashlib
 import ssl
 
 import pytest
-import trustme
 import urllib3.exceptions
 from werkzeug.wrappers import Request, Response
 
-from hitron_exporter.hitron import Client
-
-
-@pytest.fixture(scope="session")
-def ca():
-    return trustme.CA()
-
-
-@pytest.fixture(scope="session")
-def localhost_cert(ca):
-    # The real web server's TLS server certificate has no Subject Alternative Name
-    # values, and a subject of:
-    # CN=02:00:00:00:00:00,
-    # OU=No. 40\, Wu-kung 5th Rd.\, Wu-ku\, Taipei Hsien\, Taiwan,
-    # O=Hitron Technologies,
-    # C=TW
-    return ca.issue_cert(common_name="02:00:00:00:00:00")
-
-
-@pytest.fixture(scope="session")
-def httpserver_ssl_context(localhost_cert):
-    """
-    This fixture causes pytest_httpserver to become an HTTPS server.
-    """
-    context = ssl.SSLContext(ssl.PROTOCOL_TLS_SERVER)
-    localhost_cert.configure_cert(context)
-    return context
+from hitron_exporter.hitron import (
+    Client,
+    CookieStore,
+    DatasetCache,
+    ResponseTooLargeError,
+    fingerprint,
+    shared_ssl_context,
+)
 
 
 def test_fingerprint_checked(httpserver, localhost_cert) -> None:
@@ -176,3 +156,180 @@ def test_get_data(httpserver) -> None:
     # then:
     httpserver.check()
     assert data == [{"tunefreq": "213.45"}]
+
+
+def test_get_data_cached(httpserver) -> None:
+    # given:
+    httpserver.expect_oneshot_request(
+        "/data/getTuneFreq.asp", method="GET"
+    ).respond_with_json([{"tunefreq": "213.45"}])
+
+    cache = DatasetCache({Client.Dataset.TUNEFREQ: 60})
+    client = Client("localhost", fingerprint="", port=httpserver.port, cache=cache)
+
+    # when:
+    data1 = client.get_data(Client.Dataset.TUNEFREQ)
+    data2 = client.get_data(Client.Dataset.TUNEFREQ)
+
+    # then:
+    httpserver.check()
+    assert data1 == data2 == [{"tunefreq": "213.45"}]
+    assert cache.hits[Client.Dataset.TUNEFREQ] == 1
+    assert cache.misses[Client.Dataset.TUNEFREQ] == 1
+
+
+def test_get_data_too_large(httpserver) -> None:
+    # given:
+    httpserver.expect_request("/data/getTuneFreq.asp", method="GET").respond_with_json(
+        [{"tunefreq": "213.45"}] * 100
+    )
+
+    client = Client("localhost", fingerprint="", port=httpserver.port, max_body_size=64)
+
+    # then:
+    with pytest.raises(ResponseTooLargeError, match="larger than 64 bytes"):
+        # when:
+        client.get_data(Client.Dataset.TUNEFREQ)
+
+
+def test_get_data_streamed_too_large(httpserver) -> None:
+    # given:
+    def handler(request: Request) -> Response:
+        chunks = (b"[", *([b'{"tunefreq": "213.45"},'] * 100), b"{}]")
+        return Response(iter(chunks), content_type="application/json")
+
+    httpserver.expect_request(
+        "/data/getTuneFreq.asp", method="GET"
+    ).respond_with_handler(handler)
+    httpserver.expect_request("/data/getSysInfo.asp", method="GET").respond_with_json(
+        [{"hwVersion": "1A"}]
+    )
+
+    client = Client("localhost", fingerprint="", port=httpserver.port, max_body_size=64)
+
+    # then:
+    with pytest.raises(ResponseTooLargeError):
+        # when:
+        client.get_data(Client.Dataset.TUNEFREQ)
+
+    # then: the connection was not left with the rest of the body unread
+    assert client.get_data(Client.Dataset.SYSINFO) == [{"hwVersion": "1A"}]
+
+
+def test_dataset_cache_expiry(monkeypatch) -> None:
+    # given:
+    now = [1000.0]
+    monkeypatch.setattr("time.monotonic", lambda: now[0])
+    cache = DatasetCache({Client.Dataset.SYSTEM_MODEL: 60})
+    cache.put("a", Client.Dataset.SYSTEM_MODEL, "x")
+
+    # when:
+    now[0] += 61
+
+    # then:
+    with pytest.raises(KeyError):
+        cache.get("a", Client.Dataset.SYSTEM_MODEL)
+
+
+def test_dataset_cache_lru() -> None:
+    # given:
+    cache = DatasetCache({Client.Dataset.SYSTEM_MODEL: 60}, max_entries=2)
+    cache.put("a", Client.Dataset.SYSTEM_MODEL, "a")
+    cache.put("b", Client.Dataset.SYSTEM_MODEL, "b")
+    cache.get("a", Client.Dataset.SYSTEM_MODEL)
+
+    # when:
+    cache.put("c", Client.Dataset.SYSTEM_MODEL, "c")
+
+    # then:
+    assert cache.get("a", Client.Dataset.SYSTEM_MODEL) == "a"
+    assert cache.get("c", Client.Dataset.SYSTEM_MODEL) == "c"
+    with pytest.raises(KeyError):
+        cache.get("b", Client.Dataset.SYSTEM_MODEL)
+
+
+def test_dataset_cache_uncacheable() -> None:
+    # given:
+    cache = DatasetCache({Client.Dataset.SYSTEM_MODEL: 60, Client.Dataset.DSINFO: 0})
+
+    # when:
+    cache.put("a", Client.Dataset.DSINFO, "x")
+
+    # then:
+    assert not cache.cacheable(Client.Dataset.DSINFO)
+    with pytest.raises(KeyError):
+        cache.get("a", Client.Dataset.DSINFO)
+
+
+def test_connections_shared_between_clients(httpserver) -> None:
+    # given:
+    httpserver.expect_request("/data/getSysInfo.asp").respond_with_json([{}])
+    ssl_context = shared_ssl_context()
+    before = dict(ssl_context.handshakes)
+
+    # when:
+    for _ in range(3):
+        client = Client("localhost", fingerprint="", port=httpserver.port)
+        client.get_data(Client.Dataset.SYSINFO)
+
+    # then:
+    full = ssl_context.handshakes["full"] - before["full"]
+    resumed = ssl_context.handshakes["resumed"] - before["resumed"]
+    assert full <= 1
+    assert resumed >= 1
+
+
+@pytest.mark.filterwarnings("ignore::urllib3.connectionpool.InsecureRequestWarning")
+def test_fingerprint_discovered_without_extra_handshake(
+    httpserver, localhost_cert
+) -> None:
+    # given:
+    httpserver.expect_request("/", method="GET").respond_with_data("")
+    ssl_context = shared_ssl_context()
+    before = sum(ssl_context.handshakes.values())
+    cert_der = ssl.PEM_cert_to_DER_cert(
+        localhost_cert.cert_chain_pems[0].bytes().decode("ascii")
+    )
+
+    # when:
+    client = Client("localhost", fingerprint=None, port=httpserver.port)
+    client.http_request("GET", httpserver.url_for("/"))
+
+    # then:
+    assert sum(ssl_context.handshakes.values()) - before <= 1
+    assert ssl_context.fingerprints()[("localhost", httpserver.port)] == fingerprint(
+        cert_der
+    )
+
+
+def test_cookie_store_scoped_to_host() -> None:
+    # given:
+    cookies = CookieStore()
+
+    # when:
+    cookies.extract("Host1", ["a=1; path=/; HttpOnly", "b=2"])
+
+    # then:
+    assert cookies.header("host1") == "a=1; b=2"
+    assert cookies.get("host1", "a") == "1"
+    assert cookies.header("host2") is None
+    assert cookies.get("host2", "a") is None
+
+
+def test_cookie_store_expiry() -> None:
+    # given:
+    cookies = CookieStore()
+    cookies.extract("host1", ["a=1", "b=2", "c=3"])
+
+    # when:
+    cookies.extract(
+        "host1",
+        [
+            "a=deleted; path=/; expires=Thu, 01 Jan 1970 00:00:00 GMT",
+            "b=2; Max-Age=0",
+            "c=4; expires=Fri, 01 Jan 2100 00:00:00 GMT",
+        ],
+    )
+
+    # then:
+    assert cookies.header("host1") == "c=4"
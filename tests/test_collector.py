@@ -1,9 +1,14 @@
+from concurrent.futures import ThreadPoolExecutor
+import threading
+import time
 from unittest.mock import Mock
 
 from prometheus_client.samples import Sample
 import pytest
 
-from hitron_exporter import Collector
+import hitron_exporter
+
+from hitron_exporter import BatchCollector, Collector, ProbeArgs, fetch_datasets
 from hitron_exporter.hitron import Client
 
 
@@ -270,3 +275,207 @@ def test_metrics_cm_bpi(metrics):
     assert (m := metrics.get("hitron_cm_bpi"))
     assert m.type == "info"
     assert m.samples[0].labels == {"auth": "authorized", "tek": "operational"}
+
+
+def test_parallel_fetch(client, metrics):
+    # given:
+    with ThreadPoolExecutor(max_workers=8) as executor:
+        # when:
+        collector = Collector(client, executor=executor, concurrency=5)
+
+    # then:
+    assert {m.name: m for m in collector.collect()} == metrics
+
+
+def test_parallel_fetch_concurrency_capped(client):
+    # given:
+    state = {"running": 0, "max_running": 0}
+    lock = threading.Lock()
+
+    def get_data(dataset):
+        with lock:
+            state["running"] += 1
+            state["max_running"] = max(state["max_running"], state["running"])
+        time.sleep(0.01)
+        with lock:
+            state["running"] -= 1
+        return dataset.value
+
+    client.get_data.side_effect = get_data
+
+    # when:
+    with ThreadPoolExecutor(max_workers=8) as executor:
+        data = fetch_datasets(client, list(Client.Dataset), executor, concurrency=2)
+
+    # then:
+    assert data == {dataset: dataset.value for dataset in Client.Dataset}
+    assert state["max_running"] == 2
+
+
+def test_parallel_fetch_failure_waits_for_running_fetches(client):
+    # given:
+    events = []
+    started = threading.Event()
+
+    def get_data(dataset):
+        if dataset == Client.Dataset.USINFO:
+            # Fail once the other fetch is running, and so can't be cancelled
+            started.wait()
+            raise RuntimeError("boom")
+        started.set()
+        time.sleep(0.1)
+        events.append(("fetched", dataset))
+        return []
+
+    client.get_data.side_effect = get_data
+    client.logout.side_effect = lambda: events.append(("logout",))
+
+    def probe():
+        try:
+            fetch_datasets(
+                client,
+                [Client.Dataset.USINFO, Client.Dataset.DSINFO],
+                executor,
+                concurrency=2,
+            )
+        finally:
+            client.logout()
+
+    # when:
+    with ThreadPoolExecutor(max_workers=2) as executor:
+        with pytest.raises(RuntimeError):
+            probe()
+
+    # then:
+    assert events == [("fetched", Client.Dataset.DSINFO), ("logout",)]
+
+
+def test_batch_collector(client):
+    # given:
+    collector = BatchCollector(
+        {"a": Collector(client), "b": Collector(client), "c": None}
+    )
+
+    # when:
+    metrics = {m.name: m for m in collector.collect()}
+
+    # then:
+    m = metrics["hitron_channel_downstream_snr"]
+    assert [s.labels["target"] for s in m.samples] == ["a", "a", "b", "b"]
+    assert m.samples[0].labels == {
+        "port": "1",
+        "channel": "9",
+        "frequency": "426250000",
+        "target": "a",
+    }
+    assert metrics["hitron_probe_success"].samples == [
+        Sample("hitron_probe_success", {"target": "a"}, 1.0),
+        Sample("hitron_probe_success", {"target": "b"}, 1.0),
+        Sample("hitron_probe_success", {"target": "c"}, 0.0),
+    ]
+
+
+def test_selected_collectors(client):
+    # when:
+    collector = Collector(client, collectors=["dsinfo", "sysinfo"])
+    metrics = {m.name for m in collector.collect()}
+
+    # then:
+    fetched = {call.args[0] for call in client.get_data.call_args_list}
+    assert fetched == {
+        client.Dataset.DSINFO,
+        client.Dataset.SYSINFO,
+        client.Dataset.SYSTEM_MODEL,
+    }
+    assert metrics == {
+        "hitron_channel_downstream_signal_strength_dbmv",
+        "hitron_channel_downstream_snr",
+        "hitron_system",
+    }
+
+
+def test_from_data_collects_what_is_present(client):
+    # given:
+    data = {Client.Dataset.USINFO: client.get_data(client.Dataset.USINFO)}
+
+    # when:
+    metrics = {m.name for m in Collector.from_data(data).collect()}
+
+    # then:
+    assert metrics == {
+        "hitron_channel_upstream_signal_strength_dbmv",
+        "hitron_channel_upstream_bandwidth",
+    }
+
+
+def test_hosts_collected_only_when_selected(client):
+    # given:
+    data = {
+        Client.Dataset.CONNECTINFO: [
+            {
+                "connectType": "DHCP-IP",
+                "hostName": f"host{n}",
+                "interface": "Ethernet",
+                "ipAddr": f"192.0.2.{n}",
+                "ipType": "IPv4",
+                "macAddr": f"76:77:47:00:00:0{n}",
+                "online": "active",
+            }
+            for n in range(3)
+        ]
+    }
+
+    # when:
+    default = {m.name for m in Collector.from_data(data).collect()}
+    metrics = {
+        m.name: m for m in Collector.from_data(data, ["hosts"], max_hosts=2).collect()
+    }
+
+    # then:
+    assert default == set()
+    assert metrics["hitron_connected_hosts"].samples == [
+        Sample(
+            "hitron_connected_hosts",
+            {
+                "interface": "Ethernet",
+                "ip_type": "IPv4",
+                "connect_type": "DHCP-IP",
+                "online": "active",
+            },
+            3,
+        )
+    ]
+    assert [
+        s.labels["host_name"] for s in metrics["hitron_connected_host_info"].samples
+    ] == ["host0", "host1"]
+    assert metrics["hitron_connected_hosts_unlisted"].samples[0].value == 1
+
+
+@pytest.mark.parametrize(
+    "module, collect, expected",
+    [
+        (
+            None,
+            None,
+            ("usinfo", "dsinfo", "uptime", "clock", "network", "sysinfo", "docsis"),
+        ),
+        (None, "dsinfo,usinfo", ("usinfo", "dsinfo")),
+        ("rf", None, ("usinfo", "dsinfo")),
+        ("rf", "docsis", ("usinfo", "dsinfo", "docsis")),
+        (None, "hosts,docsis", ("docsis", "hosts")),
+    ],
+)
+def test_parse_collectors(monkeypatch, module, collect, expected):
+    # given:
+    monkeypatch.setitem(
+        hitron_exporter.app.config, "MODULES", {"rf": ["usinfo", "dsinfo"]}
+    )
+
+    # then:
+    assert ProbeArgs.parse_collectors(module, collect) == expected
+
+
+@pytest.mark.parametrize("module, collect", [("nope", None), (None, "usinfo,nope")])
+def test_parse_collectors_unknown(module, collect):
+    with pytest.raises(ValueError):
+        ProbeArgs.parse_collectors(module, collect)
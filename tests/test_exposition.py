@@ -0,0 +1,133 @@
+import gzip
+
+import prometheus_client
+from prometheus_client.core import CounterMetricFamily, GaugeMetricFamily
+from prometheus_client.openmetrics import exposition as openmetrics
+import pytest
+
+from hitron_exporter import exposition
+
+
+class Collector(prometheus_client.registry.Collector):
+    def collect(self):
+        yield GaugeMetricFamily("a", "Gauge A", value=1)
+        c = CounterMetricFamily("b", "Counter B", labels=["x"])
+        c.add_metric(["y"], 2)
+        yield c
+        c = CounterMetricFamily("c", "Counter C\\ with\nescapes", labels=["x", "w"])
+        c.add_metric(['quote " backslash \\ newline \n', "w"], 3, created=1234.5)
+        c.add_metric(["plain", "z"], 4, timestamp=1000)
+        yield c
+
+
+@pytest.fixture
+def registry():
+    registry = prometheus_client.CollectorRegistry()
+    registry.register(Collector())
+    return registry
+
+
+def test_text(registry):
+    # when:
+    rendered = exposition.render(Collector())
+
+    # then:
+    assert (
+        dict(rendered.headers)["Content-Type"] == prometheus_client.CONTENT_TYPE_LATEST
+    )
+    assert b"".join(rendered.body) == prometheus_client.generate_latest(registry)
+
+
+def test_openmetrics(registry):
+    # when:
+    rendered = exposition.render(Collector(), accept="application/openmetrics-text")
+
+    # then:
+    assert dict(rendered.headers)["Content-Type"] == openmetrics.CONTENT_TYPE_LATEST
+    assert b"".join(rendered.body) == openmetrics.generate_latest(registry)
+
+
+def test_gzip(registry):
+    # when:
+    rendered = exposition.render(Collector(), accept_encoding="gzip, deflate")
+
+    # then:
+    assert dict(rendered.headers)["Content-Encoding"] == "gzip"
+    assert gzip.decompress(
+        b"".join(rendered.body)
+    ) == prometheus_client.generate_latest(registry)
+
+
+def test_names():
+    # when:
+    rendered = exposition.render(Collector(), names=["b_total"])
+
+    # then:
+    body = b"".join(rendered.body)
+    assert b"b_total" in body
+    assert b"\na " not in body and not body.startswith(b"# HELP a ")
+
+
+def test_cache_reuses_rendered_bytes():
+    # given:
+    cache = exposition.Cache()
+    calls = []
+
+    def collector():
+        calls.append(1)
+        return Collector()
+
+    version = object()
+
+    # when:
+    first = cache.render("t", version, collector)
+    second = cache.render("t", version, collector)
+
+    # then:
+    assert len(calls) == 1
+    assert b"".join(first.body) == b"".join(second.body)
+    assert dict(first.headers)["ETag"] == dict(second.headers)["ETag"]
+
+
+def test_cache_not_modified():
+    # given:
+    cache = exposition.Cache()
+    version = object()
+    etag = dict(cache.render("t", version, Collector).headers)["ETag"]
+
+    # when:
+    rendered = cache.render("t", version, Collector, if_none_match=f'"x", W/{etag}')
+
+    # then:
+    assert rendered.status == 304
+    assert b"".join(rendered.body) == b""
+
+
+def test_cache_new_generation():
+    # given:
+    cache = exposition.Cache()
+    etag = dict(cache.render("t", object(), Collector).headers)["ETag"]
+
+    # when:
+    rendered = cache.render("t", object(), Collector, if_none_match=etag)
+
+    # then:
+    assert rendered.status == 200
+    assert dict(rendered.headers)["ETag"] != etag
+
+
+def test_cache_variants():
+    # given:
+    cache = exposition.Cache()
+    version = object()
+
+    # when:
+    plain = cache.render("t", version, Collector)
+    gzipped = cache.render("t", version, Collector, accept_encoding="gzip")
+    om = cache.render("t", version, Collector, accept="application/openmetrics-text")
+
+    # then:
+    assert gzip.decompress(b"".join(gzipped.body)) == b"".join(plain.body)
+    assert b"".join(om.body).endswith(b"# EOF\n")
+    etags = {dict(r.headers)["ETag"] for r in (plain, gzipped, om)}
+    assert len(etags) == 3
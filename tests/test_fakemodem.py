@@ -0,0 +1,134 @@
+import asyncio
+from collections import Counter
+from http import HTTPStatus
+import importlib
+import json
+from pathlib import Path
+
+import pytest
+
+from hitron_exporter import hitron
+from hitron_exporter.aiohitron import Client
+
+
+@pytest.fixture
+def fakemodem(monkeypatch):
+    monkeypatch.syspath_prepend(str(Path(__file__).parent.parent / "benchmarks"))
+    return importlib.import_module("fakemodem")
+
+
+@pytest.fixture
+def config(fakemodem):
+    return fakemodem.Config(
+        usr="cusadmin",
+        pwd="password",
+        session_timeout=300.0,
+        latency=0.0,
+        jitter=0.0,
+        max_connections=4,
+        data=fakemodem._datasets(downstream=2, upstream=1, hosts=1),
+    )
+
+
+def run(fakemodem, config, fn):
+    """
+    Serve a simulated modem, and call fn with a function that makes Clients for it.
+    """
+
+    async def main():
+        modem = fakemodem.Modem(config, Counter())
+        ssl_context, fingerprint = fakemodem._ssl_context()
+        server = await asyncio.start_server(
+            modem.serve, "127.0.0.1", 0, ssl=ssl_context
+        )
+        port = server.sockets[0].getsockname()[1]
+        clients = []
+
+        def client():
+            clients.append(Client("127.0.0.1", fingerprint=fingerprint, port=port))
+            return clients[-1]
+
+        try:
+            return await fn(client)
+        finally:
+            for c in clients:
+                await c.aclose()
+            server.close()
+
+    return asyncio.run(main())
+
+
+def test_index_sets_presession(fakemodem, config):
+    # when:
+    response = fakemodem.Modem(config, Counter()).handle(
+        fakemodem.Request("GET", "/", {}, b"")
+    )
+
+    # then:
+    assert response.status == HTTPStatus.OK
+    ((name, value),) = response.headers
+    assert name == "Set-Cookie" and value.startswith("preSession=")
+
+
+def test_login_without_presession(fakemodem, config):
+    # when:
+    response = fakemodem.Modem(config, Counter()).handle(
+        fakemodem.Request(
+            "POST",
+            "/goform/login",
+            {"content-type": "application/x-www-form-urlencoded"},
+            b"usr=cusadmin&pwd=password",
+        )
+    )
+
+    # then:
+    assert response.body == b"session timeout expired"
+
+
+def test_login_get_data_logout(fakemodem, config):
+    # given:
+    async def fn(client):
+        c = client()
+        await c.login("cusadmin", "password")
+        data = await c.get_data(c.Dataset.DSINFO)
+        await c.logout()
+        try:
+            await c.get_data(c.Dataset.DSINFO)
+        except hitron.NotLoggedInError:
+            return data, True
+        return data, False
+
+    # when:
+    data, redirected = run(fakemodem, config, fn)
+
+    # then:
+    assert data == json.loads(config.data[f"/{Client.Dataset.DSINFO.path()}"])
+    assert redirected
+
+
+def test_wrong_credentials(fakemodem, config):
+    # given:
+    async def fn(client):
+        await client().login("cusadmin", "wrong")
+
+    # then:
+    with pytest.raises(RuntimeError, match="Wrong Credentials."):
+        # when:
+        run(fakemodem, config, fn)
+
+
+def test_repeat_login(fakemodem, config):
+    # given:
+    async def fn(client):
+        await client().login("cusadmin", "password")
+        second = client()
+        with pytest.raises(RuntimeError, match="Repeat Login"):
+            await second.login("cusadmin", "password")
+        await second.login("cusadmin", "password", force=True)
+        return await second.get_data(second.Dataset.SYSTEM_MODEL)
+
+    # when:
+    data = run(fakemodem, config, fn)
+
+    # then:
+    assert data == json.loads(config.data[f"/{Client.Dataset.SYSTEM_MODEL.path()}"])
@@ -0,0 +1,77 @@
+from hitron_exporter.hosts import HostTable
+
+
+def host(mac, online="active", interface="Ethernet", ip_type="IPv4"):
+    return {
+        "connectType": "DHCP-IP",
+        "hostName": f"host-{mac[-2:]}",
+        "interface": interface,
+        "ipAddr": f"192.0.2.{int(mac[-2:], 16)}",
+        "ipType": ip_type,
+        "macAddr": mac,
+        "online": online,
+    }
+
+
+def test_host_table_counts():
+    # given:
+    records = [
+        host("76:77:47:00:00:01"),
+        host("76:77:47:00:00:02", interface="2.4G"),
+        host("76:77:47:00:00:03"),
+        host("76:77:47:00:00:03", ip_type="IPv6"),
+        host("76:77:47:00:00:04", online="inactive"),
+    ]
+
+    # when:
+    table = HostTable(records)
+
+    # then:
+    assert len(table) == 5
+    assert dict(table.rows()) == {
+        ("Ethernet", "IPv4", "DHCP-IP", "active"): 2,
+        ("2.4G", "IPv4", "DHCP-IP", "active"): 1,
+        ("Ethernet", "IPv6", "DHCP-IP", "active"): 1,
+        ("Ethernet", "IPv4", "DHCP-IP", "inactive"): 1,
+    }
+    assert table.hosts == []
+
+
+def test_host_table_keeps_online_hosts_in_mac_order():
+    # given:
+    records = [
+        host("76:77:47:00:00:05"),
+        host("76:77:47:00:00:01", online="inactive"),
+        host("76:77:47:00:00:04"),
+        host("76:77:47:00:00:02"),
+        host("76:77:47:00:00:03", online="inactive"),
+        host("76:77:47:00:00:02", ip_type="IPv6"),
+    ]
+
+    # when:
+    table = HostTable(records, max_hosts=3)
+
+    # then:
+    assert len(table) == 6
+    assert [(h[0], h[4], h[6]) for h in table.hosts] == [
+        ("76:77:47:00:00:02", "IPv4", "active"),
+        ("76:77:47:00:00:02", "IPv6", "active"),
+        ("76:77:47:00:00:04", "IPv4", "active"),
+    ]
+    assert table.hosts[0] == (
+        "76:77:47:00:00:02",
+        "192.0.2.2",
+        "host-02",
+        "Ethernet",
+        "IPv4",
+        "DHCP-IP",
+        "active",
+    )
+
+
+def test_host_table_fewer_hosts_than_max():
+    # when:
+    table = HostTable([host("76:77:47:00:00:01", online="inactive")], max_hosts=3)
+
+    # then:
+    assert [h[0] for h in table.hosts] == ["76:77:47:00:00:01"]
@@ -3,6 +3,11 @@ from __future__ import print_function
 import io
 from importlib import resources
 import json
+import os
+import signal
+import sys
+import threading
+import time
 from unittest import mock
 
 import pytest
@@ -97,3 +102,184 @@ def test_keytab_unreadable(tmp_path, monkeypatch, caplog):
         and "is not readable; we" in rec.message
     )
     assert any(expected_messages)
+
+
+@pytest.fixture
+def mock_retrieve(monkeypatch):
+    retrieve = mock.Mock(
+        side_effect=lambda container: {"usr": container[1], "pwd": "p"}
+    )
+    monkeypatch.setattr("hitron_exporter.ipavault.retrieve", retrieve)
+    return retrieve
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr("time.monotonic", lambda: now[0])
+    return now
+
+
+def test_credential_cache_keyed_by_namespace(mock_retrieve, clock):
+    # given:
+    cache = ipavault.CredentialCache()
+
+    # when:
+    a1 = cache.get("service:a")
+    b = cache.get("service:b")
+    a2 = cache.get("service:a")
+
+    # then:
+    assert a1 == a2 == {"usr": "a", "pwd": "p"}
+    assert b == {"usr": "b", "pwd": "p"}
+    assert mock_retrieve.call_count == 2
+
+
+def test_credential_cache_expiry(mock_retrieve, clock):
+    # given:
+    cache = ipavault.CredentialCache(ttl=60, refresh_after=1)
+    cache.get("service:a")
+
+    # when:
+    clock[0] += 61
+    cache.get("service:a")
+
+    # then:
+    assert mock_retrieve.call_count == 2
+
+
+def test_credential_cache_forget(mock_retrieve, clock):
+    # given:
+    cache = ipavault.CredentialCache()
+    cache.get("service:a")
+
+    # when:
+    cache.forget("service:a")
+    cache.get("service:a")
+
+    # then:
+    assert mock_retrieve.call_count == 2
+
+
+def test_credential_cache_refreshes_in_background(mock_retrieve, clock):
+    # given:
+    cache = ipavault.CredentialCache(ttl=60, refresh_after=0.5)
+    cache.get("service:a")
+    refreshed = threading.Event()
+    mock_retrieve.side_effect = lambda container: (
+        refreshed.set() or {"usr": "new", "pwd": "p"}
+    )
+
+    # when:
+    clock[0] += 40
+    cred = cache.get("service:a")
+
+    # then:
+    assert cred == {"usr": "a", "pwd": "p"}
+    assert refreshed.wait(5)
+    for _ in range(100):
+        if cache.get("service:a")["usr"] == "new":
+            break
+        time.sleep(0.01)
+    else:
+        pytest.fail("Credentials were not refreshed")
+
+
+def test_credential_cache_warm(mock_retrieve, clock):
+    # given:
+    cache = ipavault.CredentialCache()
+
+    # when:
+    cache.warm(["service:a", "service:b"])
+
+    # then:
+    for _ in range(100):
+        if mock_retrieve.call_count == 2:
+            break
+        time.sleep(0.01)
+    cache.get("service:a")
+    cache.get("service:b")
+    assert mock_retrieve.call_count == 2
+
+
+STUB_IPA = """\
+#!{python}
+# Runs vault-retrieve.py as 'ipa console' would, against a fake API whose vaults
+# contain the vault name, the service and our pid.
+import os
+import sys
+
+assert sys.argv[1] == "console"
+
+
+class Command:
+    @staticmethod
+    def vault_retrieve(name, service):
+        if service == "bad":
+            raise LookupError("no such vault")
+        return {{"result": {{"data": f"{{name}} {{service}} {{os.getpid()}}".encode()}}}}
+
+
+class api:
+    Command = Command
+
+
+with open(sys.argv[2], encoding="utf-8") as f:
+    exec(compile(f.read(), sys.argv[2], "exec"), {{"api": api}})
+"""
+
+
+@pytest.fixture
+def stub_ipa(tmp_path, monkeypatch):
+    ipa = tmp_path / "ipa"
+    ipa.write_text(STUB_IPA.format(python=sys.executable))
+    ipa.chmod(0o755)
+    monkeypatch.setenv("PATH", f"{tmp_path}{os.pathsep}{os.environ['PATH']}")
+
+
+@pytest.fixture
+def worker(stub_ipa):
+    worker = ipavault.Worker(timeout=10)
+    yield worker
+    worker.close()
+
+
+def test_worker_serves_many_retrievals(worker):
+    # when:
+    a = worker.retrieve(["service", "a"])
+    b = worker.retrieve(["service", "b"])
+
+    # then:
+    usr, service, pid = a["usr"].split()
+    assert (usr, service) == ("usr", "a")
+    assert a["pwd"] == f"pwd a {pid}"
+    assert b["usr"] == f"usr b {pid}"
+
+
+def test_worker_restarted_when_it_dies(worker):
+    # given:
+    pid = int(worker.retrieve(["service", "a"])["usr"].split()[2])
+    os.kill(pid, signal.SIGKILL)
+
+    # when:
+    cred = worker.retrieve(["service", "a"])
+
+    # then:
+    new_pid = int(cred["usr"].split()[2])
+    assert new_pid != pid
+
+
+def test_worker_error(worker):
+    # when:
+    with pytest.raises(RuntimeError, match="no such vault"):
+        worker.retrieve(["service", "bad"])
+
+    # then:
+    assert worker.retrieve(["service", "a"])["usr"].startswith("usr a ")
+
+
+def test_worker_bad_args(worker):
+    # then:
+    with pytest.raises(ValueError):
+        # when:
+        worker.retrieve(["blah"])
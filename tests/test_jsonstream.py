@@ -0,0 +1,95 @@
+import json
+
+import pytest
+
+from hitron_exporter.jsonstream import Decoder
+
+
+def decode(*chunks):
+    decoder = Decoder()
+    for chunk in chunks:
+        decoder.feed(chunk)
+    return decoder.close()
+
+
+@pytest.mark.parametrize(
+    "document",
+    [
+        [],
+        [{"a": "b"}, {"c": [1, 2.5, None]}],
+        [1, 23456, -7e10, "x,]", True],
+        [{"a": {"b": {}}, "c": "}, {"}, {"d": [{"e": 1}, {}]}, {}],
+        {"a": [1, 2]},
+        "a string",
+        12345,
+    ],
+)
+def test_decode_in_single_bytes(document) -> None:
+    # given:
+    data = json.dumps(document, ensure_ascii=False).encode("utf-8")
+
+    # when:
+    decoded = decode(*(data[i : i + 1] for i in range(len(data))))
+
+    # then:
+    assert decoded == document
+
+
+@pytest.mark.parametrize("split", range(1, 40))
+def test_decode_in_two_chunks(split) -> None:
+    # given:
+    data = b'[{"a": {"b": 1}, "c": "}, {"}, {"d": 2}, {"e": [{}, {}]}]'
+
+    # when:
+    decoded = decode(data[:split], data[split:])
+
+    # then:
+    assert decoded == json.loads(data)
+
+
+def test_decode_multibyte_character_split() -> None:
+    # when:
+    decoded = decode(b' ["\xc2', b'\xa3"] \n')
+
+    # then:
+    assert decoded == ["£"]
+
+
+@pytest.mark.parametrize(
+    "chunks,expected",
+    [
+        ((b"[12", b"34, 5", b"6]"), [1234, 56]),
+        ((b"[1", b".5]"), [1.5]),
+        ((b"[1.", b"5]"), [1.5]),
+        ((b"[1", b"e3]"), [1e3]),
+        ((b"[-", b"1]"), [-1]),
+    ],
+)
+def test_number_split_between_chunks(chunks, expected) -> None:
+    # when:
+    decoded = decode(*chunks)
+
+    # then:
+    assert decoded == expected
+
+
+def test_decoded_text_discarded() -> None:
+    # given:
+    decoder = Decoder()
+
+    # when:
+    decoder.feed(b'[{"a": 1}, {"b": 2}, {"c"')
+
+    # then:
+    assert decoder._Decoder__text == '{"c"'
+
+
+@pytest.mark.parametrize(
+    "data",
+    [b"", b"[1, 2", b"[1 2]", b"[1,, 2]", b"[1] 2", b"[1, }", b"{"],
+)
+def test_invalid(data) -> None:
+    # then:
+    with pytest.raises(json.JSONDecodeError):
+        # when:
+        decode(data)
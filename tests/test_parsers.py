@@ -0,0 +1,83 @@
+from calendar import timegm
+import time
+
+import pytest
+
+from hitron_exporter import parsers
+
+
+@pytest.mark.parametrize(
+    "input_,expected",
+    [
+        ("17 Days,13 Hours,11 Minutes,7 Seconds", 1516267.0),
+        ("00 Days,05 Hours,38 Minutes,47 Seconds", 20327.0),
+        # CMDOCSISWAN's CmIpLeaseDuration
+        ("04 Days,09 Hours,47 Minutes,10 Seconds", 380830.0),
+        ("1 Day, 1 Hour, 1 Minute, 1 Second", 90061.0),
+    ],
+)
+def test_parse_duration(input_, expected):
+    assert parsers.parse_duration(input_) == expected
+
+
+@pytest.mark.parametrize("input_", ["", "Unparsable string", "17 Days,13 Hours"])
+def test_parse_duration_invalid(input_):
+    with pytest.raises(ValueError):
+        parsers.parse_duration(input_)
+
+
+def test_parse_clock_agrees_with_strptime():
+    # given:
+    fmt = "%a %b %d, %Y, %H:%M:%S"
+    # Every few days and hours of a few years, including a leap day
+    timestamps = range(946684800, 946684800 + 5 * 366 * 86400, 3 * 86400 + 3607)
+
+    for ts in timestamps:
+        clock = time.strftime(fmt, time.gmtime(ts))
+
+        # then:
+        assert parsers.parse_clock(clock) == timegm(time.strptime(clock, fmt)) == ts
+
+
+@pytest.mark.parametrize(
+    "input_",
+    [
+        "Not a date",
+        "Fri Jun 17, 2022",
+        "Fri Jum 17, 2022, 17:09:10",
+        "Fry Jun 17, 2022, 17:09:10",
+        "Wed Feb 30, 2022, 17:09:10",
+        "Fri Jun 17, 2022, 24:09:10",
+        "Fri Jun 17, 2022, 17:09:10 extra",
+    ],
+)
+def test_parse_clock_invalid(input_):
+    with pytest.raises(ValueError):
+        parsers.parse_clock(input_)
+
+
+@pytest.mark.parametrize(
+    "input_,expected",
+    [
+        ("123 Bytes", 123),
+        ("40.14M Bytes", 40140000),
+        ("1.5G Bytes", 1500000000),
+    ],
+)
+def test_parse_pkt(input_, expected):
+    assert parsers.parse_pkt(input_) == expected
+
+
+@pytest.mark.parametrize("input_", ["567T Bytes", "13 not matching string"])
+def test_parse_pkt_invalid(input_):
+    with pytest.raises(ValueError):
+        parsers.parse_pkt(input_)
+
+
+def test_parse_bpi():
+    # when:
+    bpi = parsers.parse_bpi("AUTH:authorized, TEK:operational")
+
+    # then:
+    assert bpi == {"auth": "authorized", "tek": "operational"}
+    assert parsers.parse_bpi("AUTH:authorized, TEK:operational") is bpi
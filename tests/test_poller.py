@@ -0,0 +1,77 @@
+import threading
+import time
+
+from hitron_exporter.poller import Poller
+
+
+def wait_for(condition, timeout=5.0):
+    deadline = time.monotonic() + timeout
+    while not condition():
+        assert time.monotonic() < deadline, "timed out"
+        time.sleep(0.01)
+
+
+def test_polls_repeatedly():
+    # given:
+    calls = []
+
+    def poll(key):
+        calls.append(key)
+        return len(calls)
+
+    poller = Poller(poll, workers=2)
+    poller.add("a", 0.05)
+    poller.add("b", 0.05)
+
+    # when:
+    poller.start()
+    try:
+        wait_for(lambda: calls.count("a") >= 3 and calls.count("b") >= 3)
+    finally:
+        poller.stop()
+
+    # then:
+    assert (result := poller.result("a"))
+    assert result.success
+    assert result.value > 0
+    assert result.timestamp <= time.time()
+
+
+def test_failure_keeps_previous_value():
+    # given:
+    outcomes = iter([1])
+    polled = threading.Event()
+
+    def poll(key):
+        try:
+            return next(outcomes)
+        finally:
+            if poller.result(key) is not None:
+                polled.set()
+
+    poller = Poller(poll, jitter=0)
+    poller.add("a", 0.05)
+
+    # when:
+    poller.start()
+    try:
+        polled.wait(5)
+        wait_for(lambda: not poller.result("a").success)
+    finally:
+        poller.stop()
+
+    # then:
+    result = poller.result("a")
+    assert result.value == 1
+    assert result.timestamp > 0
+
+
+def test_unknown_key():
+    # given:
+    poller = Poller(lambda key: None)
+    poller.add("a", 30)
+
+    # then:
+    assert "a" in poller
+    assert "b" not in poller
+    assert poller.result("a") is None
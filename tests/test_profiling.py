@@ -0,0 +1,62 @@
+import threading
+import time
+
+import pytest
+
+from hitron_exporter import profiling
+
+
+@pytest.mark.parametrize(
+    "remote_addr, authorization, token, expected",
+    [
+        ("127.0.0.1", None, None, True),
+        ("::1", None, None, True),
+        ("192.0.2.1", None, None, False),
+        ("192.0.2.1", "Bearer sekrit", "sekrit", True),
+        ("192.0.2.1", "Bearer wrong", "sekrit", False),
+        ("192.0.2.1", "Bearer ", None, False),
+        (None, None, None, False),
+    ],
+)
+def test_allowed(remote_addr, authorization, token, expected):
+    assert profiling.allowed(remote_addr, authorization, token) == expected
+
+
+def busy_wait_for_profile(stop):
+    while not stop.is_set():
+        time.sleep(0.001)
+
+
+def test_profile():
+    # given:
+    stop = threading.Event()
+    thread = threading.Thread(target=busy_wait_for_profile, args=(stop,), name="busy")
+    thread.start()
+
+    # when:
+    try:
+        text = profiling.profile(0.1, interval=0.01)
+    finally:
+        stop.set()
+        thread.join()
+
+    # then:
+    lines = [line for line in text.splitlines() if line.startswith("busy;")]
+    assert lines
+    stack, count = lines[0].rsplit(" ", 1)
+    assert int(count) > 0
+    assert "busy_wait_for_profile" in stack
+
+
+def test_profile_busy():
+    # given:
+    thread = threading.Thread(target=profiling.profile, args=(0.2,))
+    thread.start()
+    time.sleep(0.05)
+
+    # then:
+    try:
+        with pytest.raises(profiling.BusyError):
+            profiling.profile(0.01)
+    finally:
+        thread.join()
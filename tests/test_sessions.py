@@ -0,0 +1,134 @@
+import pytest
+from werkzeug.wrappers import Request, Response
+
+from hitron_exporter import sessions
+from hitron_exporter.hitron import Client
+
+
+@pytest.fixture
+def modem(httpserver):
+    """
+    A stateful mock modem that counts logins and logouts, and that can be told to
+    forget about the current session.
+    """
+    state = {"logins": 0, "logouts": 0, "logged_in": False}
+
+    httpserver.expect_request("/", method="GET").respond_with_data(
+        "", status=302, headers={"Set-Cookie": "preSession=presession_id; path=/"}
+    )
+
+    def login_handler(request: Request) -> Response:
+        state["logins"] += 1
+        state["logged_in"] = True
+        return Response(
+            "success", headers={"Set-Cookie": "session=sessionid; path=/; HttpOnly"}
+        )
+
+    httpserver.expect_request("/goform/login", method="POST").respond_with_handler(
+        login_handler
+    )
+
+    def data_handler(request: Request) -> Response:
+        if not state["logged_in"]:
+            return Response(status=302)
+        return Response('[{"tunefreq": "213.45"}]', content_type="application/json")
+
+    httpserver.expect_request(
+        "/data/getTuneFreq.asp", method="GET"
+    ).respond_with_handler(data_handler)
+
+    def logout_handler(request: Request) -> Response:
+        state["logouts"] += 1
+        state["logged_in"] = False
+        return Response(status=302)
+
+    httpserver.expect_request("/goform/logout", method="POST").respond_with_handler(
+        logout_handler
+    )
+
+    return state
+
+
+@pytest.fixture
+def key(httpserver):
+    return sessions.SessionKey("localhost", httpserver.port, "", "uuu", "ppp")
+
+
+def test_session_reused(httpserver, modem, key) -> None:
+    # given:
+    manager = sessions.SessionManager()
+
+    # when:
+    for _ in range(3):
+        with manager.client(key) as client:
+            client.get_data(Client.Dataset.TUNEFREQ)
+
+    # then:
+    httpserver.check()
+    assert modem["logins"] == 1
+    assert modem["logouts"] == 0
+
+
+def test_session_expired_login_again(httpserver, modem, key) -> None:
+    # given:
+    manager = sessions.SessionManager()
+    with manager.client(key) as client:
+        client.get_data(Client.Dataset.TUNEFREQ)
+    modem["logged_in"] = False
+
+    # when:
+    with manager.client(key) as client:
+        data = client.get_data(Client.Dataset.TUNEFREQ)
+
+    # then:
+    httpserver.check()
+    assert data == [{"tunefreq": "213.45"}]
+    assert modem["logins"] == 2
+
+
+def test_close_logs_out(httpserver, modem, key) -> None:
+    # given:
+    manager = sessions.SessionManager()
+    with manager.client(key) as client:
+        client.get_data(Client.Dataset.TUNEFREQ)
+
+    # when:
+    manager.close()
+
+    # then:
+    httpserver.check()
+    assert modem["logouts"] == 1
+
+
+def test_idle_session_evicted(httpserver, modem, key) -> None:
+    # given:
+    manager = sessions.SessionManager(idle_timeout=0)
+    with manager.client(key) as client:
+        client.get_data(Client.Dataset.TUNEFREQ)
+
+    # when:
+    with manager.client(key._replace(usr="other")) as client:
+        client.get_data(Client.Dataset.TUNEFREQ)
+
+    # then:
+    httpserver.check()
+    assert modem["logins"] == 2
+    assert modem["logouts"] == 1
+
+
+def test_failed_probe_discards_session(httpserver, modem, key) -> None:
+    # given:
+    manager = sessions.SessionManager()
+
+    # when:
+    with pytest.raises(ValueError):
+        with manager.client(key):
+            raise ValueError
+
+    with manager.client(key) as client:
+        client.get_data(Client.Dataset.TUNEFREQ)
+
+    # then:
+    httpserver.check()
+    assert modem["logins"] == 2
+    assert modem["logouts"] == 1
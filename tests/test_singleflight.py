@@ -0,0 +1,160 @@
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+import threading
+import time
+
+import pytest
+
+from hitron_exporter import singleflight
+
+
+def test_concurrent_calls_coalesced():
+    # given:
+    group = singleflight.Group()
+    release = threading.Event()
+    calls = []
+
+    def fn():
+        calls.append(None)
+        release.wait(5)
+        return object()
+
+    # when:
+    with ThreadPoolExecutor(max_workers=4) as executor:
+        futures = [executor.submit(group.do, "k", fn) for _ in range(4)]
+        while not calls:
+            pass
+        # let the followers start waiting before the leader finishes
+        threading.Timer(0.1, release.set).start()
+        results = [f.result() for f in futures]
+
+    # then:
+    assert len(calls) == 1
+    assert len({id(r) for r, _ in results}) == 1
+    assert sorted(shared for _, shared in results) == [False, True, True, True]
+
+
+def test_sequential_calls_not_coalesced():
+    # given:
+    group = singleflight.Group()
+
+    # when:
+    r1, shared1 = group.do("k", object)
+    r2, shared2 = group.do("k", object)
+
+    # then:
+    assert r1 is not r2
+    assert not shared1 and not shared2
+
+
+def test_exception_raised():
+    # given:
+    group = singleflight.Group()
+
+    def fn():
+        raise ValueError("boom")
+
+    # then:
+    with pytest.raises(ValueError, match="boom"):
+        # when:
+        group.do("k", fn)
+
+    # then the failure is not remembered:
+    assert group.do("k", lambda: 1) == (1, False)
+
+
+def test_async_concurrent_calls_coalesced():
+    # given:
+    group = singleflight.AsyncGroup()
+    calls = []
+
+    async def fn():
+        calls.append(None)
+        await asyncio.sleep(0.01)
+        return object()
+
+    async def main():
+        return await asyncio.gather(*(group.do("k", fn) for _ in range(4)))
+
+    # when:
+    results = asyncio.run(main())
+
+    # then:
+    assert len(calls) == 1
+    assert len({id(r) for r, _ in results}) == 1
+    assert sorted(shared for _, shared in results) == [False, True, True, True]
+
+
+def test_async_cancelled_caller_does_not_cancel_others():
+    # given:
+    group = singleflight.AsyncGroup()
+
+    async def fn():
+        await asyncio.sleep(0.01)
+        return 1
+
+    async def main():
+        first = asyncio.ensure_future(group.do("k", fn))
+        second = asyncio.ensure_future(group.do("k", fn))
+        await asyncio.sleep(0)
+        first.cancel()
+        return await second
+
+    # when:
+    result = asyncio.run(main())
+
+    # then:
+    assert result == (1, True)
+
+
+def test_keyed_lock_serializes_same_key():
+    # given:
+    lock = singleflight.KeyedLock()
+    state = {"holding": 0, "max_holding": 0}
+
+    def fn(key):
+        with lock.hold(key):
+            state["holding"] += 1
+            state["max_holding"] = max(state["max_holding"], state["holding"])
+            time.sleep(0.01)
+            state["holding"] -= 1
+
+    # when:
+    with ThreadPoolExecutor(max_workers=4) as executor:
+        list(executor.map(fn, ["k"] * 4))
+
+    # then:
+    assert state["max_holding"] == 1
+
+
+def test_keyed_lock_other_keys_not_blocked():
+    # given:
+    lock = singleflight.KeyedLock()
+
+    # when:
+    with lock.hold("a"):
+        with lock.hold("b"):
+            # then:
+            pass
+
+
+def test_async_keyed_lock_serializes_same_key():
+    # given:
+    lock = singleflight.AsyncKeyedLock()
+    state = {"holding": 0, "max_holding": 0}
+
+    async def fn(key):
+        async with lock.hold(key):
+            state["holding"] += 1
+            state["max_holding"] = max(state["max_holding"], state["holding"])
+            await asyncio.sleep(0.01)
+            state["holding"] -= 1
+
+    async def main():
+        await asyncio.gather(*(fn("k") for _ in range(4)))
+
+    # when:
+    asyncio.run(main())
+
+    # then:
+    assert state["max_holding"] == 1
@@ -0,0 +1,66 @@
+import json
+import pathlib
+import subprocess
+import sys
+
+import prometheus_client
+
+import hitron_exporter
+
+
+def test_import_is_lazy_and_starts_no_threads():
+    # given:
+    code = (
+        "import gc, json, sys, threading, hitron_exporter;"
+        " print(json.dumps("
+        "[threading.active_count(), sorted(sys.modules), gc.get_freeze_count()]"
+        "))"
+    )
+
+    # when:
+    proc = subprocess.run(
+        [sys.executable, "-c", code],
+        stdout=subprocess.PIPE,
+        stderr=subprocess.DEVNULL,
+        check=True,
+        text=True,
+    )
+    threads, modules, frozen = json.loads(proc.stdout)
+
+    # then: workers forked by gunicorn --preload don't lose any threads
+    assert threads == 1
+    # then: modules only needed by the ASGI app or vaults aren't imported
+    assert not {"asyncio", "subprocess", "hitron_exporter.asgi"} & set(modules)
+    # then: importing the exporter leaves the garbage collector alone
+    assert frozen == 0
+
+
+def test_gunicorn_conf_freezes_before_fork():
+    # given:
+    conf = pathlib.Path(__file__).parent.parent / "gunicorn.conf.py"
+    code = (
+        "import gc, runpy, sys, hitron_exporter;"
+        " runpy.run_path(sys.argv[1])['pre_fork'](None, None);"
+        " print(gc.get_freeze_count())"
+    )
+
+    # when:
+    proc = subprocess.run(
+        [sys.executable, "-c", code, str(conf)],
+        stdout=subprocess.PIPE,
+        check=True,
+        text=True,
+    )
+
+    # then:
+    assert int(proc.stdout) > 0
+
+
+def test_exporter_info():
+    # when:
+    value = prometheus_client.REGISTRY.get_sample_value(
+        "hitron_exporter_info", {"version": hitron_exporter.version()}
+    )
+
+    # then:
+    assert value == 1
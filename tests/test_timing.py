@@ -0,0 +1,151 @@
+from concurrent.futures import ThreadPoolExecutor
+import sys
+
+import prometheus_client
+import pytest
+
+from hitron_exporter import exposition, fetch_datasets, timing
+from hitron_exporter.hitron import Client
+
+
+def observations(phase, dataset=""):
+    return prometheus_client.REGISTRY.get_sample_value(
+        "hitron_exporter_phase_duration_seconds_count",
+        {"phase": phase, "dataset": dataset},
+    )
+
+
+def test_measure_within_probe():
+    # given:
+    before = observations("login") or 0
+
+    # when:
+    with timing.probe() as timings:
+        with timing.measure("login"):
+            pass
+        with timing.measure("get_data", "dsinfo"):
+            pass
+        with timing.measure("get_data", "dsinfo"):
+            pass
+
+    # then:
+    assert observations("login") == before + 1
+    families = {f.name: f for f in timings.collect()}
+    assert set(families) == {
+        "hitron_probe_duration_seconds",
+        "hitron_probe_login_seconds",
+        "hitron_probe_get_data_seconds",
+    }
+    [sample] = families["hitron_probe_get_data_seconds"].samples
+    assert sample.labels == {"dataset": "dsinfo"}
+    assert families["hitron_probe_login_seconds"].samples[0].labels == {}
+    assert timing.current() is None
+
+
+def test_measure_iter():
+    # given:
+    before = observations("render") or 0
+
+    # when:
+    chunks = list(timing.measure_iter(iter([b"a", b"b"]), "render"))
+
+    # then:
+    assert chunks == [b"a", b"b"]
+    assert observations("render") == before + 1
+
+
+def test_fetch_datasets_in_threads():
+    # given:
+    class MockClient:
+        def get_data(self, dataset):
+            with timing.measure("get_data", dataset.value):
+                return dataset.value
+
+    datasets = [Client.Dataset.DSINFO, Client.Dataset.USINFO]
+
+    # when:
+    with ThreadPoolExecutor(2) as executor, timing.probe() as timings:
+        data = fetch_datasets(MockClient(), datasets, executor, concurrency=2)
+
+    # then:
+    assert data == {d: d.value for d in datasets}
+    [family] = [
+        f for f in timings.collect() if f.name == "hitron_probe_get_data_seconds"
+    ]
+    assert {s.labels["dataset"] for s in family.samples} == {"dsinfo", "usinfo"}
+
+
+def test_client_phases(httpserver):
+    # given:
+    httpserver.expect_request("/data/getTuneFreq.asp").respond_with_json(
+        [{"tunefreq": "426.250"}]
+    )
+    client = Client("localhost", fingerprint="", port=httpserver.port)
+
+    # when:
+    with timing.probe() as timings:
+        client.get_data(Client.Dataset.TUNEFREQ)
+
+    # then:
+    names = {f.name for f in timings.collect()}
+    assert "hitron_probe_get_data_seconds" in names
+
+
+def test_tracing_disabled():
+    # then:
+    assert timing.span("a") is timing.span("b")
+
+
+def test_tracing_without_opentelemetry(monkeypatch):
+    # given:
+    monkeypatch.setitem(sys.modules, "opentelemetry", None)
+
+    # when:
+    enabled = timing.enable_tracing()
+
+    # then:
+    assert not enabled
+    assert timing.span("a") is timing.span("b")
+
+
+@pytest.fixture
+def span_exporter():
+    sdk_trace = pytest.importorskip("opentelemetry.sdk.trace")
+    in_memory = pytest.importorskip(
+        "opentelemetry.sdk.trace.export.in_memory_span_exporter"
+    )
+    from opentelemetry.sdk.trace.export import SimpleSpanProcessor
+
+    exporter = in_memory.InMemorySpanExporter()
+    provider = sdk_trace.TracerProvider()
+    provider.add_span_processor(SimpleSpanProcessor(exporter))
+    assert timing.enable_tracing(provider)
+    yield exporter
+    timing.disable_tracing()
+
+
+def test_tracing(span_exporter):
+    # given:
+    class Collector(prometheus_client.registry.Collector):
+        def collect(self):
+            with timing.span("collect_a"):
+                yield prometheus_client.core.GaugeMetricFamily("a", "", value=1)
+
+    # when:
+    with timing.span("/probe"):
+        with timing.probe("tt"):
+            with timing.measure("get_data", "dsinfo"):
+                pass
+        body = exposition.render(Collector()).body
+    b"".join(body)
+
+    # then:
+    spans = {s.name: s for s in span_exporter.get_finished_spans()}
+    assert set(spans) == {"/probe", "probe", "get_data", "collect_a", "render"}
+    root = spans["/probe"].context.span_id
+    assert spans["probe"].parent.span_id == root
+    assert spans["probe"].attributes["hitron.target"] == "tt"
+    assert spans["get_data"].parent.span_id == spans["probe"].context.span_id
+    assert spans["get_data"].attributes["hitron.dataset"] == "dsinfo"
+    assert spans["collect_a"].parent.span_id == root
+    assert spans["render"].parent.span_id == root